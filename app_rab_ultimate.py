@@ -1,14 +1,50 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import io
 import json
-from fpdf import FPDF
+import copy
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from rab_excel import export_excel, export_schedule_excel, export_takeoff_excel, read_library
+from rab_history import RevisionHistory
+from rab_io import ProjectImportError, load_project_stream
+from rab_pdf import build_pdf
+from rab_perf import PerfRecorder, activate, count, lap, phase
+from rab_risk import DISTRIBUTIONS, resource_sensitivity, simulate_cost_risk
+from rab_store import ProjectStore
+from rab_engine import (
+    DEFAULT_AHSP_MASTER, DEFAULT_PROJECT_INFO, DEFAULT_RAB_DATA, DEFAULT_RESOURCES,
+    DEFAULT_TAX_SETTINGS, FLAT_KEY_COLUMNS, ITEM_COLUMNS, SCHEDULE_FIELDS, SCHEDULE_PROFILES, AhspCycleError, AhspLibrary,
+    CostCube, CostSchedule, DependencyIndex, Project, ahsp_order, ItemStore, ResourceMaps, format_idr, project_weeks,
+    query_items, search_codes, takeoff_frame, takeoff_summary, top_items, top_n, upsert_ahsp, upsert_resources,
+)
 
 # ==========================================
 # 1. KONFIGURASI HALAMAN & TEMA (SYSTEM LEVEL)
 # ==========================================
 st.set_page_config(page_title="RAB MASTER PRO | ENGINEX", page_icon="🏗️", layout="wide")
 
+# Instrumentasi kinerja per rerun (panel di sidebar); env RAB_PERF=1 menyalakan sejak awal,
+# RAB_PERF_LOG=<file> menulis setiap rerun sebagai JSON Lines
+def perf_recorder():
+    if 'perf' not in st.session_state:
+        st.session_state.perf = PerfRecorder(history=20, log_path=os.environ.get("RAB_PERF_LOG"))
+        st.session_state.perf_enabled = os.environ.get("RAB_PERF") == "1"
+    recorder = st.session_state.perf
+    recorder.enabled = st.session_state.perf_enabled
+    activate(recorder)
+    return recorder
+
+def perf_callback():
+    """Dipanggil di awal callback widget: kerja callback masuk ke rerun yang sama"""
+    perf_recorder().start_run(stage="callback")
+
+perf_recorder().start_run(st.session_state.get('sb_menu', "Dashboard"))
+
 # CSS: TEMA CERAH & PROFESSIONAL (GAGAH)
 st.markdown("""
 <style>
@@ -67,381 +103,65 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def format_idr(val):
-    return f"Rp {val:,.0f}".replace(",", ".")
-
 # ==========================================
 # 2. INISIALISASI DATABASE (ROBUST STATE)
 # ==========================================
+@st.cache_resource
+def shared_library():
+    """Library default (Database Harga + AHSP) dimuat sekali per proses, dipakai bersama semua sesi.
+
+    Read-only: sesi hanya memegang referensi. Tabel harga diganti utuh saat
+    diedit (pandas copy-on-write), resep AHSP lewat lapisan AhspLibrary.
+    """
+    resources = pd.DataFrame(DEFAULT_RESOURCES)
+    return resources, copy.deepcopy(DEFAULT_AHSP_MASTER), ResourceMaps(resources)
+
 def init_state():
     # A. Project Info
     if 'project_info' not in st.session_state:
-        st.session_state.project_info = {
-            "name": "Pembangunan Gedung Operasional",
-            "location": "Bandung, Jawa Barat",
-            "year": "2025",
-            "owner": "OM RIO",
-            "consultant": "SMARTSTUDIO"
-        }
+        st.session_state.project_info = dict(DEFAULT_PROJECT_INFO)
     
     # B. Tax Settings
     if 'tax_settings' not in st.session_state:
-        st.session_state.tax_settings = {"profit": 10.0, "ppn": 11.0}
+        st.session_state.tax_settings = dict(DEFAULT_TAX_SETTINGS)
 
     # C. DATABASE RESOURCES (HARGA DASAR)
+    # C & D memakai library bersama; sesi hanya menyimpan perubahannya sendiri
     if 'resources' not in st.session_state:
-        data_resources = [
-            {'id': 'L.01', 'category': 'Upah', 'name': 'Pekerja', 'unit': 'OH', 'price': 107000},
-            {'id': 'L.02.1', 'category': 'Upah', 'name': 'Tukang Batu', 'unit': 'OH', 'price': 110000},
-            {'id': 'L.02.2', 'category': 'Upah', 'name': 'Tukang Kayu', 'unit': 'OH', 'price': 110000},
-            {'id': 'L.02.3', 'category': 'Upah', 'name': 'Tukang Besi', 'unit': 'OH', 'price': 110000},
-            {'id': 'L.02.4', 'category': 'Upah', 'name': 'Tukang Cat', 'unit': 'OH', 'price': 110000},
-            {'id': 'L.02.5', 'category': 'Upah', 'name': 'Tukang Listrik', 'unit': 'OH', 'price': 110000},
-            {'id': 'L.02.6', 'category': 'Upah', 'name': 'Tukang Pipa', 'unit': 'OH', 'price': 110000},
-            {'id': 'L.02.7', 'category': 'Upah', 'name': 'Tukang Alumunium', 'unit': 'OH', 'price': 110000},
-            {'id': 'L.03', 'category': 'Upah', 'name': 'Kepala Tukang', 'unit': 'OH', 'price': 120000},
-            {'id': 'L.04', 'category': 'Upah', 'name': 'Mandor', 'unit': 'OH', 'price': 125000},
-            
-            # Material
-            {'id': 'M.01', 'category': 'Bahan', 'name': 'Semen Portland (PC)', 'unit': 'Kg', 'price': 1516},
-            {'id': 'M.01b', 'category': 'Bahan', 'name': 'Semen Mortar', 'unit': 'Kg', 'price': 2500},
-            {'id': 'M.02', 'category': 'Bahan', 'name': 'Pasir Beton', 'unit': 'Kg', 'price': 1000},
-            {'id': 'M.03', 'category': 'Bahan', 'name': 'Pasir Pasang', 'unit': 'M3', 'price': 132500},
-            {'id': 'M.03b', 'category': 'Bahan', 'name': 'Pasir Urug', 'unit': 'M3', 'price': 90000},
-            {'id': 'M.04', 'category': 'Bahan', 'name': 'Kerikil / Split', 'unit': 'Kg', 'price': 1000},
-            {'id': 'M.05', 'category': 'Bahan', 'name': 'Batu Belah', 'unit': 'M3', 'price': 300000},
-            {'id': 'M.06', 'category': 'Bahan', 'name': 'Bata Merah', 'unit': 'Bh', 'price': 1000},
-            {'id': 'M.07', 'category': 'Bahan', 'name': 'Bata Ringan', 'unit': 'Bh', 'price': 8500},
-            {'id': 'M.07b', 'category': 'Bahan', 'name': 'Batako', 'unit': 'Bh', 'price': 2500},
-            {'id': 'M.07c', 'category': 'Bahan', 'name': 'Roster Beton', 'unit': 'Bh', 'price': 15000},
-            {'id': 'M.08', 'category': 'Bahan', 'name': 'Besi Beton Polos', 'unit': 'Kg', 'price': 10900},
-            {'id': 'M.09', 'category': 'Bahan', 'name': 'Kawat Beton', 'unit': 'Kg', 'price': 15000},
-            {'id': 'M.10', 'category': 'Bahan', 'name': 'Paku Campur', 'unit': 'Kg', 'price': 25000},
-            {'id': 'M.11', 'category': 'Bahan', 'name': 'Kayu Papan Bekisting', 'unit': 'M3', 'price': 2407000},
-            {'id': 'M.12', 'category': 'Bahan', 'name': 'Kayu Kaso 5/7', 'unit': 'M3', 'price': 1800000},
-            {'id': 'M.13', 'category': 'Bahan', 'name': 'Multiplek 9mm', 'unit': 'Lbr', 'price': 125000},
-            {'id': 'M.14', 'category': 'Bahan', 'name': 'Minyak Bekisting', 'unit': 'Liter', 'price': 43300},
-            {'id': 'M.15', 'category': 'Bahan', 'name': 'Keramik 30x30', 'unit': 'M2', 'price': 65000},
-            {'id': 'M.15b', 'category': 'Bahan', 'name': 'Keramik 40x40', 'unit': 'M2', 'price': 75000},
-            {'id': 'M.15c', 'category': 'Bahan', 'name': 'Keramik 60x60', 'unit': 'M2', 'price': 120000},
-            {'id': 'M.16', 'category': 'Bahan', 'name': 'Semen Warna', 'unit': 'Kg', 'price': 20000},
-            {'id': 'M.17', 'category': 'Bahan', 'name': 'Cat Interior', 'unit': 'Kg', 'price': 50000},
-            {'id': 'M.17b', 'category': 'Bahan', 'name': 'Cat Eksterior', 'unit': 'Kg', 'price': 75000},
-            {'id': 'M.17c', 'category': 'Bahan', 'name': 'Cat Plafon', 'unit': 'Kg', 'price': 45000},
-            {'id': 'M.18', 'category': 'Bahan', 'name': 'Plamir', 'unit': 'Kg', 'price': 15000},
-            {'id': 'M.19', 'category': 'Bahan', 'name': 'Gypsum 9mm', 'unit': 'Lbr', 'price': 85000},
-            {'id': 'M.20', 'category': 'Bahan', 'name': 'Hollow 4x4', 'unit': 'Btg', 'price': 25000},
-            {'id': 'M.21', 'category': 'Bahan', 'name': 'Baja Ringan C75', 'unit': 'Btg', 'price': 75000},
-            {'id': 'M.22', 'category': 'Bahan', 'name': 'Reng Baja', 'unit': 'Btg', 'price': 35000},
-            {'id': 'M.23', 'category': 'Bahan', 'name': 'Atap Metal', 'unit': 'M2', 'price': 45000},
-            {'id': 'M.24', 'category': 'Bahan', 'name': 'Seng Gelombang', 'unit': 'Lbr', 'price': 50000},
-            
-            # Pintu Jendela
-            {'id': 'M.25', 'category': 'Bahan', 'name': 'Pintu UPVC', 'unit': 'Unit', 'price': 500000},
-            {'id': 'M.26', 'category': 'Bahan', 'name': 'Kusen Alum 4"', 'unit': 'M', 'price': 100000},
-            {'id': 'M.27', 'category': 'Bahan', 'name': 'Kaca 5mm', 'unit': 'M2', 'price': 120000},
-            {'id': 'M.28', 'category': 'Bahan', 'name': 'Engsel', 'unit': 'Bh', 'price': 25000},
-            
-            # MEP Materials
-            {'id': 'E.01', 'category': 'Bahan', 'name': 'Kabel NYM 3x2.5', 'unit': 'M', 'price': 12000},
-            {'id': 'E.02', 'category': 'Bahan', 'name': 'Saklar Tunggal', 'unit': 'Bh', 'price': 29000},
-            {'id': 'E.03', 'category': 'Bahan', 'name': 'Stop Kontak', 'unit': 'Bh', 'price': 27200},
-            {'id': 'E.04', 'category': 'Bahan', 'name': 'Lampu LED 14W', 'unit': 'Bh', 'price': 46681},
-            {'id': 'E.05', 'category': 'Bahan', 'name': 'Pipa Conduit', 'unit': 'Btg', 'price': 8000},
-            {'id': 'P.01', 'category': 'Bahan', 'name': 'Pipa PVC 3/4"', 'unit': 'Btg', 'price': 40000},
-            {'id': 'P.02', 'category': 'Bahan', 'name': 'Pipa PVC 4"', 'unit': 'Btg', 'price': 120000},
-            {'id': 'P.03', 'category': 'Bahan', 'name': 'Kloset Jongkok', 'unit': 'Bh', 'price': 500000},
-        ]
-        st.session_state.resources = pd.DataFrame(data_resources)
+        st.session_state.resources = shared_library()[0]
 
     # D. DATABASE AHSP MASTER (RESEP)
     if 'ahsp_master' not in st.session_state:
-        st.session_state.ahsp_master = {
-            'AHSP.P.01': {'name': 'Pagar Seng Gelombang', 'unit': 'm', 'components': [{'id': 'L.01', 'coef': 0.4}, {'id': 'L.02.2', 'coef': 0.2}, {'id': 'M.12', 'coef': 0.015}, {'id': 'M.24', 'coef': 1.2}, {'id': 'M.10', 'coef': 0.05}]},
-            'AHSP.T.01': {'name': 'Galian Tanah Manual 1m', 'unit': 'm3', 'components': [{'id': 'L.01', 'coef': 0.75}, {'id': 'L.04', 'coef': 0.025}]},
-            'AHSP.S.01': {'name': 'Beton K-200 (Manual)', 'unit': 'm3', 'components': [{'id': 'L.01', 'coef': 1.65}, {'id': 'L.02.1', 'coef': 0.275}, {'id': 'M.01', 'coef': 352}, {'id': 'M.02', 'coef': 731}, {'id': 'M.04', 'coef': 1031}]},
-            'AHSP.S.02': {'name': 'Pembesian Besi Polos', 'unit': 'kg', 'components': [{'id': 'L.01', 'coef': 0.007}, {'id': 'L.02.3', 'coef': 0.007}, {'id': 'M.08', 'coef': 1.05}, {'id': 'M.09', 'coef': 0.015}]},
-            'AHSP.S.03': {'name': 'Pasang Bekisting', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.66}, {'id': 'L.02.2', 'coef': 0.33}, {'id': 'M.11', 'coef': 0.04}, {'id': 'M.13', 'coef': 0.35}, {'id': 'M.14', 'coef': 0.1}]},
-            'AHSP.S.04': {'name': 'Pondasi Batu Belah 1:5', 'unit': 'm3', 'components': [{'id': 'L.01', 'coef': 1.5}, {'id': 'L.02.1', 'coef': 0.75}, {'id': 'M.05', 'coef': 1.2}, {'id': 'M.01', 'coef': 136}, {'id': 'M.03', 'coef': 0.544}]},
-            'AHSP.A.01': {'name': 'Pas. Bata Merah 1:5', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.3}, {'id': 'L.02.1', 'coef': 0.1}, {'id': 'M.06', 'coef': 70}, {'id': 'M.01', 'coef': 9.68}, {'id': 'M.03', 'coef': 0.045}]},
-            'AHSP.A.01b': {'name': 'Pas. Bata Ringan', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.2}, {'id': 'L.02.1', 'coef': 0.1}, {'id': 'M.07', 'coef': 8.5}, {'id': 'M.01b', 'coef': 4}]},
-            'AHSP.A.01c': {'name': 'Pas. Dinding Roster', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.3}, {'id': 'L.02.1', 'coef': 0.15}, {'id': 'M.07c', 'coef': 25}, {'id': 'M.01', 'coef': 11}]},
-            'AHSP.A.02': {'name': 'Plesteran 1:5', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.3}, {'id': 'L.02.1', 'coef': 0.15}, {'id': 'M.01', 'coef': 6.24}, {'id': 'M.03', 'coef': 0.024}]},
-            'AHSP.A.03': {'name': 'Acian Semen', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.2}, {'id': 'L.02.1', 'coef': 0.1}, {'id': 'M.01', 'coef': 3.25}]},
-            'AHSP.A.04': {'name': 'Pas. Keramik 30x30', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.7}, {'id': 'L.02.1', 'coef': 0.35}, {'id': 'M.15', 'coef': 1.05}, {'id': 'M.01', 'coef': 10}, {'id': 'M.16', 'coef': 1.5}]},
-            'AHSP.A.04b': {'name': 'Pas. Keramik 40x40', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.65}, {'id': 'L.02.1', 'coef': 0.35}, {'id': 'M.15b', 'coef': 1.05}, {'id': 'M.01', 'coef': 10}, {'id': 'M.16', 'coef': 1.5}]},
-            'AHSP.A.04c': {'name': 'Pas. Keramik 60x60', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.6}, {'id': 'L.02.1', 'coef': 0.35}, {'id': 'M.15c', 'coef': 1.05}, {'id': 'M.01', 'coef': 9}, {'id': 'M.16', 'coef': 1.5}]},
-            'AHSP.PL.01': {'name': 'Plafon Hollow+Gypsum', 'unit': 'm2', 'components': [{'id': 'L.02.2', 'coef': 0.35}, {'id': 'M.19', 'coef': 1.1}, {'id': 'M.20', 'coef': 3}, {'id': 'M.10', 'coef': 0.1}]},
-            'AHSP.CAT.01': {'name': 'Cat Dinding Interior', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.02}, {'id': 'L.02.4', 'coef': 0.063}, {'id': 'M.17', 'coef': 0.26}, {'id': 'M.18', 'coef': 0.1}]},
-            'AHSP.CAT.02': {'name': 'Cat Dinding Eksterior', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.03}, {'id': 'L.02.4', 'coef': 0.07}, {'id': 'M.17b', 'coef': 0.26}, {'id': 'M.18', 'coef': 0.1}]},
-            'AHSP.M.01': {'name': 'Titik Lampu', 'unit': 'ttk', 'components': [{'id': 'L.01', 'coef': 0.5}, {'id': 'L.02.5', 'coef': 0.5}, {'id': 'E.01', 'coef': 12}, {'id': 'E.05', 'coef': 3}]},
-            'AHSP.P.01': {'name': 'Pasang Kloset Jongkok', 'unit': 'bh', 'components': [{'id': 'L.02.1', 'coef': 1.5}, {'id': 'P.03', 'coef': 1}, {'id': 'M.01', 'coef': 6}]},
-            'AHSP.P.02': {'name': 'Instalasi Air Bersih', 'unit': 'm', 'components': [{'id': 'L.02.6', 'coef': 0.15}, {'id': 'P.01', 'coef': 1.2}]},
-        }
+        st.session_state.ahsp_master = AhspLibrary(shared_library()[1])
 
     # E. Data RAB
     if 'rab_data' not in st.session_state:
-        st.session_state.rab_data = [
-            {
-                "id": "A", "title": "PEKERJAAN PERSIAPAN",
-                "subgroups": [
-                    {
-                        "id": "A.1", "title": "Pekerjaan Pembersihan",
-                        "items": [
-                            {"name": "Pembersihan & Kupasan Lahan", "unit": "M2", "vol": 200.0, "ahsp": None, "manual_price": 12457.5},
-                            {"name": "Tebas Tebang Tanaman", "unit": "M2", "vol": 200.0, "ahsp": None, "manual_price": 3943.5},
-                            {"name": "Cabut Tunggul Pohon", "unit": "Bh", "vol": 10.0, "ahsp": None, "manual_price": 152903},
-                        ]
-                    },
-                    {
-                        "id": "A.2", "title": "Pekerjaan Bongkaran",
-                        "items": [
-                            {"name": "Bongkaran Batu Belah", "unit": "M3", "vol": 27.0, "ahsp": None, "manual_price": 152515},
-                            {"name": "Bongkar Beton Manual", "unit": "M3", "vol": 10.8, "ahsp": None, "manual_price": 168327},
-                            {"name": "Bongkaran Dinding Bata", "unit": "M3", "vol": 18.0, "ahsp": None, "manual_price": 21367.5},
-                            {"name": "Bongkaran Atap", "unit": "M2", "vol": 45.0, "ahsp": None, "manual_price": 13538.8},
-                        ]
-                    },
-                    {
-                        "id": "A.3", "title": "Fasilitas Sementara",
-                        "items": [
-                            {"name": "Pagar Seng Gelombang t=2m", "unit": "M'", "vol": 90.0, "ahsp": "AHSP.P.01", "manual_price": 0},
-                            {"name": "Direksi Keet / Gudang", "unit": "M2", "vol": 15.0, "ahsp": None, "manual_price": 330678},
-                            {"name": "Papan Nama Proyek", "unit": "Bh", "vol": 1.0, "ahsp": None, "manual_price": 373642},
-                            {"name": "Bouwplank / Pengukuran", "unit": "M'", "vol": 95.5, "ahsp": None, "manual_price": 17782.6},
-                        ]
-                    }
-                ]
-            },
-            {
-                "id": "B", "title": "PEKERJAAN STRUKTUR BAWAH",
-                "subgroups": [
-                    {
-                        "id": "B.1", "title": "Pekerjaan Tanah",
-                        "items": [
-                            {"name": "Galian Tanah Pondasi", "unit": "M3", "vol": 45.2, "ahsp": "AHSP.T.01", "manual_price": 0},
-                            {"name": "Urukan Pasir Bawah", "unit": "M3", "vol": 5.0, "ahsp": None, "manual_price": 187500},
-                            {"name": "Urukan Tanah Kembali", "unit": "M3", "vol": 15.0, "ahsp": None, "manual_price": 62287.5},
-                        ]
-                    },
-                    {
-                        "id": "B.2", "title": "Pekerjaan Pondasi",
-                        "items": [
-                            {"name": "Pondasi Batu Belah 1:5", "unit": "M3", "vol": 54.0, "ahsp": "AHSP.S.04", "manual_price": 0},
-                            {"name": "Footplat Beton (K-200)", "unit": "M3", "vol": 15.0, "ahsp": "AHSP.S.01", "manual_price": 0},
-                            {"name": "Pembesian Footplat", "unit": "Kg", "vol": 1800.0, "ahsp": "AHSP.S.02", "manual_price": 0},
-                            {"name": "Sloof Beton 20x30", "unit": "M3", "vol": 9.0, "ahsp": "AHSP.S.01", "manual_price": 0},
-                            {"name": "Pembesian Sloof", "unit": "Kg", "vol": 1250.0, "ahsp": "AHSP.S.02", "manual_price": 0},
-                            {"name": "Bekisting Sloof", "unit": "M2", "vol": 84.4, "ahsp": "AHSP.S.03", "manual_price": 0},
-                        ]
-                    }
-                ]
-            },
-            {
-                "id": "C", "title": "PEKERJAAN STRUKTUR ATAS",
-                "subgroups": [
-                    {
-                        "id": "C.1", "title": "Struktur Lantai 1",
-                        "items": [
-                            {"name": "Kolom K1 (40x40)", "unit": "M3", "vol": 5.6, "ahsp": "AHSP.S.01", "manual_price": 0},
-                            {"name": "Bekisting Kolom K1", "unit": "M2", "vol": 63.0, "ahsp": "AHSP.S.03", "manual_price": 0},
-                            {"name": "Pembesian Kolom K1", "unit": "Kg", "vol": 12557.0, "ahsp": "AHSP.S.02", "manual_price": 0},
-                            {"name": "Balok B1 (30x50)", "unit": "M3", "vol": 12.0, "ahsp": "AHSP.S.01", "manual_price": 0},
-                            {"name": "Bekisting Balok B1", "unit": "M2", "vol": 166.5, "ahsp": "AHSP.S.03", "manual_price": 0},
-                            {"name": "Plat Lantai 2 (12cm)", "unit": "M3", "vol": 7.92, "ahsp": "AHSP.S.01", "manual_price": 0},
-                        ]
-                    },
-                    {
-                        "id": "C.2", "title": "Struktur Lantai 2 & Atap",
-                        "items": [
-                            {"name": "Kolom K1 Lt.2", "unit": "M3", "vol": 5.6, "ahsp": "AHSP.S.01", "manual_price": 0},
-                            {"name": "Ring Balok", "unit": "M3", "vol": 19.75, "ahsp": "AHSP.S.01", "manual_price": 0},
-                            {"name": "Kolom Praktis", "unit": "M3", "vol": 1.5, "ahsp": "AHSP.S.01", "manual_price": 0},
-                            {"name": "Tangga Beton", "unit": "M3", "vol": 2.04, "ahsp": "AHSP.S.01", "manual_price": 0},
-                            {"name": "Pembesian Str Lt.2", "unit": "Kg", "vol": 12272.0, "ahsp": "AHSP.S.02", "manual_price": 0},
-                        ]
-                    }
-                ]
-            },
-            {
-                "id": "D", "title": "PEKERJAAN ARSITEKTUR",
-                "subgroups": [
-                    {
-                        "id": "D.1", "title": "Dinding",
-                        "items": [
-                            {"name": "Pas. Bata Merah Lt.1", "unit": "M2", "vol": 150.5, "ahsp": "AHSP.A.01", "manual_price": 0},
-                            {"name": "Pas. Bata Merah Lt.2", "unit": "M2", "vol": 109.5, "ahsp": "AHSP.A.01", "manual_price": 0},
-                            {"name": "Plesteran Dinding", "unit": "M2", "vol": 518.0, "ahsp": "AHSP.A.02", "manual_price": 0},
-                            {"name": "Acian Dinding", "unit": "M2", "vol": 518.0, "ahsp": "AHSP.A.03", "manual_price": 0},
-                            {"name": "Dinding Roster", "unit": "M2", "vol": 20.0, "ahsp": "AHSP.A.01c", "manual_price": 0},
-                        ]
-                    },
-                    {
-                        "id": "D.2", "title": "Lantai & Dinding",
-                        "items": [
-                            {"name": "Lantai Keramik 30x30", "unit": "M2", "vol": 85.0, "ahsp": "AHSP.A.04", "manual_price": 0},
-                            {"name": "Lantai Keramik 40x40", "unit": "M2", "vol": 33.0, "ahsp": "AHSP.A.04b", "manual_price": 0},
-                            {"name": "Lantai Keramik 60x60", "unit": "M2", "vol": 28.0, "ahsp": "AHSP.A.04c", "manual_price": 0},
-                            {"name": "Plint Keramik", "unit": "M'", "vol": 80.0, "ahsp": None, "manual_price": 44620},
-                        ]
-                    },
-                    {
-                        "id": "D.3", "title": "Plafon",
-                        "items": [
-                            {"name": "Rangka+Plafon Gypsum", "unit": "M2", "vol": 92.0, "ahsp": "AHSP.PL.01", "manual_price": 0},
-                            {"name": "List Plafon", "unit": "M'", "vol": 95.5, "ahsp": None, "manual_price": 18782},
-                        ]
-                    },
-                    {
-                        "id": "D.4", "title": "Pintu & Jendela",
-                        "items": [
-                            {"name": "Kusen Aluminium 4\"", "unit": "M'", "vol": 32.0, "ahsp": None, "manual_price": 154589},
-                            {"name": "Daun Pintu UPVC", "unit": "Bh", "vol": 6.0, "ahsp": None, "manual_price": 592860},
-                            {"name": "Jendela Kaca Frame Alu", "unit": "M2", "vol": 4.3, "ahsp": None, "manual_price": 327360},
-                            {"name": "Kaca Polos 5mm", "unit": "M2", "vol": 20.0, "ahsp": None, "manual_price": 73183},
-                            {"name": "Engsel Pintu", "unit": "Bh", "vol": 18.0, "ahsp": None, "manual_price": 44583},
-                            {"name": "Kunci Tanam", "unit": "Bh", "vol": 6.0, "ahsp": None, "manual_price": 112332},
-                        ]
-                    },
-                    {
-                        "id": "D.5", "title": "Pengecatan",
-                        "items": [
-                            {"name": "Cat Dinding Interior", "unit": "M2", "vol": 301.0, "ahsp": "AHSP.CAT.01", "manual_price": 0},
-                            {"name": "Cat Dinding Eksterior", "unit": "M2", "vol": 100.0, "ahsp": "AHSP.CAT.02", "manual_price": 0},
-                            {"name": "Cat Plafon", "unit": "M2", "vol": 92.0, "ahsp": None, "manual_price": 32539},
-                        ]
-                    }
-                ]
-            },
-            {
-                "id": "E", "title": "MEKANIKAL & ELEKTRIKAL",
-                "subgroups": [
-                    {
-                        "id": "E.1", "title": "Armatur Lampu",
-                        "items": [
-                            {"name": "Downlight 5 Inch LED", "unit": "Unit", "vol": 10.0, "ahsp": None, "manual_price": 46681.8},
-                            {"name": "Fitting E27 + LED", "unit": "Unit", "vol": 25.0, "ahsp": None, "manual_price": 70881.8},
-                            {"name": "Lampu Sorot LED 100W", "unit": "Unit", "vol": 2.0, "ahsp": None, "manual_price": 69132.8},
-                            {"name": "Lampu Taman+Tiang", "unit": "Unit", "vol": 18.0, "ahsp": None, "manual_price": 101139},
-                            {"name": "Lampu PJU Kawasan", "unit": "Unit", "vol": 18.0, "ahsp": None, "manual_price": 738614},
-                        ]
-                    },
-                    {
-                        "id": "E.2", "title": "Instalasi",
-                        "items": [
-                            {"name": "Instalasi Lampu", "unit": "Titik", "vol": 100.0, "ahsp": "AHSP.M.01", "manual_price": 0},
-                            {"name": "Instalasi Lampu Taman", "unit": "Titik", "vol": 10.0, "ahsp": None, "manual_price": 258126},
-                            {"name": "Instalasi PJU", "unit": "Titik", "vol": 4.0, "ahsp": None, "manual_price": 421476},
-                        ]
-                    },
-                    {
-                        "id": "E.3", "title": "Saklar & Stop Kontak",
-                        "items": [
-                            {"name": "Saklar Tunggal", "unit": "Unit", "vol": 20.0, "ahsp": None, "manual_price": 29025.7},
-                            {"name": "Saklar Ganda", "unit": "Unit", "vol": 20.0, "ahsp": None, "manual_price": 29025.7},
-                            {"name": "Stop Kontak", "unit": "Unit", "vol": 30.0, "ahsp": None, "manual_price": 27199.7},
-                            {"name": "MCB Box", "unit": "Unit", "vol": 4.0, "ahsp": None, "manual_price": 489802},
-                        ]
-                    },
-                    {
-                        "id": "E.4", "title": "Tata Udara (AC)",
-                        "items": [
-                            {"name": "AC Split 1/2 PK", "unit": "Unit", "vol": 4.0, "ahsp": None, "manual_price": 871138},
-                            {"name": "AC Split 1 PK", "unit": "Unit", "vol": 3.0, "ahsp": None, "manual_price": 917060},
-                            {"name": "Stop Kontak AC", "unit": "Unit", "vol": 6.0, "ahsp": None, "manual_price": 37483},
-                        ]
-                    }
-                ]
-            },
-            {
-                "id": "F", "title": "PLUMBING & SANITAIR",
-                "subgroups": [
-                    {
-                        "id": "F.1", "title": "Sanitair",
-                        "items": [
-                            {"name": "Closet Duduk", "unit": "Bh", "vol": 2.0, "ahsp": None, "manual_price": 885390},
-                            {"name": "Closet Jongkok", "unit": "Bh", "vol": 1.0, "ahsp": "AHSP.P.01", "manual_price": 0},
-                            {"name": "Floor Drain", "unit": "Bh", "vol": 6.0, "ahsp": None, "manual_price": 37050},
-                            {"name": "Kran Air 1/2", "unit": "Bh", "vol": 10.0, "ahsp": None, "manual_price": 78960},
-                            {"name": "Jet Washer", "unit": "Bh", "vol": 4.0, "ahsp": None, "manual_price": 67960},
-                        ]
-                    },
-                    {
-                        "id": "F.2", "title": "Perpipaan & Pompa",
-                        "items": [
-                            {"name": "Pipa PVC AW 1/2\"", "unit": "M'", "vol": 20.0, "ahsp": None, "manual_price": 37822},
-                            {"name": "Pipa PVC AW 3/4\"", "unit": "M'", "vol": 10.0, "ahsp": "AHSP.P.02", "manual_price": 0},
-                            {"name": "Pipa PVC D 4\" (Kotor)", "unit": "M'", "vol": 20.0, "ahsp": None, "manual_price": 89736},
-                            {"name": "Pompa Transfer", "unit": "Bh", "vol": 2.0, "ahsp": None, "manual_price": 1381751},
-                            {"name": "Pompa Booster", "unit": "Bh", "vol": 1.0, "ahsp": None, "manual_price": 1245424},
-                            {"name": "Septictank & Resapan", "unit": "Ls", "vol": 1.0, "ahsp": None, "manual_price": 3500000},
-                        ]
-                    }
-                ]
-            }
-        ]
+        st.session_state.rab_data = copy.deepcopy(DEFAULT_RAB_DATA)
 
 init_state()
+lap("init_state")
 
 # ==========================================
 # 4. LOGIC ENGINE (THE CALCULATOR)
 # ==========================================
-def calculate_ahsp_price(ahsp_id, res_map):
-    """Menghitung harga satuan AHSP dengan Resource Map yang dioptimasi"""
-    recipe = st.session_state.ahsp_master.get(ahsp_id)
-    if not recipe: return 0
-    
-    total = 0
-    for comp in recipe['components']:
-        # Ambil harga dari map, jika tidak ada (misal dihapus), return 0
-        price = res_map.get(comp['id'], 0)
-        total += price * comp['coef']
-    return total
-
 def recalculate_totals():
-    """Menghitung ulang seluruh RAB (Core Logic)"""
-    grand_total_fisik = 0
-    chart_data = []
-
-    # 1. Buat Mapping Resource SEKALI SAJA di awal agar cepat
-    # Ini adalah kunci agar tidak perlu loop dataframe berkali-kali
-    res_map = st.session_state.resources.set_index('id')['price'].to_dict()
-
-    for group in st.session_state.rab_data:
-        group_total = 0
-        
-        if 'subgroups' in group:
-            for sub in group['subgroups']:
-                sub_total = 0
-                for item in sub['items']:
-                    # LOGIKA UTAMA: LINKING AHSP -> HARGA SATUAN
-                    if item.get('ahsp') and item['ahsp'] in st.session_state.ahsp_master:
-                        # Pass res_map ke fungsi hitung
-                        unit_price = calculate_ahsp_price(item['ahsp'], res_map)
-                    else:
-                        unit_price = item.get('manual_price', 0)
-                    
-                    # UPDATE DATA DI STATE
-                    item['current_price'] = unit_price
-                    item['total_price'] = unit_price * item['vol']
-                    sub_total += item['total_price']
-                
-                sub['sub_total'] = sub_total
-                group_total += sub_total
-        
-        group['group_total'] = group_total
-        grand_total_fisik += group_total
-        chart_data.append({"Divisi": group['title'], "Total": group_total})
-
-    profit = grand_total_fisik * (st.session_state.tax_settings['profit'] / 100)
-    subtotal = grand_total_fisik + profit
-    ppn = subtotal * (st.session_state.tax_settings['ppn'] / 100)
-    final_total = subtotal + ppn
-
-    return grand_total_fisik, profit, ppn, final_total, chart_data
+    """Menghitung ulang seluruh RAB dari nol dan membangun ulang indeks dependensi"""
+    resources = st.session_state.resources
+    base_resources, _, base_maps = shared_library()
+    # Tabel harga library yang belum diedit: lookup harga bersama juga dipakai ulang
+    st.session_state.calc_index = DependencyIndex(
+        st.session_state.rab_data, st.session_state.ahsp_master,
+        base_maps if resources is base_resources else resources,
+    )
+    return st.session_state.calc_index.totals(st.session_state.tax_settings)
 
 # === PENTING: JALANKAN KALKULASI SEBELUM RENDER UI AGAR HARGA TIDAK 0 ===
-real_cost, val_profit, val_ppn, val_final, chart_data = recalculate_totals()
+# Kalkulasi penuh hanya sekali per sesi; selanjutnya indeks diperbarui inkremental
+if 'calc_index' not in st.session_state:
+    real_cost, val_profit, val_ppn, val_final, chart_data = recalculate_totals()
+else:
+    real_cost, val_profit, val_ppn, val_final, chart_data = st.session_state.calc_index.totals(st.session_state.tax_settings)
+lap("recalculate")
 
 # ==========================================
 # 5. FUNGSI UTILITAS NAVIGASI
@@ -449,67 +169,619 @@ real_cost, val_profit, val_ppn, val_final, chart_data = recalculate_totals()
 def pindah_ke_ahsp():
     st.session_state.sb_menu = "Analisa AHSP"
 
+def item_store():
+    """ItemStore (kolom ringkas) sesi ini, disegarkan hanya pada Sub yang versinya berubah"""
+    store = st.session_state.get('item_store')
+    if store is None:
+        store = st.session_state.item_store = ItemStore()
+    with phase("item_store"):
+        store.sync(st.session_state.rab_data, st.session_state.calc_index)
+    return store
+
+def sub_frame(store, g_idx, s_idx):
+    """DataFrame item satu Sub untuk editor: potongan dari ItemStore, tanpa cache per Sub"""
+    return store.frame(store.sub_rows(g_idx, s_idx), with_position=False)
+
+def apply_editor_delta(g_idx, s_idx, editor_key):
+    """Callback editor: terapkan baris yang diubah/ditambah/dihapus langsung ke model"""
+    perf_callback()
+    delta = st.session_state[editor_key]
+    st.session_state.calc_index.apply_item_delta(
+        g_idx, s_idx,
+        edited_rows=delta.get('edited_rows'),
+        added_rows=delta.get('added_rows'),
+        deleted_rows=delta.get('deleted_rows'),
+    )
+
+# Selector kode hanya menerima satu halaman hasil pencarian, bukan seluruh library
+SEARCH_PAGE = 30
+
+def code_picker(label, indexes, key, boost=None):
+    """Selectbox kode berbasis pencarian (kode / uraian / satuan, toleran salah ketik)"""
+    c1, c2 = st.columns([3, 1])
+    with c1: query = st.text_input(f"🔎 Cari {label}", key=f"{key}_query", placeholder="kode / uraian / satuan")
+    page = st.session_state.get(f"{key}_page", 1)
+    rows, n_hits, n_pages = search_codes(query, indexes, page=page, page_size=SEARCH_PAGE, boost=boost)
+    page = min(page, n_pages)
+    with c2: st.number_input("Halaman", min_value=1, max_value=n_pages, value=page, step=1, key=f"{key}_page")
+    st.caption(f"{n_hits} kode cocok · halaman {page} dari {n_pages}")
+    labels = {row['id']: f"{row['id']} · {row['name']} ({row['unit']})" for row in rows}
+    return st.selectbox(label, list(labels), format_func=labels.get, key=key)
+
+def ahsp_column(candidates, used):
+    """Kolom Analisa satu editor: kandidat hasil pencarian + kode yang sudah dipakai di baris editor itu"""
+    extra = sorted({code for code in used if isinstance(code, str) and code} - set(candidates))
+    ahsp_master = st.session_state.ahsp_master
+    return st.column_config.SelectboxColumn(
+        "Analisa (AHSP)",
+        options=[None] + candidates + extra,
+        format_func=lambda code: "-" if code is None else f"{code} · {ahsp_master[code]['name']}" if code in ahsp_master else code,
+        width="medium",
+    )
+
+VIEW_FLAT = "Grid Datar (Proyek Besar)"
+FLAT_SORTS = {"Urutan RAB": None, "Uraian": "name", "Volume": "vol", "Harga Satuan": "current_price", "Total": "total_price"}
+
+def apply_flat_delta(editor_key, positions):
+    """Callback grid datar: baris halaman -> posisi asli (g_idx, s_idx, i_idx), lalu delta per Sub"""
+    perf_callback()
+    by_sub = defaultdict(dict)
+    for row, changes in st.session_state[editor_key].get('edited_rows', {}).items():
+        g_idx, s_idx, i_idx = positions[int(row)]
+        by_sub[(g_idx, s_idx)][i_idx] = changes
+    for (g_idx, s_idx), edited_rows in by_sub.items():
+        st.session_state.calc_index.apply_item_delta(g_idx, s_idx, edited_rows=edited_rows)
+
+def render_flat_grid(item_columns, ahsp_candidates):
+    """Seluruh RAB dalam SATU tabel berhalaman: biaya render dibatasi ukuran halaman, bukan ukuran proyek"""
+    calc_index = st.session_state.calc_index
+    store = item_store()
+
+    f1, f2, f3, f4, f5 = st.columns([3, 1, 2, 1, 1])
+    with f1: text = st.text_input("Cari (Uraian / Kode AHSP)", key="flat_text")
+    with f2: divisi = st.selectbox(
+        "Divisi", [None] + [group['id'] for group in st.session_state.rab_data],
+        format_func=lambda g_id: "Semua" if g_id is None else g_id, key="flat_divisi"
+    )
+    with f3: sort_label = st.selectbox("Urutkan", list(FLAT_SORTS), key="flat_sort")
+    with f4: descending = st.checkbox("Menurun", key="flat_desc")
+    with f5: page_size = st.selectbox("Baris/Hal", [50, 100, 200, 500], index=1, key="flat_page_size")
+
+    page = st.session_state.get('flat_page', 1)
+    page_df, n_rows, n_pages = query_items(
+        store, text, divisi, FLAT_SORTS[sort_label], not descending, page, page_size
+    )
+    page = min(page, n_pages)
+
+    # Hanya baris halaman ini yang dikirim ke browser
+    editor_key = f"flat_editor_{calc_index.version}"
+    st.data_editor(
+        page_df,
+        column_config={
+            **item_columns,
+            "ahsp": ahsp_column(ahsp_candidates, page_df['ahsp']),
+            "divisi": st.column_config.TextColumn("Divisi", disabled=True, width="small"),
+            "sub": st.column_config.TextColumn("Sub", disabled=True, width="small"),
+        },
+        column_order=("divisi", "sub") + ITEM_COLUMNS,
+        hide_index=True,
+        use_container_width=True,
+        num_rows="fixed",
+        key=editor_key,
+        on_change=apply_flat_delta,
+        args=(editor_key, page_df[list(FLAT_KEY_COLUMNS)].to_numpy().tolist())
+    )
+
+    c1, c2 = st.columns([1, 3])
+    with c1: st.number_input("Halaman", min_value=1, max_value=n_pages, value=page, step=1, key="flat_page")
+    with c2: st.caption(f"{n_rows} item lolos filter · halaman {page} dari {n_pages}")
+
+def current_project():
+    """Tampilan Project (rab_engine) atas data di session state, tanpa menyalin data"""
+    return Project(
+        st.session_state.project_info, st.session_state.tax_settings, st.session_state.resources,
+        st.session_state.ahsp_master, st.session_state.rab_data, index=st.session_state.calc_index
+    )
+
+def export_key(project):
+    """Kunci cache hasil export: versi data + info proyek + pajak"""
+    return (
+        project.index.version,
+        json.dumps(project.project_info, sort_keys=True), json.dumps(project.tax_settings, sort_keys=True),
+    )
+
+def cached_exporter(kind, build):
+    """Callable untuk st.download_button: file dibuat hanya saat diminta, cache per versi data"""
+    project = current_project()
+    key = export_key(project)
+    cache = st.session_state.setdefault('export_cache', {})
+    recorder = st.session_state.perf
+
+    def export():
+        # Berjalan di thread terpisah: hanya memakai objek yang sudah ditangkap di sini
+        entry = cache.get(kind)
+        if entry is None or entry[0] != key:
+            start = time.perf_counter()
+            entry = (key, build(project))
+            cache[kind] = entry
+            recorder.note(f"export {kind}", (time.perf_counter() - start) * 1000)
+        return entry[1]
+    return export
+
+def project_json_exporter(compact):
+    return cached_exporter(('json', compact), lambda project: project.to_json(compact=compact))
+
+def build_excel(project):
+    buf = io.BytesIO()
+    export_excel(project, buf)
+    return buf.getvalue()
+
+def import_library(price_df, recipes, remove_missing=False):
+    """Gabungkan hasil import Excel ke Database Harga & AHSP, lalu hitung ulang yang terdampak"""
+    index = st.session_state.calc_index
+    resources, res_report = st.session_state.resources, {"added": 0, "changed": 0, "removed": 0}
+    if price_df is not None:
+        resources, res_report = upsert_resources(resources, price_df, remove_missing)
+    res_ids = set(resources['id'].tolist())
+    # Cek siklus sub-analisa SEBELUM data diubah (melempar AhspCycleError)
+    ahsp_order({**st.session_state.ahsp_master, **recipes}, res_ids)
+
+    if price_df is not None:
+        st.session_state.resources = resources
+        index.update_resources(resources)
+    touched, ahsp_report = upsert_ahsp(st.session_state.ahsp_master, recipes)
+    index.update_ahsp(*touched)
+
+    known = res_ids | st.session_state.ahsp_master.keys()
+    dangling = sorted({c['id'] for a in touched for c in st.session_state.ahsp_master[a]['components']} - known)
+    return res_report, ahsp_report, dangling
+
+def takeoff_table():
+    """Tabel takeoff per Divisi, dihitung ulang hanya bila versi data berubah"""
+    index = st.session_state.calc_index
+    cached = st.session_state.get('takeoff_cache')
+    if cached is None or cached[0] != index.version:
+        cached = (index.version, takeoff_frame(index.takeoff(), st.session_state.rab_data, index.res_maps.resources))
+        st.session_state.takeoff_cache = cached
+    return cached[1]
+
+def cost_cube():
+    """Kubus biaya sesi ini, disegarkan inkremental dari indeks kalkulasi"""
+    cube = st.session_state.get('cost_cube')
+    if cube is None:
+        cube = st.session_state.cost_cube = CostCube()
+    with phase("cost_cube"):
+        cube.sync(st.session_state.calc_index)
+    return cube
+
+def cached_figure(name, params, build):
+    """Figure plotly dipakai ulang selama versi data & parameter grafik sama"""
+    cache = st.session_state.setdefault('figure_cache', {})
+    key = (st.session_state.calc_index.version, params)
+    entry = cache.get(name)
+    if entry is None or entry[0] != key:
+        with phase("figure"):
+            entry = (key, build())
+        cache[name] = entry
+    return entry[1]
+
+CHART_KINDS = ("Per Divisi", "Treemap", "Sunburst Kategori", "Top Item")
+
+def cost_figure(kind, g_idx, top):
+    """Grafik distribusi biaya dari rollup kubus (bukan per item), opsional satu Divisi"""
+    cube = cost_cube()
+    divisi = None if g_idx is None else cube.table['divisi'].cat.categories[g_idx]
+    if kind == "Per Divisi":
+        level = "divisi" if divisi is None else "sub"
+        frame = cube.rollup((level,), divisi).astype({level: str})
+        return px.bar(frame, x=level, y='cost', color=level, text_auto='.2s', labels={level: "", 'cost': "Total"})
+    if kind == "Treemap":
+        # Satu Divisi: resource teratas per Sub & kategori; seluruh proyek: berhenti di kategori
+        if divisi is None:
+            frame = cube.rollup(("divisi", "sub", "category")).astype({"divisi": str, "sub": str, "category": str})
+            path = ["divisi", "sub", "category"]
+        else:
+            frame = top_n(cube.rollup(("sub", "category", "resource"), divisi), "resource", top, group=["sub", "category"])
+            frame = frame.astype({"sub": str, "category": str})
+            path = ["sub", "category", "resource"]
+        # Luas area tidak bisa negatif: sisa Harga Manual negatif (pembulatan) tidak digambar
+        return px.treemap(frame[frame['cost'] > 0], path=path, values='cost')
+    if kind == "Sunburst Kategori":
+        frame = top_n(cube.rollup(("category", "resource"), divisi), "resource", top, group=["category"])
+        frame = frame[frame['cost'] > 0]
+        return px.sunburst(frame.astype({"category": str}), path=["category", "resource"], values='cost')
+    store = item_store()
+    frame = top_items(store, top, None if g_idx is None else store.group_ids[g_idx])
+    frame['label'] = frame['name'].astype(str).str.slice(0, 40)
+    fig = px.bar(frame, x='total_price', y='label', orientation='h', hover_data=['divisi', 'sub', 'vol', 'unit'],
+                 labels={'total_price': "Total", 'label': ""})
+    fig.update_yaxes(autorange="reversed")
+    return fig
+
+SCHEDULE_PROFILE_LABELS = {"linear": "Merata", "front": "Awal (front-loaded)", "back": "Akhir (back-loaded)", "bell": "Kurva S (lambat-cepat-lambat)"}
+SCHEDULE_VIEWS = ("Kurva S", "Per Divisi")
+
+def cost_schedule():
+    """Jadwal biaya sesi ini; hanya Sub yang versi / jadwalnya berubah yang disebar ulang"""
+    schedule = st.session_state.get('cost_schedule')
+    if schedule is None:
+        schedule = st.session_state.cost_schedule = CostSchedule()
+    with phase("schedule"):
+        schedule.sync(st.session_state.calc_index, project_weeks(st.session_state.project_info))
+    return schedule
+
+def schedule_editor_frame():
+    """Satu baris per Sub: jadwal yang diisi user (kosong = ikut durasi proyek) + total Sub"""
+    rows = []
+    for g_idx, group in enumerate(st.session_state.rab_data):
+        for s_idx, sub in enumerate(group.get('subgroups', [])):
+            rows.append({"g_idx": g_idx, "s_idx": s_idx, "divisi": group['id'], "sub": sub['id'], "title": sub['title'],
+                         "total_price": sub.get('sub_total', 0), **{f: sub.get(f) for f in SCHEDULE_FIELDS}})
+    return pd.DataFrame(rows, columns=["g_idx", "s_idx", "divisi", "sub", "title", "total_price", *SCHEDULE_FIELDS])
+
+def apply_schedule_delta(editor_key, positions):
+    """Callback editor jadwal: field jadwal Sub diperbarui lewat indeks (versi Sub naik)"""
+    perf_callback()
+    for row, changes in st.session_state[editor_key].get('edited_rows', {}).items():
+        g_idx, s_idx = positions[int(row)]
+        fields = {key: changes[key] for key in SCHEDULE_FIELDS if key in changes}
+        for key in ("start", "duration"):
+            if key in fields and fields[key] is not None and fields[key] == fields[key]:
+                fields[key] = max(1, int(fields[key]))
+        st.session_state.calc_index.update_sub_fields(g_idx, s_idx, fields)
+
+def schedule_figure(schedule, view):
+    """Batang bobot mingguan (atau biaya per Divisi) + garis bobot kumulatif di sumbu kanan"""
+    frame = schedule.frame()
+    if view == "Per Divisi":
+        fig = px.bar(schedule.division_frame(st.session_state.rab_data), x='week', y='cost', color='divisi',
+                     labels={'week': "Minggu", 'cost': "Biaya (Rp)", 'divisi': ""})
+    else:
+        fig = px.bar(frame, x='week', y='weight', labels={'week': "Minggu", 'weight': "Bobot (%)"})
+    fig.add_scatter(x=frame['week'], y=frame['cum_weight'], mode='lines+markers', name="Kumulatif (%)", yaxis='y2')
+    fig.update_layout(yaxis2=dict(title="Kumulatif (%)", overlaying='y', side='right', range=[0, 105]),
+                      legend=dict(orientation='h', y=-0.2))
+    return fig
+
+def build_schedule_export(project, kind):
+    """Export jadwal (dipanggil di thread download): kurva S .xlsx atau matriks item x minggu .csv"""
+    schedule = CostSchedule()
+    schedule.sync(project.index, project_weeks(project.project_info))
+    if kind == 'xlsx':
+        buf = io.BytesIO()
+        export_schedule_excel(schedule.frame(), schedule.sub_table(project.rab_data), buf)
+        return buf.getvalue()
+    return schedule.item_table(project.rab_data).to_csv(index=False).encode('utf-8')
+
+def takeoff_excel(frame):
+    buf = io.BytesIO()
+    export_takeoff_excel(frame, buf)
+    return buf.getvalue()
+
+# Distribusi awal simulasi risiko (persen perubahan harga terhadap Database Harga)
+RISK_DEFAULT_SPECS = [
+    {"target": "M.08", "dist": "triangular", "low": -10.0, "mode": 0.0, "high": 25.0, "sd": 0.0, "per_resource": False},
+    {"target": "M.01", "dist": "triangular", "low": -5.0, "mode": 0.0, "high": 15.0, "sd": 0.0, "per_resource": False},
+    {"target": "Upah", "dist": "uniform", "low": -5.0, "mode": 0.0, "high": 10.0, "sd": 0.0, "per_resource": False},
+]
+
+def render_risk_panel():
+    """Simulasi Monte Carlo Grand Total + sensitivitas; hasil di-cache per versi data & input"""
+    st.caption(
+        "Target: kode resource (M.08), kategori (Upah) atau pola kode (L.*). Nilai dalam % perubahan harga; "
+        "'normal' memakai Modus sebagai rata-rata dan SD sebagai simpangan baku."
+    )
+    specs_df = st.data_editor(
+        pd.DataFrame(RISK_DEFAULT_SPECS),
+        column_config={
+            "target": st.column_config.TextColumn("Target", required=True),
+            "dist": st.column_config.SelectboxColumn("Distribusi", options=list(DISTRIBUTIONS), required=True),
+            "low": st.column_config.NumberColumn("Min %"),
+            "mode": st.column_config.NumberColumn("Modus %"),
+            "high": st.column_config.NumberColumn("Max %"),
+            "sd": st.column_config.NumberColumn("SD %", min_value=0.0),
+            "per_resource": st.column_config.CheckboxColumn("Independen per resource"),
+        },
+        num_rows="dynamic", use_container_width=True, key="risk_specs",
+    )
+    c1, c2, c3 = st.columns([1, 1, 2])
+    with c1: n_scenarios = st.number_input("Jumlah skenario", min_value=100, max_value=200000, value=10000, step=1000)
+    with c2: seed = st.number_input("Seed", min_value=0, value=42, step=1)
+
+    specs = [
+        {k: (v if not isinstance(v, float) or v == v else 0.0) for k, v in row.items()}
+        for row in specs_df.to_dict('records') if row.get('target')
+    ]
+    project = current_project()
+    key = (export_key(project), json.dumps(specs, sort_keys=True, default=str), n_scenarios, seed)
+    with c3:
+        st.write("")
+        if st.button("▶️ Jalankan Simulasi", disabled=not specs):
+            try:
+                st.session_state.risk_result = (key, simulate_cost_risk(project, specs, int(n_scenarios), int(seed)))
+            except ValueError as e:
+                st.error(str(e))
+
+    cached = st.session_state.get('risk_result')
+    if cached is None or cached[0] != key:
+        return
+    result = cached[1]
+    pct = result['percentiles']
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Deterministik", format_idr(result['base']))
+    for col, p in zip((m2, m3, m4), (10, 50, 90)):
+        col.metric(f"P{p}", format_idr(pct[p]), f"{(pct[p] / result['base'] - 1) * 100:+.1f}%" if result['base'] else None)
+
+    t1, t2, t3 = st.tabs(["Distribusi Grand Total", "Driver (Tornado)", "Sensitivitas per Resource"])
+    with t1:
+        fig = px.histogram(x=result['totals'], nbins=60, labels={'x': 'Grand Total (Rp)'})
+        for p in (10, 50, 90):
+            fig.add_vline(x=pct[p], line_dash="dash", annotation_text=f"P{p}")
+        st.plotly_chart(fig, use_container_width=True)
+    with t2:
+        top = result['drivers'].head(15)
+        tornado = pd.concat([
+            pd.DataFrame({"Driver": top['driver'], "Dampak (Rp)": top['impact_p10'], "Skenario": "P10 harga"}),
+            pd.DataFrame({"Driver": top['driver'], "Dampak (Rp)": top['impact_p90'], "Skenario": "P90 harga"}),
+        ])
+        fig = px.bar(tornado, x="Dampak (Rp)", y="Driver", color="Skenario", orientation='h', barmode='overlay')
+        fig.update_yaxes(autorange="reversed")
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(result['drivers'], use_container_width=True, hide_index=True)
+    with t3:
+        st.caption("Eksposur = biaya fisik yang bergantung pada harga resource; kolom terakhir = kenaikan Grand Total per +1% harga.")
+        st.dataframe(resource_sensitivity(project).head(50), use_container_width=True, hide_index=True)
+
 # ==========================================
-# 6. PDF ENGINE (FPDF)
+# 6. LAPORAN PDF (WORKER LATAR BELAKANG)
 # ==========================================
-class PDFReport(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 14)
-        self.cell(0, 10, f"REKAPITULASI RAB: {st.session_state.project_info['name'].upper()}", 0, 1, 'C')
-        self.set_font('Arial', 'I', 10)
-        self.cell(0, 10, f"Lokasi: {st.session_state.project_info['location']} | Owner: {st.session_state.project_info['owner']}", 0, 1, 'C')
-        self.line(10, 30, 200, 30)
-        self.ln(10)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
-
-def generate_pdf():
-    pdf = PDFReport()
-    pdf.add_page()
-    pdf.set_font("Arial", size=10)
-    
-    # Header Table
-    pdf.set_fill_color(240, 240, 240)
-    pdf.set_font("Arial", 'B', 10)
-    pdf.cell(15, 10, "NO", 1, 0, 'C', 1)
-    pdf.cell(120, 10, "URAIAN PEKERJAAN", 1, 0, 'C', 1)
-    pdf.cell(55, 10, "JUMLAH (Rp)", 1, 1, 'C', 1)
-    
-    # Body
-    pdf.set_font("Arial", size=10)
-    for group in st.session_state.rab_data:
-        pdf.set_font("Arial", 'B', 10)
-        pdf.cell(15, 8, group['id'], 1, 0, 'C')
-        pdf.cell(120, 8, group['title'], 1, 0, 'L')
-        pdf.cell(55, 8, f"{group['group_total']:,.0f}", 1, 1, 'R')
-        
-        for sub in group['subgroups']:
-            pdf.set_font("Arial", 'I', 9)
-            pdf.cell(15, 6, "", 1, 0)
-            pdf.cell(120, 6, f"  > {sub['title']}", 1, 0, 'L')
-            pdf.cell(55, 6, f"{sub['sub_total']:,.0f}", 1, 1, 'R')
-
-    # Footer Totals
-    pdf.ln(5)
-    pdf.set_font("Arial", 'B', 10)
-    pdf.cell(135, 8, "REAL COST (FISIK)", 1, 0, 'R')
-    pdf.cell(55, 8, f"{real_cost:,.0f}", 1, 1, 'R')
-    pdf.cell(135, 8, f"PROFIT ({st.session_state.tax_settings['profit']}%)", 1, 0, 'R')
-    pdf.cell(55, 8, f"{val_profit:,.0f}", 1, 1, 'R')
-    pdf.cell(135, 8, f"PPN ({st.session_state.tax_settings['ppn']}%)", 1, 0, 'R')
-    pdf.cell(55, 8, f"{val_ppn:,.0f}", 1, 1, 'R')
-    
-    pdf.set_fill_color(230, 240, 255)
-    pdf.cell(135, 10, "GRAND TOTAL", 1, 0, 'R', 1)
-    pdf.cell(55, 10, f"{val_final:,.0f}", 1, 1, 'R', 1)
-    
-    return pdf.output(dest='S').encode('latin-1')
+@st.cache_resource
+def pdf_executor():
+    """Thread pool bersama (per proses server) untuk membuat PDF tanpa memblokir UI"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="rab-pdf")
+
+def start_pdf_job(project, key):
+    """Kirim pembuatan PDF ke worker atas salinan data (user bisa terus mengedit)"""
+    snapshot = Project(
+        copy.deepcopy(project.project_info), copy.deepcopy(project.tax_settings), project.resources.copy(),
+        copy.deepcopy(project.ahsp_master), copy.deepcopy(project.rab_data),
+    )
+    state = {"progress": 0.0}
+    future = pdf_executor().submit(build_pdf, snapshot, lambda frac: state.update(progress=frac))
+    st.session_state.pdf_job = {"key": key, "future": future, "state": state}
+
+def pdf_job_running():
+    job = st.session_state.get('pdf_job')
+    return job is not None and not job['future'].done()
+
+def pdf_panel():
+    """Tombol PDF: buat di latar belakang dengan progres, hasil di-cache per versi data"""
+    project = current_project()
+    key = export_key(project)
+    cache = st.session_state.setdefault('export_cache', {})
+    job = st.session_state.get('pdf_job')
+
+    if job is not None and job['future'].done():
+        del st.session_state.pdf_job
+        try:
+            data = job['future'].result()
+        except Exception as e:
+            st.session_state.pdf_error = f"Gagal membuat PDF: {e}"
+        else:
+            cache['pdf'] = (job['key'], data)
+        # Rerun penuh agar polling fragment berhenti
+        st.rerun()
+
+    if 'pdf_error' in st.session_state:
+        st.error(st.session_state.pop('pdf_error'))
+    entry = cache.get('pdf')
+    if entry is not None and entry[0] == key:
+        st.download_button("📥 Unduh PDF", entry[1], "Laporan_RAB.pdf", "application/pdf")
+    elif job is not None and job['key'] == key:
+        frac = job['state']['progress']
+        st.progress(frac, text=f"Membuat PDF... {frac:.0%}")
+    elif st.button("🖨️ Generate PDF Laporan"):
+        start_pdf_job(project, key)
+        st.rerun()
+
+# ==========================================
+# 7. PENYIMPANAN SERVER (SQLITE)
+# ==========================================
+@st.cache_resource
+def project_store():
+    """Database proyek bersama (per proses server); lokasi file lewat env RAB_DB_PATH"""
+    return ProjectStore(os.environ.get("RAB_DB_PATH", "rab_projects.db"))
+
+def open_stored_project(project_id):
+    """Memuat proyek dari database ke session state; autosave berikutnya menulis ke proyek ini"""
+    project, state = project_store().load_project(project_id)
+    # Editor & total membutuhkan indeks lengkap: semua Divisi dimuat di sini
+    project.totals()
+    st.session_state.project_info = project.project_info
+    st.session_state.tax_settings = project.tax_settings
+    st.session_state.resources = project.resources
+    st.session_state.ahsp_master = project.ahsp_master
+    st.session_state.rab_data = project.rab_data
+    st.session_state.calc_index = project.index
+    st.session_state.store_state = state
+    st.session_state.pop('res_editor', None)
+    st.query_params["project"] = str(project_id)
+
+def detach_stored_project():
+    """Data di sesi diganti dari luar database (upload JSON): autosave dihentikan"""
+    st.session_state.pop('store_state', None)
+    st.query_params.pop("project", None)
+
+def autosave():
+    """Simpan inkremental: hanya baris yang berubah sejak autosave terakhir yang ditulis"""
+    state = st.session_state.get('store_state')
+    if state is not None:
+        project_store().save_changes(current_project(), state)
+
+def render_store_panel():
+    state = st.session_state.get('store_state')
+    store = project_store()
+    if state is not None:
+        st.caption(
+            f"Proyek #{state.project_id} tersimpan otomatis · perubahan terakhir: {state.last_written} baris"
+        )
+    elif st.button("🗄️ Simpan sebagai Proyek Baru"):
+        st.session_state.store_state = store.create_project(current_project())
+        st.query_params["project"] = str(st.session_state.store_state.project_id)
+        st.rerun()
+
+    search = st.text_input("Cari proyek", key="store_search")
+    n_projects = store.count_projects(search)
+    page_size = 20
+    n_pages = max(1, -(-n_projects // page_size))
+    page = st.number_input("Halaman daftar", min_value=1, max_value=n_pages, value=1, step=1, key="store_page")
+    rows = store.list_projects(search, limit=page_size, offset=(page - 1) * page_size)
+    if not rows:
+        st.info("Belum ada proyek tersimpan.")
+        return
+    df = pd.DataFrame(rows)
+    df['updated_at'] = pd.to_datetime(df['updated_at'], unit='s').dt.strftime("%Y-%m-%d %H:%M")
+    st.dataframe(df, hide_index=True, use_container_width=True)
+
+    options = {f"#{row['project_id']} {row['name']}": row['project_id'] for row in rows}
+    choice = options[st.selectbox("Pilih proyek", list(options), key="store_choice")]
+    # Pratinjau hanya membaca ringkasan Divisi (item tidak dimuat)
+    preview = pd.DataFrame(store.load_divisions(choice))
+    if not preview.empty:
+        st.dataframe(preview[['id', 'title', 'n_items', 'group_total']], hide_index=True, use_container_width=True)
+    b1, b2 = st.columns(2)
+    if b1.button("📂 Buka", key="store_open"):
+        open_stored_project(choice)
+        st.rerun()
+    if b2.button("🗑️ Hapus", key="store_delete"):
+        store.delete_project(choice)
+        if state is not None and state.project_id == choice:
+            detach_stored_project()
+        st.rerun()
+
+# Refresh browser dengan ?project=<id> membuka kembali proyek dari database
+if 'store_state' not in st.session_state and "project" in st.query_params:
+    try:
+        open_stored_project(int(st.query_params["project"]))
+    except (KeyError, ValueError):
+        st.query_params.pop("project", None)
+    else:
+        st.rerun()
+
+# Perubahan dari rerun sebelumnya langsung disimpan (hanya baris yang berubah)
+autosave()
+lap("autosave")
 
 # ==========================================
-# 7. UI LAYOUT
+# 8. RIWAYAT REVISI (ADDENDUM / CCO)
+# ==========================================
+DIFF_STATUS_LABELS = {"added": "Tambah", "removed": "Hapus", "changed": "Ubah", "unchanged": "Tetap"}
+
+def revision_history():
+    """Riwayat revisi proyek: dari database bila proyek tersimpan, selain itu di memori sesi"""
+    state = st.session_state.get('store_state')
+    if state is None:
+        return st.session_state.setdefault('session_history', RevisionHistory())
+    entry = st.session_state.get('store_history')
+    if entry is None or entry[0] != state.project_id:
+        entry = (state.project_id, project_store().revision_history(state.project_id))
+        st.session_state.store_history = entry
+    return entry[1]
+
+def commit_revision(label):
+    revision = revision_history().commit(current_project(), label)
+    state = st.session_state.get('store_state')
+    if state is not None:
+        project_store().record_revision(state.project_id, revision)
+
+def restore_revision(rev):
+    """Data sesi diganti isi revisi; proyek tersimpan ikut diperbarui oleh autosave"""
+    project = revision_history().checkout(rev)
+    st.session_state.project_info = project.project_info
+    st.session_state.tax_settings = project.tax_settings
+    st.session_state.resources = project.resources
+    st.session_state.ahsp_master = project.ahsp_master
+    st.session_state.rab_data = project.rab_data
+    st.session_state.calc_index = project.index
+    st.session_state.pop('res_editor', None)
+
+def revision_diff(old_rev, new_rev):
+    """Diff di-cache per pasangan revisi (dan versi data bila dibandingkan dengan data saat ini)"""
+    project = current_project()
+    state = st.session_state.get('store_state')
+    key = (state and state.project_id, old_rev, new_rev, project.index.version if new_rev is None else None)
+    entry = st.session_state.get('revision_diff')
+    if entry is None or entry[0] != key:
+        new = project if new_rev is None else new_rev
+        with phase("revision_diff"):
+            entry = (key, revision_history().diff(old_rev, new))
+        st.session_state.revision_diff = entry
+    return entry[1]
+
+def render_revision_panel():
+    history = revision_history()
+    c1, c2 = st.columns([3, 1])
+    label = c1.text_input("Nama revisi", placeholder="Kontrak / Addendum 1 / CCO 1", key="revision_label")
+    c2.write("")
+    if c2.button("📌 Simpan Revisi"):
+        commit_revision(label)
+        st.rerun()
+    if not len(history):
+        st.info("Belum ada revisi. Simpan RAB kontrak sebagai revisi pertama.")
+        return
+
+    revisions = pd.DataFrame(history.revisions).drop(columns=['root'])
+    revisions['created_at'] = pd.to_datetime(revisions['created_at'], unit='s').dt.strftime("%Y-%m-%d %H:%M")
+    st.dataframe(revisions, hide_index=True, use_container_width=True)
+
+    names = {revision['rev']: f"#{revision['rev']} {revision['label']}" for revision in history.revisions}
+    targets = {**names, None: "Data saat ini"}
+    c1, c2 = st.columns(2)
+    old_rev = c1.selectbox("Pembanding (lama)", list(names), format_func=names.get, key="diff_old")
+    new_rev = c2.selectbox("Dibandingkan (baru)", list(targets)[::-1], format_func=targets.get, key="diff_new")
+    diff = revision_diff(old_rev, new_rev)
+
+    def signed(val):
+        return f"{val:+,.0f}".replace(",", ".")
+
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Total fisik lama", format_idr(diff.totals['real_cost_old']))
+    m2.metric("Total fisik baru", format_idr(diff.totals['real_cost_new']), signed(diff.totals['delta']))
+    m3.metric("Grand Total (incl. pajak)", format_idr(diff.totals['grand_total_new']), signed(diff.totals['grand_delta']))
+    if diff.identical:
+        st.success("Tidak ada perubahan.")
+    else:
+        money = {c: st.column_config.NumberColumn(format="%.2f") for c in ("total_old", "total_new", "delta", "price_old", "price_new")}
+        divisions = diff.divisions.assign(status=diff.divisions['status'].map(DIFF_STATUS_LABELS))
+        st.dataframe(divisions, hide_index=True, use_container_width=True, column_config=money)
+        items = diff.items.assign(status=diff.items['status'].map(DIFF_STATUS_LABELS))
+        st.caption(f"{len(items)} item berubah")
+        st.dataframe(items, hide_index=True, use_container_width=True, column_config=money, height=320)
+        st.download_button("📄 Download Perubahan (CSV)", lambda: items.to_csv(index=False).encode('utf-8'),
+                           "perubahan_rab.csv", "text/csv")
+    if st.button(f"↩️ Kembalikan data ke {names[old_rev]}"):
+        restore_revision(old_rev)
+        st.rerun()
+
+# ==========================================
+# 9. PANEL KINERJA
+# ==========================================
+def render_perf_panel():
+    """Rerun terakhir (terbaru di atas): total & per fase (ms), counter, export log"""
+    recorder = st.session_state.perf
+    frame = recorder.to_frame()
+    if frame.empty:
+        st.caption("Belum ada rerun tercatat.")
+        return
+    last = recorder.history[-1]
+    st.caption(f"Rerun terakhir: {last['total_ms']:.0f} ms · {last['label']}")
+    st.dataframe(frame.drop(columns=['run']), hide_index=True, height=240)
+    if recorder.background:
+        st.caption("Export (di luar rerun): " + ", ".join(f"{e['name']} {e['ms']:.0f} ms" for e in recorder.background))
+    st.download_button("📄 Log Kinerja (.jsonl)", recorder.export_log(), "rab_perf.jsonl", "application/json")
+
+# ==========================================
+# 10. UI LAYOUT
 # ==========================================
 with st.sidebar:
     st.title("🏗️ RAB MASTER")
@@ -518,7 +790,7 @@ with st.sidebar:
     if 'sb_menu' not in st.session_state:
         st.session_state.sb_menu = "Dashboard"
         
-    menu = st.radio("Navigasi", ["Dashboard", "Rincian RAB (Input)", "Analisa AHSP", "Database Harga", "File & Laporan"], key="sb_menu")
+    menu = st.radio("Navigasi", ["Dashboard", "Rincian RAB (Input)", "Analisa AHSP", "Database Harga", "Kebutuhan Sumber Daya", "Jadwal & Kurva S", "File & Laporan"], key="sb_menu")
     
     st.divider()
     st.markdown("### ⚙️ Pengaturan")
@@ -533,6 +805,12 @@ with st.sidebar:
     st.markdown("<p style='font-size: 12px; color: #666;'>Total Proyek:</p>", unsafe_allow_html=True)
     st.markdown(f"<h2 style='color: #0d6efd; margin-top: -15px;'>{format_idr(val_final)}</h2>", unsafe_allow_html=True)
 
+    st.markdown("---")
+    st.toggle("⏱️ Panel Kinerja", key="perf_enabled")
+    if st.session_state.perf_enabled:
+        render_perf_panel()
+lap("sidebar")
+
 # --- DASHBOARD ---
 if menu == "Dashboard":
     st.title("Executive Summary")
@@ -548,9 +826,17 @@ if menu == "Dashboard":
     with c1:
         st.subheader("Distribusi Biaya")
         if chart_data:
-            df_chart = pd.DataFrame(chart_data)
-            fig = px.bar(df_chart, x='Divisi', y='Total', color='Divisi', text_auto='.2s')
-            st.plotly_chart(fig, use_container_width=True)
+            f1, f2, f3 = st.columns([2, 2, 1])
+            with f1: chart_kind = st.selectbox("Tampilan", CHART_KINDS, key="dash_chart")
+            with f2: chart_divisi = st.selectbox(
+                "Divisi", [None] + list(range(len(st.session_state.rab_data))), key="dash_divisi",
+                format_func=lambda g: "Semua" if g is None else f"{st.session_state.rab_data[g]['id']}. {st.session_state.rab_data[g]['title']}",
+            )
+            with f3: chart_top = st.number_input("Top N", min_value=3, max_value=50, value=10, step=1, key="dash_top")
+            # Figure dibangun ulang hanya bila angka (versi data) atau pilihan grafik berubah
+            fig = cached_figure("dashboard", (chart_kind, chart_divisi, chart_top), lambda: cost_figure(chart_kind, chart_divisi, chart_top))
+            with phase("chart"):
+                st.plotly_chart(fig, use_container_width=True)
     with c2:
         st.subheader("Info Proyek")
         with st.container(border=True):
@@ -558,63 +844,103 @@ if menu == "Dashboard":
             st.text_input("Lokasi", st.session_state.project_info['location'], key="lc")
             st.text_input("Owner", st.session_state.project_info['owner'], key="ow")
 
+    with st.expander("🎲 Simulasi Risiko Biaya (Monte Carlo)", expanded=False):
+        render_risk_panel()
+
 # --- INPUT RAB ---
 elif menu == "Rincian RAB (Input)":
     st.title("Rincian Anggaran Biaya")
     
     col_a, col_b = st.columns([3, 1])
+    with col_a:
+        view_mode = st.radio("Mode Tampilan", ["Per Divisi", VIEW_FLAT], horizontal=True, key="rab_view_mode")
     with col_b:
         st.button("⚙️ Kelola / Buat AHSP Baru", on_click=pindah_ke_ahsp, type="primary")
     
     st.divider()
 
-    for g_idx, group in enumerate(st.session_state.rab_data):
-        with st.expander(f"{group['id']}. {group['title']}  |  {format_idr(group['group_total'])}", expanded=True):
-            for s_idx, sub in enumerate(group['subgroups']):
-                st.markdown(f"**{sub['id']} - {sub['title']}**")
+    # Konfigurasi kolom dibuat SEKALI per rerun, dipakai bersama oleh semua editor
+    item_columns = {
+        "name": "Uraian Pekerjaan",
+        "unit": st.column_config.SelectboxColumn("Sat", options=["M2", "M3", "Kg", "Bh", "Ls", "Titik", "Unit", "M'"], width="small"),
+        "vol": st.column_config.NumberColumn("Volume", width="small", min_value=0.0),
+        "manual_price": st.column_config.NumberColumn("Harga Manual", width="medium"),
+        # Kolom Auto (dihitung oleh sistem)
+        "current_price": st.column_config.NumberColumn("Hrg Satuan (Auto)", disabled=True, format="Rp %d"),
+        "total_price": st.column_config.NumberColumn("Total", disabled=True, format="Rp %d")
+    }
+    calc_index = st.session_state.calc_index
+    # Pilihan kolom Analisa = hasil pencarian teratas (bukan seluruh library) + kode yang sudah dipakai
+    ahsp_query = st.text_input("🔎 Cari AHSP untuk kolom Analisa", key="ahsp_query", placeholder="kode / uraian / satuan")
+    hits, n_hits, _ = search_codes(ahsp_query, [calc_index.ahsp_search], page_size=SEARCH_PAGE, boost=calc_index.ahsp_usage())
+    ahsp_candidates = [hit['id'] for hit in hits]
+    st.caption(f"{n_hits} AHSP cocok · {len(ahsp_candidates)} teratas tersedia di kolom Analisa")
+
+    if view_mode == VIEW_FLAT:
+        with phase("editors"):
+            render_flat_grid(item_columns, ahsp_candidates)
+        count("editors_rendered")
+    else:
+        store = item_store()
+        for g_idx, group in enumerate(st.session_state.rab_data):
+            with st.expander(f"{group['id']}. {group['title']}  |  {format_idr(group['group_total'])}", expanded=True):
+                for s_idx, sub in enumerate(group['subgroups']):
+                    st.markdown(f"**{sub['id']} - {sub['title']}**")
                 
-                df_sub = pd.DataFrame(sub['items'])
+                    # Versi Sub ikut di key: editor di-reset setelah delta diterapkan ke model
+                    sub_version = calc_index.sub_version(g_idx, s_idx)
+                    editor_key = f"editor_{group['id']}_{sub['id']}_{sub_version}"
                 
-                # Editor untuk mengubah Volume atau memilih AHSP
-                edited_df = st.data_editor(
-                    df_sub,
-                    column_config={
-                        "name": "Uraian Pekerjaan",
-                        "unit": st.column_config.SelectboxColumn("Sat", options=["M2", "M3", "Kg", "Bh", "Ls", "Titik", "Unit", "M'"], width="small"),
-                        "vol": st.column_config.NumberColumn("Volume", width="small", min_value=0.0),
-                        "ahsp": st.column_config.SelectboxColumn(
-                            "Analisa (AHSP)", 
-                            options=[None] + list(st.session_state.ahsp_master.keys()), 
-                            width="medium"
-                        ),
-                        "manual_price": st.column_config.NumberColumn("Harga Manual", width="medium"),
-                        # Kolom Auto (dihitung oleh sistem)
-                        "current_price": st.column_config.NumberColumn("Hrg Satuan (Auto)", disabled=True, format="Rp %d"),
-                        "total_price": st.column_config.NumberColumn("Total", disabled=True, format="Rp %d")
-                    },
-                    use_container_width=True,
-                    num_rows="dynamic",
-                    key=f"editor_{group['id']}_{sub['id']}"
-                )
-                
-                # DETEKSI PERUBAHAN: Jika ada edit, update state & rerun
-                if not edited_df.equals(df_sub):
-                    updated_items = edited_df.to_dict('records')
-                    for item in updated_items:
-                        # Bersihkan data NaN jika user menghapus pilihan AHSP
-                        if pd.isna(item['ahsp']): item['ahsp'] = None
-                        
-                        # Reset harga manual jika AHSP dipilih
-                        if item['ahsp'] and item['ahsp'] in st.session_state.ahsp_master:
-                            item['manual_price'] = 0 
-                        
-                    st.session_state.rab_data[g_idx]['subgroups'][s_idx]['items'] = updated_items
-                    st.rerun() # Force rerun untuk menghitung ulang total
-                st.divider()
+                    # Editor untuk mengubah Volume atau memilih AHSP
+                    with phase("editors"):
+                        frame = sub_frame(store, g_idx, s_idx)
+                        st.data_editor(
+                            frame,
+                            column_config={**item_columns, "ahsp": ahsp_column(ahsp_candidates, frame['ahsp'])},
+                            use_container_width=True,
+                            num_rows="dynamic",
+                            key=editor_key,
+                            on_change=apply_editor_delta,
+                            args=(g_idx, s_idx, editor_key)
+                        )
+                    count("editors_rendered")
+                    st.divider()
 
 # --- DATABASE HARGA ---
 elif menu == "Database Harga":
     st.title("Database Harga Dasar")
+    with st.expander("📥 Import Excel (HSPK / AHSP)", expanded=False):
+        st.caption("Kolom dikenali dari judulnya: Kode, Kategori, Uraian, Satuan, Harga untuk daftar harga; "
+                   "Kode AHSP, Kode Komponen, Koefisien (opsional Uraian/Satuan Pekerjaan) untuk analisa. "
+                   "Data dengan kode sama ditimpa.")
+        lib_file = st.file_uploader("File Excel", type=["xlsx", "xlsm"], key="lib_upload")
+        remove_missing = st.checkbox("Hapus resource yang tidak ada di file (sinkron penuh)", value=False)
+        if lib_file is not None and st.button("Import ke Database"):
+            with st.spinner("Membaca file..."):
+                try:
+                    price_df, recipes, warnings = read_library(lib_file)
+                    res_report, ahsp_report, dangling = import_library(price_df, recipes, remove_missing)
+                except AhspCycleError as e:
+                    st.error(f"Import dibatalkan: {e}")
+                except Exception as e:
+                    st.error(f"Gagal membaca file: {e}")
+                else:
+                    if dangling:
+                        warnings.append(f"{len(dangling)} kode komponen AHSP tidak ada di Database Harga (harga 0): {', '.join(dangling[:10])}")
+                    st.session_state.library_report = (res_report, ahsp_report, warnings)
+                    # Editor tabel harga direset agar tidak menerapkan delta lama ke tabel baru
+                    st.session_state.pop("res_editor", None)
+                    st.rerun()
+
+        if 'library_report' in st.session_state:
+            res_report, ahsp_report, warnings = st.session_state.pop('library_report')
+            st.success(
+                f"Harga: {res_report['added']} baru, {res_report['changed']} berubah, {res_report['removed']} dihapus · "
+                f"AHSP: {ahsp_report['added']} baru, {ahsp_report['changed']} berubah"
+            )
+            for msg in warnings:
+                st.warning(msg)
+
     edited_res = st.data_editor(
         st.session_state.resources,
         column_config={"price": st.column_config.NumberColumn("Harga (Rp)", format="Rp %d")},
@@ -624,6 +950,7 @@ elif menu == "Database Harga":
     )
     if not edited_res.equals(st.session_state.resources):
         st.session_state.resources = edited_res
+        st.session_state.calc_index.update_resources(edited_res)
         st.rerun()
 
 # --- ANALISA AHSP ---
@@ -637,19 +964,32 @@ elif menu == "Analisa AHSP":
         with c3: new_ahsp_unit = st.selectbox("Satuan", ["M2", "M3", "Bh", "Ls", "Kg", "M'"])
         
         st.write("Komponen Pembentuk Harga:")
-        comp_template = pd.DataFrame([{"Resource_ID": "L.01", "Koefisien": 1.0}])
-        all_res_ids = st.session_state.resources['id'].tolist()
-        
+        calc_index = st.session_state.calc_index
+        draft = st.session_state.setdefault('new_ahsp_components', [{"Resource_ID": "L.01", "Koefisien": 1.0}])
+        # Komponen boleh resource atau AHSP lain (sub-analisa, misal mortar di pasangan bata);
+        # dipilih lewat pencarian, jadi library lengkap tidak dikirim sebagai opsi editor
+        comp_id = code_picker("Komponen", [calc_index.res_maps.search, calc_index.ahsp_search], "comp_pick")
+        p1, p2 = st.columns([1, 1])
+        with p1: comp_coef = st.number_input("Koefisien komponen", min_value=0.0, value=1.0, format="%.4f", key="comp_coef")
+        with p2:
+            st.write("")
+            add_comp = st.button("➕ Tambah Komponen")
+
         edited_comps = st.data_editor(
-            comp_template,
+            pd.DataFrame(draft, columns=["Resource_ID", "Koefisien"]),
             column_config={
-                "Resource_ID": st.column_config.SelectboxColumn("Pilih Sumber Daya", options=all_res_ids, width="medium"),
+                "Resource_ID": st.column_config.TextColumn("Kode Komponen", width="medium"),
                 "Koefisien": st.column_config.NumberColumn("Koefisien", min_value=0.0, format="%.4f")
             },
             num_rows="dynamic",
             use_container_width=True,
-            key="new_ahsp_maker"
+            key=f"new_ahsp_maker_{st.session_state.get('new_ahsp_rev', 0)}"
         )
+        if add_comp and comp_id:
+            # Suntingan yang belum disimpan di editor ikut dibawa ke draft; editor baru (key baru) memuat draft
+            st.session_state.new_ahsp_components = edited_comps.to_dict('records') + [{"Resource_ID": comp_id, "Koefisien": comp_coef}]
+            st.session_state.new_ahsp_rev = st.session_state.get('new_ahsp_rev', 0) + 1
+            st.rerun()
         
         if st.button("Simpan Analisa Baru"):
             if new_ahsp_id and new_ahsp_name and not edited_comps.empty:
@@ -657,30 +997,49 @@ elif menu == "Analisa AHSP":
                 for idx, row in edited_comps.iterrows():
                     if row['Resource_ID']:
                         comp_list.append({"id": row['Resource_ID'], "coef": row['Koefisien']})
+                unknown = [c['id'] for c in comp_list if c['id'] not in calc_index.res_map and c['id'] not in st.session_state.ahsp_master]
                 
-                st.session_state.ahsp_master[new_ahsp_id] = {
+                recipe = {
                     "name": new_ahsp_name,
                     "unit": new_ahsp_unit,
                     "components": comp_list
                 }
-                st.success(f"Analisa {new_ahsp_id} berhasil disimpan!")
-                st.rerun()
+                if unknown:
+                    st.error(f"Analisa tidak disimpan: kode komponen tidak dikenal: {', '.join(unknown)}")
+                else:
+                    try:
+                        ahsp_order({**st.session_state.ahsp_master, new_ahsp_id: recipe}, st.session_state.calc_index.res_map)
+                    except AhspCycleError as e:
+                        st.error(f"Analisa tidak disimpan: {e}")
+                    else:
+                        st.session_state.ahsp_master[new_ahsp_id] = recipe
+                        st.session_state.calc_index.update_ahsp(new_ahsp_id)
+                        st.session_state.pop('new_ahsp_components', None)
+                        st.session_state.new_ahsp_rev = st.session_state.get('new_ahsp_rev', 0) + 1
+                        st.success(f"Analisa {new_ahsp_id} berhasil disimpan!")
+                        st.rerun()
             else:
                 st.error("Data belum lengkap!")
 
     st.divider()
 
-    sel_ahsp = st.selectbox("Lihat Detail Analisa:", list(st.session_state.ahsp_master.keys()))
+    calc_index = st.session_state.calc_index
+    sel_ahsp = code_picker("Lihat Detail Analisa:", [calc_index.ahsp_search], "ahsp_detail", boost=calc_index.ahsp_usage())
     if sel_ahsp:
         dat = st.session_state.ahsp_master[sel_ahsp]
         st.subheader(f"{sel_ahsp} - {dat['name']}")
         
         comps = []
-        # Mapping cepat untuk view
-        res_map = st.session_state.resources.set_index('id').to_dict('index')
+        # Lookup id -> record dibangun sekali per versi Database Harga (dipakai bersama engine)
+        res_map = st.session_state.calc_index.res_maps.records
+        ahsp_prices = st.session_state.calc_index.ahsp_prices
         
         for c in dat['components']:
             r = res_map.get(c['id'])
+            if r is None and c['id'] in st.session_state.ahsp_master:
+                # Sub-analisa: harga satuan dari hasil hitung AHSP tersebut
+                sub = st.session_state.ahsp_master[c['id']]
+                r = {"name": f"[Analisa] {sub['name']}", "price": ahsp_prices.get(c['id'], 0)}
             if r:
                 comps.append({
                     "Kode": c['id'],
@@ -693,8 +1052,111 @@ elif menu == "Analisa AHSP":
         df_c = pd.DataFrame(comps)
         st.dataframe(df_c, use_container_width=True)
         if not df_c.empty:
-            total_analisa = df_c['Total'].sum()
-            st.metric("Harga Satuan Analisa", format_idr(total_analisa))
+            # Harga resmi dari engine (dibulatkan ke sen), bukan jumlah float kolom Total
+            st.metric("Harga Satuan Analisa", format_idr(ahsp_prices.get(sel_ahsp, df_c['Total'].sum())))
+
+# --- KEBUTUHAN SUMBER DAYA ---
+elif menu == "Kebutuhan Sumber Daya":
+    st.title("Rekap Kebutuhan Bahan & Upah")
+    st.caption("Σ (volume item × koefisien AHSP) per resource, termasuk sub-analisa. Item berharga manual tidak dihitung.")
+    takeoff = takeoff_table()
+
+    c1, c2 = st.columns([1, 2])
+    with c1: takeoff_by = st.radio("Kelompokkan per", ["Kategori", "Divisi"], horizontal=True, key="takeoff_by")
+    categories = sorted(takeoff['category'].dropna().unique().tolist())
+    with c2: sel_categories = st.multiselect("Filter kategori", categories, default=categories, key="takeoff_categories")
+
+    view = takeoff[takeoff['category'].isin(sel_categories) | takeoff['category'].isna()]
+    summary = takeoff_summary(view, "category" if takeoff_by == "Kategori" else "divisi")
+    m1, m2 = st.columns(2)
+    m1.metric("Jumlah resource", f"{summary['id'].nunique()}")
+    m2.metric("Total biaya resource", format_idr(summary['cost'].sum()))
+    st.dataframe(
+        summary,
+        column_config={
+            "qty": st.column_config.NumberColumn("Kebutuhan", format="%.2f"),
+            "price": st.column_config.NumberColumn("Harga (Rp)", format="%d"),
+            "cost": st.column_config.NumberColumn("Jumlah (Rp)", format="%d"),
+        },
+        use_container_width=True, hide_index=True,
+    )
+    d1, d2 = st.columns(2)
+    with d1: st.download_button("📄 Download CSV", lambda: summary.to_csv(index=False).encode('utf-8'), "kebutuhan_sumber_daya.csv", "text/csv")
+    with d2:
+        st.download_button(
+            "📊 Download Excel (.xlsx)", lambda: takeoff_excel(view), "kebutuhan_sumber_daya.xlsx",
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+
+# --- JADWAL & KURVA S ---
+elif menu == "Jadwal & Kurva S":
+    st.title("Jadwal Pelaksanaan & Kurva S")
+    st.caption("Biaya tiap item disebar per minggu menurut jadwal Sub-nya. Sub tanpa jadwal tersebar merata sepanjang durasi proyek; "
+               "item boleh punya jadwal sendiri (field start / duration / profile di file JSON).")
+    info = st.session_state.project_info
+    weeks_in = st.number_input("Durasi Proyek (minggu)", min_value=1, max_value=520, value=project_weeks(info), step=1, key="schedule_weeks")
+    if weeks_in != project_weeks(info):
+        info['weeks'] = int(weeks_in)
+
+    calc_index = st.session_state.calc_index
+    sched_df = schedule_editor_frame()
+    editor_key = f"schedule_editor_{calc_index.version}"
+    with phase("editors"):
+        st.data_editor(
+            sched_df,
+            column_config={
+                "divisi": st.column_config.TextColumn("Divisi", disabled=True, width="small"),
+                "sub": st.column_config.TextColumn("Sub", disabled=True, width="small"),
+                "title": st.column_config.TextColumn("Uraian", disabled=True),
+                "total_price": st.column_config.NumberColumn("Total", disabled=True, format="Rp %d"),
+                "start": st.column_config.NumberColumn("Mulai (Minggu)", min_value=1, step=1, width="small"),
+                "duration": st.column_config.NumberColumn("Durasi (Minggu)", min_value=1, step=1, width="small"),
+                "profile": st.column_config.SelectboxColumn("Profil", options=list(SCHEDULE_PROFILES), format_func=SCHEDULE_PROFILE_LABELS.get),
+            },
+            column_order=("divisi", "sub", "title", "total_price") + SCHEDULE_FIELDS,
+            hide_index=True,
+            use_container_width=True,
+            num_rows="fixed",
+            key=editor_key,
+            on_change=apply_schedule_delta,
+            args=(editor_key, sched_df[["g_idx", "s_idx"]].to_numpy().tolist()),
+        )
+
+    schedule = cost_schedule()
+    scurve = schedule.frame()
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Durasi Jadwal", f"{schedule.n_weeks} minggu")
+    m2.metric("Puncak Mingguan", format_idr(scurve['cost'].max() if len(scurve) else 0))
+    m3.metric("Total Terjadwal", format_idr(scurve['cumulative'].iloc[-1] if len(scurve) else 0))
+
+    schedule_view = st.radio("Tampilan", SCHEDULE_VIEWS, horizontal=True, key="schedule_view")
+    fig = cached_figure("schedule", (schedule.version, schedule_view), lambda: schedule_figure(schedule, schedule_view))
+    with phase("chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.dataframe(
+        scurve,
+        column_config={
+            "week": st.column_config.NumberColumn("Minggu"),
+            "cost": st.column_config.NumberColumn("Biaya (Rp)", format="%d"),
+            "cumulative": st.column_config.NumberColumn("Kumulatif (Rp)", format="%d"),
+            "weight": st.column_config.NumberColumn("Bobot (%)", format="%.2f"),
+            "cum_weight": st.column_config.NumberColumn("Bobot Kumulatif (%)", format="%.2f"),
+        },
+        use_container_width=True, hide_index=True,
+    )
+    d1, d2, d3 = st.columns(3)
+    with d1: st.download_button("📄 Kurva S (.csv)", lambda: scurve.to_csv(index=False).encode('utf-8'), "kurva_s.csv", "text/csv")
+    with d2:
+        st.download_button(
+            "📊 Kurva S + Jadwal Sub (.xlsx)", cached_exporter('schedule_xlsx', lambda project: build_schedule_export(project, 'xlsx')),
+            "kurva_s.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+    with d3:
+        st.download_button(
+            "🧮 Matriks Item x Minggu (.csv)", cached_exporter('schedule_items', lambda project: build_schedule_export(project, 'csv')),
+            "jadwal_item_mingguan.csv", "text/csv"
+        )
 
 # --- FILE ---
 elif menu == "File & Laporan":
@@ -702,32 +1164,59 @@ elif menu == "File & Laporan":
     c1, c2 = st.columns(2)
     with c1:
         st.subheader("Simpan Proyek")
-        full_dump = {
-            "project_info": st.session_state.project_info,
-            "tax_settings": st.session_state.tax_settings,
-            "resources": st.session_state.resources.to_dict('records'),
-            "ahsp_master": st.session_state.ahsp_master,
-            "rab_data": st.session_state.rab_data
-        }
-        json_str = json.dumps(full_dump, indent=2)
-        st.download_button("💾 Download JSON Project", json_str, "rab_proyek.json", "application/json")
+        compact = st.checkbox("Format ringkas (tanpa indentasi)", value=True)
+        # JSON baru dibuat saat tombol diklik, dan di-cache selama versi data belum berubah
+        st.download_button("💾 Download JSON Project", project_json_exporter(compact), "rab_proyek.json", "application/json")
+        st.download_button(
+            "📊 Download Excel (.xlsx)", cached_exporter('xlsx', build_excel), "RAB.xlsx",
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
         st.write("")
-        if st.button("🖨️ Generate PDF Laporan"):
-            pdf_bytes = generate_pdf()
-            st.download_button("📥 Unduh PDF", pdf_bytes, "Laporan_RAB.pdf", "application/pdf")
+        # Polling progres hanya selama worker PDF masih berjalan
+        st.fragment(pdf_panel, run_every=0.5 if pdf_job_running() else None)()
             
     with c2:
         st.subheader("Buka Proyek")
         up_file = st.file_uploader("Upload JSON", type=['json'])
-        if up_file:
+        # File yang sama tidak di-import ulang pada setiap rerun
+        if up_file and st.session_state.get('imported_file_id') != up_file.file_id:
+            bar = st.progress(0.0, text="Membaca file proyek...")
+            text_file = io.TextIOWrapper(up_file, encoding='utf-8')
             try:
-                d = json.load(up_file)
-                st.session_state.project_info = d['project_info']
-                st.session_state.tax_settings = d['tax_settings']
-                st.session_state.resources = pd.DataFrame(d['resources'])
-                st.session_state.ahsp_master = d['ahsp_master']
-                st.session_state.rab_data = d['rab_data']
-                st.success("Data berhasil dimuat!")
-                st.rerun()
-            except Exception as e:
+                project, warnings = load_project_stream(
+                    text_file, total_size=up_file.size,
+                    progress=lambda frac: bar.progress(frac, text=f"Membaca file proyek... {frac:.0%}"),
+                )
+            except (ProjectImportError, UnicodeDecodeError) as e:
+                bar.empty()
                 st.error(f"Gagal: {e}")
+            else:
+                st.session_state.project_info = project.project_info
+                st.session_state.tax_settings = project.tax_settings
+                st.session_state.resources = project.resources
+                st.session_state.ahsp_master = project.ahsp_master
+                st.session_state.rab_data = project.rab_data
+                recalculate_totals()
+                detach_stored_project()
+                st.session_state.imported_file_id = up_file.file_id
+                st.session_state.import_warnings = warnings
+                st.rerun()
+            finally:
+                # Lepas wrapper tanpa menutup file upload milik Streamlit
+                text_file.detach()
+
+        if st.session_state.get('imported_file_id'):
+            st.success("Data berhasil dimuat!")
+            for msg in st.session_state.get('import_warnings', []):
+                st.warning(msg)
+
+    st.divider()
+    st.subheader("🗄️ Penyimpanan Server (SQLite)")
+    render_store_panel()
+
+    st.divider()
+    st.subheader("🧾 Riwayat Revisi (Addendum / CCO)")
+    render_revision_panel()
+
+lap("page")
+perf_recorder().finish_run()
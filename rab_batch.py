@@ -0,0 +1,134 @@
+"""RAB BATCH: hitung ulang banyak file proyek JSON sekaligus (paralel).
+
+Contoh:
+    python rab_batch.py folder_proyek/ --resources hspk_2026.csv -o rekap.csv
+
+Setiap file `*.json` (format download "File & Laporan") dihitung ulang di
+process pool memakai semua core. Bila `--resources` diberikan, harga di
+tabel tersebut menimpa (upsert per id) harga dasar masing-masing proyek.
+Hasil ditulis baris per baris begitu tiap proyek selesai, sehingga memori
+tetap datar berapa pun jumlah proyeknya.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+from pathlib import Path
+
+from rab_engine import division_totals, upsert_resources
+from rab_io import load_project_stream
+
+SUMMARY_COLUMNS = ["file", "project", "divisi_id", "divisi", "real_cost", "profit", "ppn", "grand_total", "error"]
+
+# Harga pengganti, dimuat SEKALI per worker (lihat _init_worker)
+_price_list = None
+
+def load_price_list(path):
+    """Membaca tabel harga pengganti (.csv / .json / .xlsx) berkolom minimal id & price"""
+    import pandas as pd
+
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == '.csv':
+        df = pd.read_csv(path)
+    elif suffix in ('.xlsx', '.xlsm'):
+        # Format HSPK: judul kolom dikenali otomatis (Kode/Uraian/Satuan/Harga ...)
+        from rab_excel import read_library
+
+        df, _, _ = read_library(path)
+        if df is None:
+            raise ValueError(f"Tidak ada sheet harga (kolom Kode & Harga) di {path.name}")
+    elif suffix == '.json':
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        # Boleh berupa list record, atau file proyek lengkap (ambil bagian resources)
+        df = pd.DataFrame(data['resources'] if isinstance(data, dict) else data)
+    else:
+        raise ValueError(f"Format tabel harga tidak dikenal: {path.name}")
+
+    missing = {'id', 'price'} - set(df.columns)
+    if missing:
+        raise ValueError(f"Kolom wajib tidak ada di {path.name}: {', '.join(sorted(missing))}")
+    return df
+
+def _init_worker(resources_path):
+    global _price_list
+    _price_list = load_price_list(resources_path) if resources_path else None
+
+def price_file(path):
+    """Worker: muat satu file proyek, hitung ulang, kembalikan ringkasan (tanpa data item)"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            project, _ = load_project_stream(f)
+        if _price_list is not None:
+            project.resources, _ = upsert_resources(project.resources, _price_list)
+
+        real_cost, profit, ppn, final_total, _ = project.totals()
+        # Profit/PPN per divisi = porsi dari total proyek, jadi baris divisi berjumlah tepat TOTAL
+        divisions = [
+            (group['id'], group['title'], *totals)
+            for group, totals in zip(project.rab_data, division_totals(project.rab_data, project.tax_settings))
+        ]
+        return {
+            "file": str(path), "project": project.project_info.get('name', ''),
+            "totals": (real_cost, profit, ppn, final_total), "divisions": divisions, "error": None,
+        }
+    except Exception as e:
+        return {"file": str(path), "project": "", "totals": None, "divisions": [], "error": f"{type(e).__name__}: {e}"}
+
+def summary_rows(result):
+    """Baris CSV: satu baris total proyek (divisi kosong) + satu baris per divisi"""
+    if result['error']:
+        yield [result['file'], result['project'], "", "", "", "", "", "", result['error']]
+        return
+    yield [result['file'], result['project'], "", "TOTAL", *result['totals'], ""]
+    for div_id, title, real_cost, profit, ppn, final_total in result['divisions']:
+        yield [result['file'], result['project'], div_id, title, real_cost, profit, ppn, final_total, ""]
+
+def run_batch(paths, out, resources_path=None, workers=None, chunksize=4):
+    """Menghitung semua file di `paths` secara paralel dan menulis rekap CSV ke `out`.
+
+    Mengembalikan (jumlah_sukses, jumlah_gagal).
+    """
+    writer = csv.writer(out)
+    writer.writerow(SUMMARY_COLUMNS)
+    n_ok = n_fail = 0
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(resources_path,)) as pool:
+        # imap_unordered: hasil diterima begitu selesai, tidak menunggu urutan file
+        for result in pool.imap_unordered(price_file, paths, chunksize=chunksize):
+            writer.writerows(summary_rows(result))
+            out.flush()
+            if result['error']:
+                n_fail += 1
+                print(f"GAGAL {result['file']}: {result['error']}", file=sys.stderr)
+            else:
+                n_ok += 1
+    return n_ok, n_fail
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hitung ulang banyak file proyek RAB (JSON) secara paralel.")
+    parser.add_argument("folder", help="Folder berisi file proyek JSON")
+    parser.add_argument("--pattern", default="*.json", help="Pola nama file (default: *.json)")
+    parser.add_argument("--resources", help="Tabel harga pengganti (.csv/.json/.xlsx, kolom id & price)")
+    parser.add_argument("-o", "--output", help="File CSV rekap (default: stdout)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="Jumlah proses (default: semua core)")
+    args = parser.parse_args(argv)
+
+    if args.resources:
+        # Validasi di proses utama agar kesalahan tabel harga gagal di awal, bukan di tiap worker
+        load_price_list(args.resources)
+
+    paths = sorted(Path(args.folder).glob(args.pattern))
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        n_ok, n_fail = run_batch(paths, out, args.resources, args.workers)
+    finally:
+        if args.output:
+            out.close()
+    print(f"Selesai: {n_ok} proyek dihitung, {n_fail} gagal.", file=sys.stderr)
+    return 1 if n_fail else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+"""RAB BENCH: benchmark kinerja atas proyek sintetis besar.
+
+Contoh:
+    python rab_bench.py --scales small,medium -o bench.json
+    python rab_bench.py --scales medium --baseline bench_main.json --tolerance 0.25
+
+Proyek dibangkitkan dengan N Divisi/Sub/item, M resep AHSP (sebagian memakai
+sub-analisa) dan K resource. Pemakaian resource oleh AHSP dan AHSP oleh item
+dibuat miring (sedikit kode dipakai sangat sering) seperti RAB sungguhan.
+Setiap benchmark diukur `--repeat` kali (waktu setup tidak ikut diukur);
+hasil ditulis sebagai JSON. Dengan `--baseline`, benchmark yang lebih lambat
+dari baseline melebihi toleransi dilaporkan dan exit code = 1.
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from rab_engine import (
+    SCHEDULE_PROFILES, CodeIndex, CostCube, CostSchedule, DependencyIndex, ItemStore, Project, query_items, search_codes, top_n,
+)
+
+# name: (divisi, sub per divisi, item, resep AHSP, resource)
+SCALES = {
+    "small": (5, 4, 1_000, 200, 300),
+    "medium": (10, 10, 10_000, 1_000, 2_000),
+    "large": (20, 25, 100_000, 5_000, 10_000),
+}
+CATEGORIES = ("Upah", "Bahan", "Alat")
+UNITS = ("M2", "M3", "Kg", "Bh", "Ls", "M'")
+# Benchmark yang terlalu lama untuk skala besar dilewati kecuali diminta lewat --only
+SLOW = {"pdf": 20_000, "xlsx": 50_000}
+# Selisih di bawah ini (detik) dianggap derau pengukuran, bukan regresi
+NOISE_FLOOR = 0.001
+
+def _skewed(rng, n, size, skew):
+    """Index 0..n-1 dengan peluang ~ 1/(rank+1)^skew (Zipf terpotong)"""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return rng.choice(n, size=size, p=weights / weights.sum())
+
+def generate_project(n_divisions, n_subgroups, n_items, n_ahsp, n_resources, skew=1.1,
+                     nested_share=0.1, manual_share=0.1, seed=0):
+    """Proyek sintetis (rab_engine.Project) dengan pemakaian kode yang miring"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    res_ids = [f"R.{i:05d}" for i in range(n_resources)]
+    resources = pd.DataFrame({
+        "id": res_ids,
+        "category": rng.choice(CATEGORIES, n_resources),
+        "name": [f"Resource {i}" for i in range(n_resources)],
+        "unit": rng.choice(UNITS, n_resources),
+        "price": rng.integers(5, 2_000, n_resources) * 1000,
+    })
+
+    ahsp_ids = [f"A.{i:05d}" for i in range(n_ahsp)]
+    ahsp_master = {}
+    for a_idx, ahsp_id in enumerate(ahsp_ids):
+        n_comp = int(rng.integers(3, 9))
+        comp_idx = np.unique(_skewed(rng, n_resources, n_comp, skew))
+        components = [{"id": res_ids[r], "coef": round(float(rng.uniform(0.01, 2.0)), 4)} for r in comp_idx]
+        # Sub-analisa hanya ke resep dengan index lebih kecil -> tidak ada siklus
+        if a_idx and rng.random() < nested_share:
+            components.append({"id": ahsp_ids[int(rng.integers(0, a_idx))], "coef": round(float(rng.uniform(0.1, 1.0)), 4)})
+        ahsp_master[ahsp_id] = {"name": f"Pekerjaan {a_idx}", "unit": str(rng.choice(UNITS)), "components": components}
+
+    item_ahsp = _skewed(rng, n_ahsp, n_items, skew)
+    manual = rng.random(n_items) < manual_share
+    vols = np.round(rng.uniform(0.5, 500, n_items), 2)
+    prices = rng.integers(10, 5_000, n_items) * 1000
+    n_subs = n_divisions * n_subgroups
+    bounds = np.linspace(0, n_items, n_subs + 1).astype(int)
+
+    rab_data = []
+    for g_idx in range(n_divisions):
+        group = {"id": chr(65 + g_idx % 26) + ("" if g_idx < 26 else str(g_idx // 26)),
+                 "title": f"PEKERJAAN {g_idx + 1}", "subgroups": []}
+        for s_idx in range(n_subgroups):
+            k = g_idx * n_subgroups + s_idx
+            items = []
+            for i in range(bounds[k], bounds[k + 1]):
+                if manual[i]:
+                    items.append({"name": f"Item {i}", "unit": "Ls", "vol": float(vols[i]), "ahsp": None,
+                                  "manual_price": int(prices[i])})
+                else:
+                    ahsp_id = ahsp_ids[item_ahsp[i]]
+                    items.append({"name": f"Item {i}", "unit": ahsp_master[ahsp_id]['unit'], "vol": float(vols[i]),
+                                  "ahsp": ahsp_id, "manual_price": 0})
+            group['subgroups'].append({"id": f"{group['id']}.{s_idx + 1}", "title": f"Sub {s_idx + 1}", "items": items})
+        rab_data.append(group)
+
+    info = {"name": "Proyek Sintetis", "location": "Benchmark", "owner": "rab_bench"}
+    return Project(info, {"profit": 10.0, "ppn": 11.0}, resources, ahsp_master, rab_data)
+
+# ==========================================
+# BENCHMARK
+# ==========================================
+# Setiap benchmark: setup(project) -> fungsi tanpa argumen yang diukur
+
+def _bench_pricing(project):
+    """Kalkulasi penuh + indeks dependensi (recalculate_totals di app)"""
+    return lambda: DependencyIndex(project.rab_data, project.ahsp_master, project.resources)
+
+def _bench_rerun_item(project):
+    """Satu sel volume diedit lalu total dibaca (rerun setelah edit di editor)"""
+    project.recalculate()
+    sub = project.rab_data[0]['subgroups'][0]
+    state = {"vol": 1.0}
+
+    def run():
+        state['vol'] += 1
+        project.index.apply_item_delta(0, 0, edited_rows={len(sub['items']) // 2: {"vol": state['vol']}})
+        project.totals()
+    return run
+
+def _bench_rerun_price(project):
+    """Harga resource terpopuler diubah (perambatan ke AHSP & item terdampak)"""
+    project.recalculate()
+    resources = project.resources
+
+    def run():
+        changed = resources.copy()
+        changed.loc[0, 'price'] = float(changed.loc[0, 'price']) * 1.01
+        project.resources = changed
+        project.index.update_resources(changed)
+        project.totals()
+    return run
+
+def _bench_rerun_ahsp(project):
+    """Satu resep populer diubah koefisiennya"""
+    project.recalculate()
+    ahsp_id = next(iter(project.ahsp_master))
+
+    def run():
+        recipe = project.ahsp_master[ahsp_id]
+        components = [dict(comp, coef=comp['coef'] * 1.01) for comp in recipe['components']]
+        project.ahsp_master[ahsp_id] = dict(recipe, components=components)
+        project.index.update_ahsp(ahsp_id)
+    return run
+
+def _bench_json_export(project):
+    project.recalculate()
+    return lambda: project.to_json(compact=True)
+
+def _bench_json_import(project):
+    from rab_io import load_project_stream
+
+    text = project.to_json(compact=True)
+    return lambda: load_project_stream(io.StringIO(text))
+
+def _bench_editor_frames(project):
+    """Konversi DataFrame untuk editor: ItemStore, satu halaman grid datar, semua editor per Sub"""
+    project.recalculate()
+
+    def run():
+        store = ItemStore.from_rab_data(project.rab_data, project.index)
+        query_items(store, "item 1", None, "total_price", False, 1, 100)
+        for g_idx, s_idx in store.sub_keys:
+            store.frame(store.sub_rows(g_idx, s_idx), with_position=False)
+    return run
+
+def _bench_sqlite_save(project):
+    from rab_store import ProjectStore
+
+    project.recalculate()
+    return lambda: ProjectStore(":memory:").create_project(project)
+
+def _bench_revision_diff(project):
+    """Diff revisi kontrak vs data saat ini setelah addendum (satu Sub per Divisi diubah)"""
+    from rab_history import RevisionHistory
+
+    project.recalculate()
+    history = RevisionHistory()
+    history.commit(project, "Kontrak")
+    for g_idx, group in enumerate(project.rab_data):
+        items = group['subgroups'][0]['items']
+        project.index.apply_item_delta(g_idx, 0, edited_rows={i: {"vol": items[i]['vol'] * 1.1} for i in range(0, len(items), 3)})
+    return lambda: history.diff(1, project)
+
+def _bench_code_search(project):
+    """Bangun indeks pencarian AHSP + resource, lalu satu halaman hasil untuk beberapa query selector"""
+    queries = ("", "pekerjaan 12", "A.0001", "pekrjaan", "resource 9", "m3 kg")
+
+    def run():
+        indexes = [CodeIndex.from_ahsp(project.ahsp_master), CodeIndex.from_resources(project.resources)]
+        for query in queries:
+            search_codes(query, indexes, page_size=30)
+    return run
+
+def _bench_cost_cube(project):
+    """Satu sel volume diedit lalu kubus biaya disinkronkan dan rollup dashboard dibaca ulang"""
+    project.recalculate()
+    cube = CostCube()
+    cube.sync(project.index)
+    sub = project.rab_data[0]['subgroups'][0]
+    state = {"vol": 1.0}
+
+    def run():
+        state['vol'] += 1
+        project.index.apply_item_delta(0, 0, edited_rows={len(sub['items']) // 2: {"vol": state['vol']}})
+        cube.sync(project.index)
+        cube.rollup(("divisi", "sub", "category"))
+        top_n(cube.rollup(("category", "resource")), "resource", 20, group=["category"])
+    return run
+
+SCHEDULE_WEEKS = 104
+
+def _scheduled(project):
+    """Jadwal acak per Sub (deterministik) sepanjang SCHEDULE_WEEKS minggu"""
+    rng = np.random.default_rng(7)
+    for group in project.rab_data:
+        for sub in group['subgroups']:
+            duration = int(rng.integers(2, 27))
+            sub.update(start=int(rng.integers(1, SCHEDULE_WEEKS - duration + 2)), duration=duration,
+                       profile=SCHEDULE_PROFILES[int(rng.integers(len(SCHEDULE_PROFILES)))])
+    project.recalculate()
+    return project
+
+def _bench_schedule(project):
+    """Satu sel volume diedit lalu jadwal biaya disinkronkan dan tabel kurva S dibaca ulang"""
+    _scheduled(project)
+    schedule = CostSchedule()
+    schedule.sync(project.index, SCHEDULE_WEEKS)
+    sub = project.rab_data[0]['subgroups'][0]
+    state = {"vol": 1.0}
+
+    def run():
+        state['vol'] += 1
+        project.index.apply_item_delta(0, 0, edited_rows={len(sub['items']) // 2: {"vol": state['vol']}})
+        schedule.sync(project.index, SCHEDULE_WEEKS)
+        schedule.frame()
+    return run
+
+def _bench_schedule_items(project):
+    """Sebaran penuh: matriks item x minggu seluruh proyek (export / jadwal baru)"""
+    _scheduled(project)
+
+    def run():
+        schedule = CostSchedule()
+        schedule.sync(project.index, SCHEDULE_WEEKS)
+        schedule.item_table(project.rab_data)
+    return run
+
+def _bench_takeoff(project):
+    project.recalculate()
+    return project.index.takeoff
+
+def _bench_pdf(project):
+    from rab_pdf import build_pdf
+
+    project.recalculate()
+    return lambda: build_pdf(project)
+
+def _bench_xlsx(project):
+    from rab_excel import export_excel
+
+    project.recalculate()
+    return lambda: export_excel(project, io.BytesIO())
+
+BENCHMARKS = {
+    "pricing": _bench_pricing,
+    "rerun_item": _bench_rerun_item,
+    "rerun_price": _bench_rerun_price,
+    "rerun_ahsp": _bench_rerun_ahsp,
+    "json_export": _bench_json_export,
+    "json_import": _bench_json_import,
+    "editor_frames": _bench_editor_frames,
+    "sqlite_save": _bench_sqlite_save,
+    "revision_diff": _bench_revision_diff,
+    "code_search": _bench_code_search,
+    "cost_cube": _bench_cost_cube,
+    "schedule": _bench_schedule,
+    "schedule_items": _bench_schedule_items,
+    "takeoff": _bench_takeoff,
+    "pdf": _bench_pdf,
+    "xlsx": _bench_xlsx,
+}
+
+def time_call(fn, repeat):
+    """Waktu (detik) per pengulangan"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+def run_benchmarks(scales, names=None, repeat=3, seed=0, log=None):
+    """Menjalankan benchmark; mengembalikan list hasil (dict per skala × benchmark)"""
+    results = []
+    for scale in scales:
+        n_div, n_sub, n_items, n_ahsp, n_res = SCALES[scale]
+        for name in names or BENCHMARKS:
+            if names is None and n_items > SLOW.get(name, n_items):
+                continue
+            # Proyek baru per benchmark: benchmark yang mengubah data tidak memengaruhi yang lain
+            project = generate_project(n_div, n_sub, n_items, n_ahsp, n_res, seed=seed)
+            fn = BENCHMARKS[name](project)
+            times = time_call(fn, repeat)
+            result = {
+                "scale": scale, "benchmark": name, "items": n_items, "ahsp": n_ahsp, "resources": n_res,
+                "repeat": repeat, "min": min(times), "median": statistics.median(times), "mean": statistics.fmean(times),
+            }
+            results.append(result)
+            if log:
+                log(f"{scale:>7} {name:<14} min {result['min'] * 1000:10.3f} ms   median {result['median'] * 1000:10.3f} ms")
+    return results
+
+def environment():
+    import pandas as pd
+
+    return {
+        "python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine(),
+        "numpy": np.__version__, "pandas": pd.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+def compare(results, baseline, tolerance):
+    """Benchmark yang median-nya lebih lambat dari baseline × (1 + toleransi)"""
+    base = {(r['scale'], r['benchmark']): r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        old = base.get((r['scale'], r['benchmark']))
+        if old and r['median'] > old['median'] * (1 + tolerance) and r['median'] - old['median'] > NOISE_FLOOR:
+            regressions.append({**r, "baseline_median": old['median'], "ratio": r['median'] / old['median']})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark kinerja RAB atas proyek sintetis.")
+    parser.add_argument("--scales", default="small,medium", help=f"Skala dipisah koma ({', '.join(SCALES)})")
+    parser.add_argument("--only", help=f"Benchmark tertentu dipisah koma ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Pengulangan per benchmark (default: 3)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed generator proyek (default: 0)")
+    parser.add_argument("-o", "--output", help="File hasil JSON (default: stdout)")
+    parser.add_argument("--baseline", help="File hasil JSON sebelumnya untuk deteksi regresi")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Batas perlambatan relatif (default: 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    names = [n.strip() for n in args.only.split(",")] if args.only else None
+    unknown = [s for s in scales if s not in SCALES] + [n for n in names or [] if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"tidak dikenal: {', '.join(unknown)}")
+
+    results = run_benchmarks(scales, names, args.repeat, args.seed, log=lambda msg: print(msg, file=sys.stderr))
+    report = {"environment": environment(), "scales": {s: SCALES[s] for s in scales}, "results": results}
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"REGRESI {r['scale']}/{r['benchmark']}: {r['ratio']:.2f}x lebih lambat dari baseline", file=sys.stderr)
+        status = 1 if regressions else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
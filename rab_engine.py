@@ -0,0 +1,1977 @@
+"""RAB ENGINE: inti kalkulasi RAB tanpa Streamlit (headless).
+
+Berisi model proyek, library default (harga dasar, AHSP, contoh RAB),
+kalkulasi harga AHSP, total RAB, serta perhitungan Profit & PPN.
+Modul ini sengaja tidak mengimpor streamlit/plotly (dan pandas hanya
+diimpor saat dibutuhkan) agar cepat diimpor dari script, test dan worker.
+"""
+import bisect
+import copy
+import heapq
+import itertools
+import json
+import math
+import re
+from collections import defaultdict
+from collections.abc import MutableMapping
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from rab_perf import count
+
+def format_idr(val):
+    return f"Rp {val:,.0f}".replace(",", ".")
+
+# ==========================================
+# 1. LIBRARY DEFAULT
+# ==========================================
+DEFAULT_PROJECT_INFO = {
+    "name": "Pembangunan Gedung Operasional",
+    "location": "Bandung, Jawa Barat",
+    "year": "2025",
+    "owner": "OM RIO",
+    "consultant": "SMARTSTUDIO"
+}
+
+DEFAULT_TAX_SETTINGS = {"profit": 10.0, "ppn": 11.0}
+
+# DATABASE RESOURCES (HARGA DASAR)
+DEFAULT_RESOURCES = [
+    {'id': 'L.01', 'category': 'Upah', 'name': 'Pekerja', 'unit': 'OH', 'price': 107000},
+    {'id': 'L.02.1', 'category': 'Upah', 'name': 'Tukang Batu', 'unit': 'OH', 'price': 110000},
+    {'id': 'L.02.2', 'category': 'Upah', 'name': 'Tukang Kayu', 'unit': 'OH', 'price': 110000},
+    {'id': 'L.02.3', 'category': 'Upah', 'name': 'Tukang Besi', 'unit': 'OH', 'price': 110000},
+    {'id': 'L.02.4', 'category': 'Upah', 'name': 'Tukang Cat', 'unit': 'OH', 'price': 110000},
+    {'id': 'L.02.5', 'category': 'Upah', 'name': 'Tukang Listrik', 'unit': 'OH', 'price': 110000},
+    {'id': 'L.02.6', 'category': 'Upah', 'name': 'Tukang Pipa', 'unit': 'OH', 'price': 110000},
+    {'id': 'L.02.7', 'category': 'Upah', 'name': 'Tukang Alumunium', 'unit': 'OH', 'price': 110000},
+    {'id': 'L.03', 'category': 'Upah', 'name': 'Kepala Tukang', 'unit': 'OH', 'price': 120000},
+    {'id': 'L.04', 'category': 'Upah', 'name': 'Mandor', 'unit': 'OH', 'price': 125000},
+
+    # Material
+    {'id': 'M.01', 'category': 'Bahan', 'name': 'Semen Portland (PC)', 'unit': 'Kg', 'price': 1516},
+    {'id': 'M.01b', 'category': 'Bahan', 'name': 'Semen Mortar', 'unit': 'Kg', 'price': 2500},
+    {'id': 'M.02', 'category': 'Bahan', 'name': 'Pasir Beton', 'unit': 'Kg', 'price': 1000},
+    {'id': 'M.03', 'category': 'Bahan', 'name': 'Pasir Pasang', 'unit': 'M3', 'price': 132500},
+    {'id': 'M.03b', 'category': 'Bahan', 'name': 'Pasir Urug', 'unit': 'M3', 'price': 90000},
+    {'id': 'M.04', 'category': 'Bahan', 'name': 'Kerikil / Split', 'unit': 'Kg', 'price': 1000},
+    {'id': 'M.05', 'category': 'Bahan', 'name': 'Batu Belah', 'unit': 'M3', 'price': 300000},
+    {'id': 'M.06', 'category': 'Bahan', 'name': 'Bata Merah', 'unit': 'Bh', 'price': 1000},
+    {'id': 'M.07', 'category': 'Bahan', 'name': 'Bata Ringan', 'unit': 'Bh', 'price': 8500},
+    {'id': 'M.07b', 'category': 'Bahan', 'name': 'Batako', 'unit': 'Bh', 'price': 2500},
+    {'id': 'M.07c', 'category': 'Bahan', 'name': 'Roster Beton', 'unit': 'Bh', 'price': 15000},
+    {'id': 'M.08', 'category': 'Bahan', 'name': 'Besi Beton Polos', 'unit': 'Kg', 'price': 10900},
+    {'id': 'M.09', 'category': 'Bahan', 'name': 'Kawat Beton', 'unit': 'Kg', 'price': 15000},
+    {'id': 'M.10', 'category': 'Bahan', 'name': 'Paku Campur', 'unit': 'Kg', 'price': 25000},
+    {'id': 'M.11', 'category': 'Bahan', 'name': 'Kayu Papan Bekisting', 'unit': 'M3', 'price': 2407000},
+    {'id': 'M.12', 'category': 'Bahan', 'name': 'Kayu Kaso 5/7', 'unit': 'M3', 'price': 1800000},
+    {'id': 'M.13', 'category': 'Bahan', 'name': 'Multiplek 9mm', 'unit': 'Lbr', 'price': 125000},
+    {'id': 'M.14', 'category': 'Bahan', 'name': 'Minyak Bekisting', 'unit': 'Liter', 'price': 43300},
+    {'id': 'M.15', 'category': 'Bahan', 'name': 'Keramik 30x30', 'unit': 'M2', 'price': 65000},
+    {'id': 'M.15b', 'category': 'Bahan', 'name': 'Keramik 40x40', 'unit': 'M2', 'price': 75000},
+    {'id': 'M.15c', 'category': 'Bahan', 'name': 'Keramik 60x60', 'unit': 'M2', 'price': 120000},
+    {'id': 'M.16', 'category': 'Bahan', 'name': 'Semen Warna', 'unit': 'Kg', 'price': 20000},
+    {'id': 'M.17', 'category': 'Bahan', 'name': 'Cat Interior', 'unit': 'Kg', 'price': 50000},
+    {'id': 'M.17b', 'category': 'Bahan', 'name': 'Cat Eksterior', 'unit': 'Kg', 'price': 75000},
+    {'id': 'M.17c', 'category': 'Bahan', 'name': 'Cat Plafon', 'unit': 'Kg', 'price': 45000},
+    {'id': 'M.18', 'category': 'Bahan', 'name': 'Plamir', 'unit': 'Kg', 'price': 15000},
+    {'id': 'M.19', 'category': 'Bahan', 'name': 'Gypsum 9mm', 'unit': 'Lbr', 'price': 85000},
+    {'id': 'M.20', 'category': 'Bahan', 'name': 'Hollow 4x4', 'unit': 'Btg', 'price': 25000},
+    {'id': 'M.21', 'category': 'Bahan', 'name': 'Baja Ringan C75', 'unit': 'Btg', 'price': 75000},
+    {'id': 'M.22', 'category': 'Bahan', 'name': 'Reng Baja', 'unit': 'Btg', 'price': 35000},
+    {'id': 'M.23', 'category': 'Bahan', 'name': 'Atap Metal', 'unit': 'M2', 'price': 45000},
+    {'id': 'M.24', 'category': 'Bahan', 'name': 'Seng Gelombang', 'unit': 'Lbr', 'price': 50000},
+
+    # Pintu Jendela
+    {'id': 'M.25', 'category': 'Bahan', 'name': 'Pintu UPVC', 'unit': 'Unit', 'price': 500000},
+    {'id': 'M.26', 'category': 'Bahan', 'name': 'Kusen Alum 4"', 'unit': 'M', 'price': 100000},
+    {'id': 'M.27', 'category': 'Bahan', 'name': 'Kaca 5mm', 'unit': 'M2', 'price': 120000},
+    {'id': 'M.28', 'category': 'Bahan', 'name': 'Engsel', 'unit': 'Bh', 'price': 25000},
+
+    # MEP Materials
+    {'id': 'E.01', 'category': 'Bahan', 'name': 'Kabel NYM 3x2.5', 'unit': 'M', 'price': 12000},
+    {'id': 'E.02', 'category': 'Bahan', 'name': 'Saklar Tunggal', 'unit': 'Bh', 'price': 29000},
+    {'id': 'E.03', 'category': 'Bahan', 'name': 'Stop Kontak', 'unit': 'Bh', 'price': 27200},
+    {'id': 'E.04', 'category': 'Bahan', 'name': 'Lampu LED 14W', 'unit': 'Bh', 'price': 46681},
+    {'id': 'E.05', 'category': 'Bahan', 'name': 'Pipa Conduit', 'unit': 'Btg', 'price': 8000},
+    {'id': 'P.01', 'category': 'Bahan', 'name': 'Pipa PVC 3/4"', 'unit': 'Btg', 'price': 40000},
+    {'id': 'P.02', 'category': 'Bahan', 'name': 'Pipa PVC 4"', 'unit': 'Btg', 'price': 120000},
+    {'id': 'P.03', 'category': 'Bahan', 'name': 'Kloset Jongkok', 'unit': 'Bh', 'price': 500000},
+]
+
+# DATABASE AHSP MASTER (RESEP)
+DEFAULT_AHSP_MASTER = {
+    'AHSP.P.01': {'name': 'Pagar Seng Gelombang', 'unit': 'm', 'components': [{'id': 'L.01', 'coef': 0.4}, {'id': 'L.02.2', 'coef': 0.2}, {'id': 'M.12', 'coef': 0.015}, {'id': 'M.24', 'coef': 1.2}, {'id': 'M.10', 'coef': 0.05}]},
+    'AHSP.T.01': {'name': 'Galian Tanah Manual 1m', 'unit': 'm3', 'components': [{'id': 'L.01', 'coef': 0.75}, {'id': 'L.04', 'coef': 0.025}]},
+    'AHSP.S.01': {'name': 'Beton K-200 (Manual)', 'unit': 'm3', 'components': [{'id': 'L.01', 'coef': 1.65}, {'id': 'L.02.1', 'coef': 0.275}, {'id': 'M.01', 'coef': 352}, {'id': 'M.02', 'coef': 731}, {'id': 'M.04', 'coef': 1031}]},
+    'AHSP.S.02': {'name': 'Pembesian Besi Polos', 'unit': 'kg', 'components': [{'id': 'L.01', 'coef': 0.007}, {'id': 'L.02.3', 'coef': 0.007}, {'id': 'M.08', 'coef': 1.05}, {'id': 'M.09', 'coef': 0.015}]},
+    'AHSP.S.03': {'name': 'Pasang Bekisting', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.66}, {'id': 'L.02.2', 'coef': 0.33}, {'id': 'M.11', 'coef': 0.04}, {'id': 'M.13', 'coef': 0.35}, {'id': 'M.14', 'coef': 0.1}]},
+    'AHSP.S.04': {'name': 'Pondasi Batu Belah 1:5', 'unit': 'm3', 'components': [{'id': 'L.01', 'coef': 1.5}, {'id': 'L.02.1', 'coef': 0.75}, {'id': 'M.05', 'coef': 1.2}, {'id': 'M.01', 'coef': 136}, {'id': 'M.03', 'coef': 0.544}]},
+    'AHSP.A.01': {'name': 'Pas. Bata Merah 1:5', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.3}, {'id': 'L.02.1', 'coef': 0.1}, {'id': 'M.06', 'coef': 70}, {'id': 'M.01', 'coef': 9.68}, {'id': 'M.03', 'coef': 0.045}]},
+    'AHSP.A.01b': {'name': 'Pas. Bata Ringan', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.2}, {'id': 'L.02.1', 'coef': 0.1}, {'id': 'M.07', 'coef': 8.5}, {'id': 'M.01b', 'coef': 4}]},
+    'AHSP.A.01c': {'name': 'Pas. Dinding Roster', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.3}, {'id': 'L.02.1', 'coef': 0.15}, {'id': 'M.07c', 'coef': 25}, {'id': 'M.01', 'coef': 11}]},
+    'AHSP.A.02': {'name': 'Plesteran 1:5', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.3}, {'id': 'L.02.1', 'coef': 0.15}, {'id': 'M.01', 'coef': 6.24}, {'id': 'M.03', 'coef': 0.024}]},
+    'AHSP.A.03': {'name': 'Acian Semen', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.2}, {'id': 'L.02.1', 'coef': 0.1}, {'id': 'M.01', 'coef': 3.25}]},
+    'AHSP.A.04': {'name': 'Pas. Keramik 30x30', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.7}, {'id': 'L.02.1', 'coef': 0.35}, {'id': 'M.15', 'coef': 1.05}, {'id': 'M.01', 'coef': 10}, {'id': 'M.16', 'coef': 1.5}]},
+    'AHSP.A.04b': {'name': 'Pas. Keramik 40x40', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.65}, {'id': 'L.02.1', 'coef': 0.35}, {'id': 'M.15b', 'coef': 1.05}, {'id': 'M.01', 'coef': 10}, {'id': 'M.16', 'coef': 1.5}]},
+    'AHSP.A.04c': {'name': 'Pas. Keramik 60x60', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.6}, {'id': 'L.02.1', 'coef': 0.35}, {'id': 'M.15c', 'coef': 1.05}, {'id': 'M.01', 'coef': 9}, {'id': 'M.16', 'coef': 1.5}]},
+    'AHSP.PL.01': {'name': 'Plafon Hollow+Gypsum', 'unit': 'm2', 'components': [{'id': 'L.02.2', 'coef': 0.35}, {'id': 'M.19', 'coef': 1.1}, {'id': 'M.20', 'coef': 3}, {'id': 'M.10', 'coef': 0.1}]},
+    'AHSP.CAT.01': {'name': 'Cat Dinding Interior', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.02}, {'id': 'L.02.4', 'coef': 0.063}, {'id': 'M.17', 'coef': 0.26}, {'id': 'M.18', 'coef': 0.1}]},
+    'AHSP.CAT.02': {'name': 'Cat Dinding Eksterior', 'unit': 'm2', 'components': [{'id': 'L.01', 'coef': 0.03}, {'id': 'L.02.4', 'coef': 0.07}, {'id': 'M.17b', 'coef': 0.26}, {'id': 'M.18', 'coef': 0.1}]},
+    'AHSP.M.01': {'name': 'Titik Lampu', 'unit': 'ttk', 'components': [{'id': 'L.01', 'coef': 0.5}, {'id': 'L.02.5', 'coef': 0.5}, {'id': 'E.01', 'coef': 12}, {'id': 'E.05', 'coef': 3}]},
+    'AHSP.P.01': {'name': 'Pasang Kloset Jongkok', 'unit': 'bh', 'components': [{'id': 'L.02.1', 'coef': 1.5}, {'id': 'P.03', 'coef': 1}, {'id': 'M.01', 'coef': 6}]},
+    'AHSP.P.02': {'name': 'Instalasi Air Bersih', 'unit': 'm', 'components': [{'id': 'L.02.6', 'coef': 0.15}, {'id': 'P.01', 'coef': 1.2}]},
+}
+
+# DATA RAB (CONTOH PROYEK)
+DEFAULT_RAB_DATA = [
+    {
+        "id": "A", "title": "PEKERJAAN PERSIAPAN",
+        "subgroups": [
+            {
+                "id": "A.1", "title": "Pekerjaan Pembersihan",
+                "items": [
+                    {"name": "Pembersihan & Kupasan Lahan", "unit": "M2", "vol": 200.0, "ahsp": None, "manual_price": 12457.5},
+                    {"name": "Tebas Tebang Tanaman", "unit": "M2", "vol": 200.0, "ahsp": None, "manual_price": 3943.5},
+                    {"name": "Cabut Tunggul Pohon", "unit": "Bh", "vol": 10.0, "ahsp": None, "manual_price": 152903},
+                ]
+            },
+            {
+                "id": "A.2", "title": "Pekerjaan Bongkaran",
+                "items": [
+                    {"name": "Bongkaran Batu Belah", "unit": "M3", "vol": 27.0, "ahsp": None, "manual_price": 152515},
+                    {"name": "Bongkar Beton Manual", "unit": "M3", "vol": 10.8, "ahsp": None, "manual_price": 168327},
+                    {"name": "Bongkaran Dinding Bata", "unit": "M3", "vol": 18.0, "ahsp": None, "manual_price": 21367.5},
+                    {"name": "Bongkaran Atap", "unit": "M2", "vol": 45.0, "ahsp": None, "manual_price": 13538.8},
+                ]
+            },
+            {
+                "id": "A.3", "title": "Fasilitas Sementara",
+                "items": [
+                    {"name": "Pagar Seng Gelombang t=2m", "unit": "M'", "vol": 90.0, "ahsp": "AHSP.P.01", "manual_price": 0},
+                    {"name": "Direksi Keet / Gudang", "unit": "M2", "vol": 15.0, "ahsp": None, "manual_price": 330678},
+                    {"name": "Papan Nama Proyek", "unit": "Bh", "vol": 1.0, "ahsp": None, "manual_price": 373642},
+                    {"name": "Bouwplank / Pengukuran", "unit": "M'", "vol": 95.5, "ahsp": None, "manual_price": 17782.6},
+                ]
+            }
+        ]
+    },
+    {
+        "id": "B", "title": "PEKERJAAN STRUKTUR BAWAH",
+        "subgroups": [
+            {
+                "id": "B.1", "title": "Pekerjaan Tanah",
+                "items": [
+                    {"name": "Galian Tanah Pondasi", "unit": "M3", "vol": 45.2, "ahsp": "AHSP.T.01", "manual_price": 0},
+                    {"name": "Urukan Pasir Bawah", "unit": "M3", "vol": 5.0, "ahsp": None, "manual_price": 187500},
+                    {"name": "Urukan Tanah Kembali", "unit": "M3", "vol": 15.0, "ahsp": None, "manual_price": 62287.5},
+                ]
+            },
+            {
+                "id": "B.2", "title": "Pekerjaan Pondasi",
+                "items": [
+                    {"name": "Pondasi Batu Belah 1:5", "unit": "M3", "vol": 54.0, "ahsp": "AHSP.S.04", "manual_price": 0},
+                    {"name": "Footplat Beton (K-200)", "unit": "M3", "vol": 15.0, "ahsp": "AHSP.S.01", "manual_price": 0},
+                    {"name": "Pembesian Footplat", "unit": "Kg", "vol": 1800.0, "ahsp": "AHSP.S.02", "manual_price": 0},
+                    {"name": "Sloof Beton 20x30", "unit": "M3", "vol": 9.0, "ahsp": "AHSP.S.01", "manual_price": 0},
+                    {"name": "Pembesian Sloof", "unit": "Kg", "vol": 1250.0, "ahsp": "AHSP.S.02", "manual_price": 0},
+                    {"name": "Bekisting Sloof", "unit": "M2", "vol": 84.4, "ahsp": "AHSP.S.03", "manual_price": 0},
+                ]
+            }
+        ]
+    },
+    {
+        "id": "C", "title": "PEKERJAAN STRUKTUR ATAS",
+        "subgroups": [
+            {
+                "id": "C.1", "title": "Struktur Lantai 1",
+                "items": [
+                    {"name": "Kolom K1 (40x40)", "unit": "M3", "vol": 5.6, "ahsp": "AHSP.S.01", "manual_price": 0},
+                    {"name": "Bekisting Kolom K1", "unit": "M2", "vol": 63.0, "ahsp": "AHSP.S.03", "manual_price": 0},
+                    {"name": "Pembesian Kolom K1", "unit": "Kg", "vol": 12557.0, "ahsp": "AHSP.S.02", "manual_price": 0},
+                    {"name": "Balok B1 (30x50)", "unit": "M3", "vol": 12.0, "ahsp": "AHSP.S.01", "manual_price": 0},
+                    {"name": "Bekisting Balok B1", "unit": "M2", "vol": 166.5, "ahsp": "AHSP.S.03", "manual_price": 0},
+                    {"name": "Plat Lantai 2 (12cm)", "unit": "M3", "vol": 7.92, "ahsp": "AHSP.S.01", "manual_price": 0},
+                ]
+            },
+            {
+                "id": "C.2", "title": "Struktur Lantai 2 & Atap",
+                "items": [
+                    {"name": "Kolom K1 Lt.2", "unit": "M3", "vol": 5.6, "ahsp": "AHSP.S.01", "manual_price": 0},
+                    {"name": "Ring Balok", "unit": "M3", "vol": 19.75, "ahsp": "AHSP.S.01", "manual_price": 0},
+                    {"name": "Kolom Praktis", "unit": "M3", "vol": 1.5, "ahsp": "AHSP.S.01", "manual_price": 0},
+                    {"name": "Tangga Beton", "unit": "M3", "vol": 2.04, "ahsp": "AHSP.S.01", "manual_price": 0},
+                    {"name": "Pembesian Str Lt.2", "unit": "Kg", "vol": 12272.0, "ahsp": "AHSP.S.02", "manual_price": 0},
+                ]
+            }
+        ]
+    },
+    {
+        "id": "D", "title": "PEKERJAAN ARSITEKTUR",
+        "subgroups": [
+            {
+                "id": "D.1", "title": "Dinding",
+                "items": [
+                    {"name": "Pas. Bata Merah Lt.1", "unit": "M2", "vol": 150.5, "ahsp": "AHSP.A.01", "manual_price": 0},
+                    {"name": "Pas. Bata Merah Lt.2", "unit": "M2", "vol": 109.5, "ahsp": "AHSP.A.01", "manual_price": 0},
+                    {"name": "Plesteran Dinding", "unit": "M2", "vol": 518.0, "ahsp": "AHSP.A.02", "manual_price": 0},
+                    {"name": "Acian Dinding", "unit": "M2", "vol": 518.0, "ahsp": "AHSP.A.03", "manual_price": 0},
+                    {"name": "Dinding Roster", "unit": "M2", "vol": 20.0, "ahsp": "AHSP.A.01c", "manual_price": 0},
+                ]
+            },
+            {
+                "id": "D.2", "title": "Lantai & Dinding",
+                "items": [
+                    {"name": "Lantai Keramik 30x30", "unit": "M2", "vol": 85.0, "ahsp": "AHSP.A.04", "manual_price": 0},
+                    {"name": "Lantai Keramik 40x40", "unit": "M2", "vol": 33.0, "ahsp": "AHSP.A.04b", "manual_price": 0},
+                    {"name": "Lantai Keramik 60x60", "unit": "M2", "vol": 28.0, "ahsp": "AHSP.A.04c", "manual_price": 0},
+                    {"name": "Plint Keramik", "unit": "M'", "vol": 80.0, "ahsp": None, "manual_price": 44620},
+                ]
+            },
+            {
+                "id": "D.3", "title": "Plafon",
+                "items": [
+                    {"name": "Rangka+Plafon Gypsum", "unit": "M2", "vol": 92.0, "ahsp": "AHSP.PL.01", "manual_price": 0},
+                    {"name": "List Plafon", "unit": "M'", "vol": 95.5, "ahsp": None, "manual_price": 18782},
+                ]
+            },
+            {
+                "id": "D.4", "title": "Pintu & Jendela",
+                "items": [
+                    {"name": "Kusen Aluminium 4\"", "unit": "M'", "vol": 32.0, "ahsp": None, "manual_price": 154589},
+                    {"name": "Daun Pintu UPVC", "unit": "Bh", "vol": 6.0, "ahsp": None, "manual_price": 592860},
+                    {"name": "Jendela Kaca Frame Alu", "unit": "M2", "vol": 4.3, "ahsp": None, "manual_price": 327360},
+                    {"name": "Kaca Polos 5mm", "unit": "M2", "vol": 20.0, "ahsp": None, "manual_price": 73183},
+                    {"name": "Engsel Pintu", "unit": "Bh", "vol": 18.0, "ahsp": None, "manual_price": 44583},
+                    {"name": "Kunci Tanam", "unit": "Bh", "vol": 6.0, "ahsp": None, "manual_price": 112332},
+                ]
+            },
+            {
+                "id": "D.5", "title": "Pengecatan",
+                "items": [
+                    {"name": "Cat Dinding Interior", "unit": "M2", "vol": 301.0, "ahsp": "AHSP.CAT.01", "manual_price": 0},
+                    {"name": "Cat Dinding Eksterior", "unit": "M2", "vol": 100.0, "ahsp": "AHSP.CAT.02", "manual_price": 0},
+                    {"name": "Cat Plafon", "unit": "M2", "vol": 92.0, "ahsp": None, "manual_price": 32539},
+                ]
+            }
+        ]
+    },
+    {
+        "id": "E", "title": "MEKANIKAL & ELEKTRIKAL",
+        "subgroups": [
+            {
+                "id": "E.1", "title": "Armatur Lampu",
+                "items": [
+                    {"name": "Downlight 5 Inch LED", "unit": "Unit", "vol": 10.0, "ahsp": None, "manual_price": 46681.8},
+                    {"name": "Fitting E27 + LED", "unit": "Unit", "vol": 25.0, "ahsp": None, "manual_price": 70881.8},
+                    {"name": "Lampu Sorot LED 100W", "unit": "Unit", "vol": 2.0, "ahsp": None, "manual_price": 69132.8},
+                    {"name": "Lampu Taman+Tiang", "unit": "Unit", "vol": 18.0, "ahsp": None, "manual_price": 101139},
+                    {"name": "Lampu PJU Kawasan", "unit": "Unit", "vol": 18.0, "ahsp": None, "manual_price": 738614},
+                ]
+            },
+            {
+                "id": "E.2", "title": "Instalasi",
+                "items": [
+                    {"name": "Instalasi Lampu", "unit": "Titik", "vol": 100.0, "ahsp": "AHSP.M.01", "manual_price": 0},
+                    {"name": "Instalasi Lampu Taman", "unit": "Titik", "vol": 10.0, "ahsp": None, "manual_price": 258126},
+                    {"name": "Instalasi PJU", "unit": "Titik", "vol": 4.0, "ahsp": None, "manual_price": 421476},
+                ]
+            },
+            {
+                "id": "E.3", "title": "Saklar & Stop Kontak",
+                "items": [
+                    {"name": "Saklar Tunggal", "unit": "Unit", "vol": 20.0, "ahsp": None, "manual_price": 29025.7},
+                    {"name": "Saklar Ganda", "unit": "Unit", "vol": 20.0, "ahsp": None, "manual_price": 29025.7},
+                    {"name": "Stop Kontak", "unit": "Unit", "vol": 30.0, "ahsp": None, "manual_price": 27199.7},
+                    {"name": "MCB Box", "unit": "Unit", "vol": 4.0, "ahsp": None, "manual_price": 489802},
+                ]
+            },
+            {
+                "id": "E.4", "title": "Tata Udara (AC)",
+                "items": [
+                    {"name": "AC Split 1/2 PK", "unit": "Unit", "vol": 4.0, "ahsp": None, "manual_price": 871138},
+                    {"name": "AC Split 1 PK", "unit": "Unit", "vol": 3.0, "ahsp": None, "manual_price": 917060},
+                    {"name": "Stop Kontak AC", "unit": "Unit", "vol": 6.0, "ahsp": None, "manual_price": 37483},
+                ]
+            }
+        ]
+    },
+    {
+        "id": "F", "title": "PLUMBING & SANITAIR",
+        "subgroups": [
+            {
+                "id": "F.1", "title": "Sanitair",
+                "items": [
+                    {"name": "Closet Duduk", "unit": "Bh", "vol": 2.0, "ahsp": None, "manual_price": 885390},
+                    {"name": "Closet Jongkok", "unit": "Bh", "vol": 1.0, "ahsp": "AHSP.P.01", "manual_price": 0},
+                    {"name": "Floor Drain", "unit": "Bh", "vol": 6.0, "ahsp": None, "manual_price": 37050},
+                    {"name": "Kran Air 1/2", "unit": "Bh", "vol": 10.0, "ahsp": None, "manual_price": 78960},
+                    {"name": "Jet Washer", "unit": "Bh", "vol": 4.0, "ahsp": None, "manual_price": 67960},
+                ]
+            },
+            {
+                "id": "F.2", "title": "Perpipaan & Pompa",
+                "items": [
+                    {"name": "Pipa PVC AW 1/2\"", "unit": "M'", "vol": 20.0, "ahsp": None, "manual_price": 37822},
+                    {"name": "Pipa PVC AW 3/4\"", "unit": "M'", "vol": 10.0, "ahsp": "AHSP.P.02", "manual_price": 0},
+                    {"name": "Pipa PVC D 4\" (Kotor)", "unit": "M'", "vol": 20.0, "ahsp": None, "manual_price": 89736},
+                    {"name": "Pompa Transfer", "unit": "Bh", "vol": 2.0, "ahsp": None, "manual_price": 1381751},
+                    {"name": "Pompa Booster", "unit": "Bh", "vol": 1.0, "ahsp": None, "manual_price": 1245424},
+                    {"name": "Septictank & Resapan", "unit": "Ls", "vol": 1.0, "ahsp": None, "manual_price": 3500000},
+                ]
+            }
+        ]
+    }
+]
+
+
+# ==========================================
+# 2. LOGIC ENGINE (THE CALCULATOR)
+# ==========================================
+# Uang dihitung sebagai integer fixed-point (int64 / int Python), bukan float:
+# hasil tidak bergantung urutan penjumlahan dan sama persis antara jalur
+# vektor (NumPy) dan jalur inkremental. Aturan pembulatan (setengah menjauhi nol):
+#   harga resource & harga manual  -> sen (1/100 Rp)
+#   koefisien AHSP                 -> 1/10.000
+#   volume item                    -> 1/1.000
+#   harga satuan AHSP  = Σ harga×koef (eksak), dibulatkan SEKALI ke sen
+#   total item         = harga satuan × volume, dibulatkan ke sen
+#   sub/divisi/fisik   = jumlah integer eksak
+#   profit = fisik × %profit, PPN = (fisik + profit) × %PPN, masing-masing dibulatkan ke sen
+# Jalur vektor memakai int64 selama batas nilai menjamin tidak overflow; data di luar
+# batas itu (item / koefisien raksasa) otomatis dihitung dengan integer Python (dtype object).
+# Nilai di rab_data / ahsp_prices tetap Rupiah (float = sen / 100) agar format JSON tidak berubah.
+MONEY_SCALE = 100
+COEF_SCALE = 10_000
+VOL_SCALE = 1_000
+PERCENT_SCALE = 100  # persen pajak dalam 1/100 % (mis. 11.5% -> 1150)
+# Menyerap galat representasi float desimal (0.285 * 100 = 28.4999...) sebelum pembulatan
+_ROUND_EPS = 1e-7
+# Batas |hasil antara| int64: round_div_array menghitung 2|a| + b, jadi disisakan ruang di bawah 2^63
+_INT64_LIMIT = 2 ** 61
+
+def quantize(value, scale):
+    """Nilai desimal -> integer berskala (pembulatan setengah menjauhi nol); kosong/NaN -> 0"""
+    x = float(value or 0) * scale
+    if x != x:
+        return 0
+    q = int(math.floor(abs(x) + 0.5 + _ROUND_EPS))
+    return q if x >= 0 else -q
+
+def quantize_array(values, scale):
+    """Versi array dari quantize (hasil identik per elemen); mengembalikan int64"""
+    x = np.nan_to_num(np.asarray(values, dtype=float)) * scale
+    q = np.sign(x) * np.floor(np.abs(x) + 0.5 + _ROUND_EPS)
+    if q.size and np.abs(q).max() >= _INT64_LIMIT:
+        # Di luar jangkauan int64: integer Python (eksak, lebih lambat)
+        return np.array([int(v) for v in q.tolist()], dtype=object).reshape(q.shape)
+    return q.astype(np.int64)
+
+def _abs_max(a):
+    return int(np.abs(a).max()) if len(a) else 0
+
+def widen(bound, *arrays):
+    """Array integer tetap int64 bila `bound` (batas |hasil antara|) aman, selain itu semua jadi object (int Python)"""
+    if bound < _INT64_LIMIT and all(a.dtype != object for a in arrays):
+        return arrays
+    return tuple(a.astype(object) for a in arrays)
+
+def exact_dtype(*arrays, factor=1):
+    """Dtype untuk Π arrays dijumlahkan hingga `factor` suku tanpa overflow diam-diam (lihat widen)"""
+    bound = factor
+    for a in arrays:
+        bound *= _abs_max(a)
+    return widen(bound, *arrays)
+
+def round_div(a, b):
+    """a / b dibulatkan ke integer terdekat, setengah menjauhi nol (a, b integer, b > 0)"""
+    q = (2 * abs(a) + b) // (2 * b)
+    return q if a >= 0 else -q
+
+def round_div_array(a, b):
+    """Versi array (int64) dari round_div"""
+    q = (2 * np.abs(a) + b) // (2 * b)
+    return np.where(a >= 0, q, -q)
+
+def to_sen(rupiah):
+    return quantize(rupiah, MONEY_SCALE)
+
+def from_sen(sen):
+    """Sen -> Rupiah (float, untuk tampilan / JSON)"""
+    return sen / MONEY_SCALE
+
+def calculate_ahsp_price(ahsp_id, res_map, ahsp_master, ahsp_prices=None):
+    """Menghitung harga satuan AHSP dengan Resource Map yang dioptimasi.
+
+    Komponen boleh berupa sub-analisa (id AHSP lain). Harganya diambil dari
+    `ahsp_prices` (memo) bila ada, selain itu dihitung dan disimpan ke memo.
+    """
+    recipe = ahsp_master.get(ahsp_id)
+    if not recipe: return 0
+    
+    total = 0  # Σ sen × koef berskala, eksak
+    for comp in recipe['components']:
+        comp_id = comp['id']
+        if comp_id in res_map:
+            price = res_map[comp_id]
+        elif comp_id in ahsp_master:
+            if ahsp_prices is None:
+                ahsp_prices = {}
+            if comp_id not in ahsp_prices:
+                ahsp_prices[comp_id] = calculate_ahsp_price(comp_id, res_map, ahsp_master, ahsp_prices)
+            price = ahsp_prices[comp_id]
+        else:
+            # Tidak ada di database (misal dihapus) -> harga 0
+            price = 0
+        total += to_sen(price) * quantize(comp['coef'], COEF_SCALE)
+    return from_sen(round_div(total, COEF_SCALE))
+
+class AhspCycleError(ValueError):
+    """Resep AHSP saling memakai sebagai sub-analisa (A -> B -> A)"""
+
+    def __init__(self, cycle):
+        self.cycle = cycle
+        super().__init__("Siklus sub-analisa AHSP: " + " -> ".join(cycle))
+
+def sub_analyses(recipe, ahsp_master, res_ids):
+    """Id komponen yang merupakan sub-analisa (AHSP); id yang juga resource dihitung sebagai resource"""
+    return {comp['id'] for comp in recipe['components'] if comp['id'] in ahsp_master and comp['id'] not in res_ids}
+
+def ahsp_order(ahsp_master, res_ids, subset=None):
+    """Urutan topologis AHSP (Kahn): list level, level k hanya memakai sub-analisa level < k.
+
+    `subset` membatasi ke sebagian AHSP (ketergantungan di luar subset dianggap
+    sudah final). Melempar AhspCycleError bila ada siklus.
+    """
+    ids = list(ahsp_master) if subset is None else [a for a in subset if a in ahsp_master]
+    id_set = set(ids)
+    children = {a: sub_analyses(ahsp_master[a], ahsp_master, res_ids) & id_set for a in ids}
+    parents = defaultdict(list)
+    pending = {}
+    for ahsp_id, subs in children.items():
+        pending[ahsp_id] = len(subs)
+        for sub_id in subs:
+            parents[sub_id].append(ahsp_id)
+
+    levels = []
+    level = [a for a in ids if pending[a] == 0]
+    while level:
+        levels.append(level)
+        nxt = []
+        for sub_id in level:
+            for parent in parents[sub_id]:
+                pending[parent] -= 1
+                if pending[parent] == 0:
+                    nxt.append(parent)
+        level = nxt
+
+    if sum(map(len, levels)) < len(ids):
+        # Setiap AHSP yang tersisa punya sub-analisa yang juga tersisa -> telusuri sampai berulang
+        node = next(a for a in ids if pending[a] > 0)
+        path, seen = [], {}
+        while node not in seen:
+            seen[node] = len(path)
+            path.append(node)
+            node = next(c for c in children[node] if pending[c] > 0)
+        raise AhspCycleError(path[seen[node]:] + [node])
+    return levels
+
+def build_coef_matrix(ahsp_master, res_ids):
+    """Menyusun matriks koefisien AHSP x Resource (sparse, format COO: baris, kolom, koef)"""
+    res_pos = {rid: i for i, rid in enumerate(res_ids)}
+    ahsp_ids = list(ahsp_master.keys())
+    rows, cols, coefs = [], [], []
+    for r, ahsp_id in enumerate(ahsp_ids):
+        for comp in ahsp_master[ahsp_id]['components']:
+            rows.append(r)
+            # Resource yang tidak ada di database (atau sub-analisa) -> kolom -1 (harga 0)
+            cols.append(res_pos.get(comp['id'], -1))
+            coefs.append(comp['coef'])
+    return (
+        ahsp_ids,
+        np.array(rows, dtype=np.intp),
+        np.array(cols, dtype=np.intp),
+        np.array(coefs, dtype=float),
+    )
+
+def build_nested_matrix(ahsp_master, ahsp_ids, res_ids):
+    """Matriks AHSP x AHSP untuk komponen sub-analisa (COO: baris induk, baris sub, koef)"""
+    ahsp_pos = {ahsp_id: i for i, ahsp_id in enumerate(ahsp_ids)}
+    rows, subs, coefs = [], [], []
+    for r, ahsp_id in enumerate(ahsp_ids):
+        for comp in ahsp_master[ahsp_id]['components']:
+            if comp['id'] in ahsp_pos and comp['id'] not in res_ids:
+                rows.append(r)
+                subs.append(ahsp_pos[comp['id']])
+                coefs.append(comp['coef'])
+    return np.array(rows, dtype=np.intp), np.array(subs, dtype=np.intp), np.array(coefs, dtype=float)
+
+def price_all_ahsp(ahsp_master, resources):
+    """Menghitung harga satuan SELURUH AHSP dalam satu perkalian matriks x vektor harga.
+
+    Sub-analisa dievaluasi per level urutan topologis: tiap resep dihitung
+    tepat sekali, jadi library berlapis tetap satu lintasan linear.
+    Mengembalikan (ahsp_ids, harga_satuan_sen int64).
+    """
+    # Duplikat id: harga terakhir yang dipakai (sama seperti set_index().to_dict())
+    res_ids = resources['id'].tolist()
+    ahsp_ids, rows, cols, coefs = build_coef_matrix(ahsp_master, res_ids)
+
+    # Slot terakhir bernilai 0 untuk resource yang hilang (kolom -1)
+    price_vec = np.append(quantize_array(resources['price'].to_numpy(dtype=float), MONEY_SCALE), 0)
+    coefs = quantize_array(coefs, COEF_SCALE)
+
+    # Akumulasi integer per baris (eksak, tidak bergantung urutan), dibulatkan sekali ke sen.
+    # Suku terbanyak per baris = jumlah komponen resep terpanjang (resource + sub-analisa).
+    n_terms = max((len(recipe['components']) for recipe in ahsp_master.values()), default=0)
+    prices, coefs = exact_dtype(price_vec[cols], coefs, factor=n_terms)
+    raw = np.zeros(len(ahsp_ids), dtype=prices.dtype)
+    np.add.at(raw, rows, prices * coefs)
+    ahsp_prices = round_div_array(raw, COEF_SCALE)
+
+    res_set = set(res_ids)
+    levels = ahsp_order(ahsp_master, res_set)
+    if len(levels) > 1:
+        parent_rows, sub_rows, sub_coefs = build_nested_matrix(ahsp_master, ahsp_ids, res_set)
+        ahsp_pos = {ahsp_id: i for i, ahsp_id in enumerate(ahsp_ids)}
+        row_level = np.zeros(len(ahsp_ids), dtype=np.intp)
+        for k, level in enumerate(levels):
+            row_level[[ahsp_pos[a] for a in level]] = k
+        entry_level = row_level[parent_rows]
+        sub_coefs = quantize_array(sub_coefs, COEF_SCALE)
+        for k in range(1, len(levels)):
+            sel = entry_level == k
+            # Sub-analisa ada di level < k, harganya (sen, sudah dibulatkan) sudah final.
+            # Batas memperhitungkan suku resource yang sudah ada di raw.
+            sub_prices, level_coefs = ahsp_prices[sub_rows[sel]], sub_coefs[sel]
+            bound = _abs_max(raw) + _abs_max(sub_prices) * _abs_max(level_coefs) * n_terms
+            raw, ahsp_prices, sub_prices, level_coefs = widen(bound, raw, ahsp_prices, sub_prices, level_coefs)
+            np.add.at(raw, parent_rows[sel], sub_prices * level_coefs)
+            level_rows = row_level == k
+            ahsp_prices[level_rows] = round_div_array(raw[level_rows], COEF_SCALE)
+    return ahsp_ids, ahsp_prices
+
+def price_project(rab_data, ahsp_master, resources):
+    """Menghitung harga seluruh item, sub_total & group_total (tervektorisasi).
+
+    Mengembalikan (grand_total_fisik, {ahsp_id: harga_satuan}).
+    """
+    # 1. Harga semua AHSP dihitung SEKALI, bukan per item yang mereferensikannya
+    ahsp_ids, ahsp_prices = price_all_ahsp(ahsp_master, resources)
+    ahsp_pos = {ahsp_id: i for i, ahsp_id in enumerate(ahsp_ids)}
+
+    # 2. Ratakan struktur Divisi -> Sub -> Item menjadi kolom array
+    items, item_sub, item_ahsp, vols, manual = [], [], [], [], []
+    subs, sub_group = [], []
+    for g_idx, group in enumerate(rab_data):
+        for sub in group.get('subgroups', []):
+            s_idx = len(subs)
+            subs.append(sub)
+            sub_group.append(g_idx)
+            for item in sub['items']:
+                items.append(item)
+                item_sub.append(s_idx)
+                # LOGIKA UTAMA: LINKING AHSP -> HARGA SATUAN (-1 = pakai harga manual)
+                item_ahsp.append(ahsp_pos.get(item['ahsp'], -1) if item.get('ahsp') else -1)
+                vols.append(item['vol'])
+                manual.append(item.get('manual_price', 0))
+
+    item_sub = np.array(item_sub, dtype=np.intp)
+    item_ahsp = np.array(item_ahsp, dtype=np.intp)
+    vols = quantize_array(np.array(vols, dtype=float), VOL_SCALE)
+    manual = quantize_array(np.array(manual, dtype=float), MONEY_SCALE)
+
+    # 3. Harga satuan & total item (sen), lalu group-by integer ke Sub dan Divisi
+    unit_prices = np.where(item_ahsp >= 0, np.append(ahsp_prices, 0)[item_ahsp], manual)
+    unit_prices, vols = exact_dtype(unit_prices, vols)
+    total_prices = round_div_array(unit_prices * vols, VOL_SCALE)
+    # Batas jumlah: seluruh item proyek bertotal maksimum
+    (total_prices,) = widen(_abs_max(total_prices) * len(total_prices), total_prices)
+    sub_totals = np.zeros(len(subs), dtype=total_prices.dtype)
+    np.add.at(sub_totals, item_sub, total_prices)
+    group_totals = np.zeros(len(rab_data), dtype=total_prices.dtype)
+    np.add.at(group_totals, np.array(sub_group, dtype=np.intp), sub_totals)
+
+    # UPDATE DATA DI STATE (Rupiah)
+    for item, unit_price, total_price in zip(items, (unit_prices / MONEY_SCALE).tolist(), (total_prices / MONEY_SCALE).tolist()):
+        item['current_price'] = unit_price
+        item['total_price'] = total_price
+    for sub, sub_total in zip(subs, (sub_totals / MONEY_SCALE).tolist()):
+        sub['sub_total'] = sub_total
+    for group, group_total in zip(rab_data, (group_totals / MONEY_SCALE).tolist()):
+        group['group_total'] = group_total
+
+    grand_total_fisik = from_sen(int(group_totals.sum()))
+    return grand_total_fisik, dict(zip(ahsp_ids, (ahsp_prices / MONEY_SCALE).tolist()))
+
+def demand_plan(ahsp_master, ahsp_ids, res_ids):
+    """Struktur resep untuk expand_demand: (entri sub-analisa per level, entri koefisien resource).
+
+    Hanya bergantung pada resep & urutan id, jadi boleh dipakai ulang selama keduanya tetap.
+    """
+    ahsp_pos = {ahsp_id: i for i, ahsp_id in enumerate(ahsp_ids)}
+    res_set = set(res_ids)
+
+    # Sub-analisa: kebutuhan induk diturunkan ke sub, dari level tertinggi ke bawah
+    nested = []
+    levels = ahsp_order(ahsp_master, res_set)
+    if len(levels) > 1:
+        parent_rows, sub_rows, sub_coefs = build_nested_matrix(ahsp_master, ahsp_ids, res_set)
+        row_level = np.zeros(len(ahsp_ids), dtype=np.intp)
+        for k, level in enumerate(levels):
+            row_level[[ahsp_pos[a] for a in level]] = k
+        entry_level = row_level[parent_rows]
+        for k in range(len(levels) - 1, 0, -1):
+            sel = entry_level == k
+            nested.append((parent_rows[sel], sub_rows[sel], sub_coefs[sel]))
+
+    _, rows, cols, coefs = build_coef_matrix(ahsp_master, res_ids)
+    known = cols >= 0
+    return nested, (rows[known], cols[known], coefs[known]), len(res_ids)
+
+def expand_demand(demand, ahsp_master, ahsp_ids, res_ids, plan=None):
+    """Menurunkan volume per AHSP menjadi kebutuhan per resource (vektorisasi, sub-analisa diurai).
+
+    `demand` berbentuk (n_baris, n_ahsp) sejajar `ahsp_ids`, misal satu baris per Divisi.
+    Mengembalikan matriks (n_baris, n_resource) sejajar `res_ids`. `plan` (demand_plan)
+    boleh diberikan agar struktur resep tidak dihitung ulang di setiap panggilan.
+    """
+    demand = np.array(demand, dtype=float)
+    nested, (rows, cols, coefs), n_res = plan or demand_plan(ahsp_master, ahsp_ids, res_ids)
+    for parent_rows, sub_rows, sub_coefs in nested:
+        np.add.at(demand, (slice(None), sub_rows), demand[:, parent_rows] * sub_coefs)
+    qty = np.zeros((demand.shape[0], n_res))
+    np.add.at(qty, (slice(None), cols), demand[:, rows] * coefs)
+    return qty
+
+def resource_demand(rab_data, ahsp_master, resources):
+    """Kebutuhan total tiap resource proyek: Σ(volume item × koefisien), sub-analisa diurai.
+
+    Mengembalikan array sejajar baris `resources` (id duplikat: baris terakhir).
+    Biaya item ber-AHSP = Σ(kebutuhan × harga), jadi array ini juga bobot linear
+    harga resource terhadap total fisik (dipakai simulasi risiko & rekap bahan/upah).
+    """
+    ahsp_ids = list(ahsp_master.keys())
+    ahsp_pos = {ahsp_id: i for i, ahsp_id in enumerate(ahsp_ids)}
+    item_ahsp, vols = [], []
+    for group in rab_data:
+        for sub in group.get('subgroups', []):
+            for item in sub['items']:
+                pos = ahsp_pos.get(item['ahsp'], -1) if item.get('ahsp') else -1
+                if pos >= 0:
+                    item_ahsp.append(pos)
+                    vols.append(item['vol'])
+    # Volume pekerjaan per AHSP
+    demand = np.bincount(np.array(item_ahsp, dtype=np.intp), weights=np.array(vols, dtype=float), minlength=len(ahsp_ids))
+    return expand_demand(demand[None, :], ahsp_master, ahsp_ids, resources['id'].tolist())[0]
+
+def apply_tax(real_cost, tax_settings):
+    """Profit & PPN atas biaya fisik (dibulatkan ke sen); mengembalikan (profit, ppn, final_total)"""
+    real = to_sen(real_cost)
+    scale = 100 * PERCENT_SCALE
+    profit = round_div(real * quantize(tax_settings['profit'], PERCENT_SCALE), scale)
+    ppn = round_div((real + profit) * quantize(tax_settings['ppn'], PERCENT_SCALE), scale)
+    return from_sen(profit), from_sen(ppn), from_sen(real + profit + ppn)
+
+def allocate_sen(total, weights):
+    """Membagi `total` (sen) sebanding `weights` (integer) dengan metode sisa terbesar.
+
+    Jumlah hasil sama persis dengan `total`; sisa kembar diberikan ke posisi paling awal.
+    """
+    weights = list(weights)
+    whole = sum(weights)
+    if whole < 0:
+        return [-share for share in allocate_sen(-total, [-w for w in weights])]
+    if whole == 0:
+        return [total if i == 0 else 0 for i in range(len(weights))]
+    shares = [total * w // whole for w in weights]
+    remainders = [total * w - share * whole for w, share in zip(weights, shares)]
+    for i in sorted(range(len(weights)), key=lambda i: -remainders[i])[:total - sum(shares)]:
+        shares[i] += 1
+    return shares
+
+def division_totals(rab_data, tax_settings):
+    """(biaya fisik, profit, PPN, grand total) per Divisi dalam Rupiah.
+
+    Profit & PPN proyek (apply_tax) dibagi ke Divisi sebanding biaya fisiknya, jadi
+    jumlah baris Divisi sama persis dengan total proyek (tidak dibulatkan per Divisi).
+    """
+    reals = [to_sen(group.get('group_total', 0)) for group in rab_data]
+    profit, ppn, _ = apply_tax(from_sen(sum(reals)), tax_settings)
+    profits = allocate_sen(to_sen(profit), reals)
+    ppns = allocate_sen(to_sen(ppn), [real + share for real, share in zip(reals, profits)])
+    return [(from_sen(real), from_sen(pr), from_sen(pp), from_sen(real + pr + pp)) for real, pr, pp in zip(reals, profits, ppns)]
+
+def tax_factor(tax_settings):
+    """Pengali Grand Total / biaya fisik tanpa pembulatan (untuk analisis linear, misal simulasi risiko)"""
+    return (1 + tax_settings['profit'] / 100) * (1 + tax_settings['ppn'] / 100)
+
+def summarize_totals(grand_total_fisik, rab_data, tax_settings):
+    """Profit, PPN, Grand Total & data grafik dari total fisik yang sudah dihitung"""
+    chart_data = [{"Divisi": group['title'], "Total": group['group_total']} for group in rab_data]
+    profit, ppn, final_total = apply_tax(grand_total_fisik, tax_settings)
+    return grand_total_fisik, profit, ppn, final_total, chart_data
+
+def upsert_resources(resources, price_list, remove_missing=False):
+    """Upsert tabel harga per id dalam satu merge vektor.
+
+    Kolom yang ada di `price_list` menimpa resource ber-id sama (sel kosong
+    tidak menimpa), id baru ditambahkan di akhir. Bila `remove_missing`,
+    resource yang tidak ada di `price_list` dihapus.
+    Mengembalikan (tabel_baru, {"added", "changed", "removed"}).
+    """
+    import pandas as pd
+
+    base = resources.drop_duplicates('id', keep='last').set_index('id')
+    incoming = price_list.drop_duplicates('id', keep='last').set_index('id')
+    cols = [c for c in base.columns if c in incoming.columns]
+
+    common = base.index.intersection(incoming.index)
+    added = incoming.index.difference(base.index, sort=False)
+    removed = base.index.difference(incoming.index, sort=False) if remove_missing else base.index[:0]
+
+    updated = base.copy()
+    new_vals = incoming[cols].reindex(base.index)
+    for col in cols:
+        updated[col] = new_vals[col].where(new_vals[col].notna(), base[col])
+
+    before, after = base.loc[common, cols], updated.loc[common, cols]
+    differs = (before != after) & ~(before.isna() & after.isna())
+    n_changed = int(differs.any(axis=1).sum())
+
+    merged = pd.concat([updated.drop(index=removed), incoming.loc[added].reindex(columns=base.columns)])
+    report = {"added": len(added), "changed": n_changed, "removed": len(removed)}
+    return merged.rename_axis('id').reset_index(), report
+
+def upsert_ahsp(ahsp_master, recipes):
+    """Resep dari `recipes` menimpa/menambah ahsp_master (in place).
+
+    Resep tanpa key name / unit (file import tanpa judul resep) mempertahankan
+    nama & satuan resep lama; resep baru memakai kode sebagai nama.
+    Mengembalikan (id_yang_berubah, {"added", "changed", "removed"}).
+    """
+    complete = {}
+    for ahsp_id, recipe in recipes.items():
+        old = ahsp_master.get(ahsp_id) or {}
+        complete[ahsp_id] = {"name": old.get('name', ahsp_id), "unit": old.get('unit', ""), **recipe}
+    recipes = complete
+    touched = [ahsp_id for ahsp_id, recipe in recipes.items() if ahsp_master.get(ahsp_id) != recipe]
+    n_added = sum(ahsp_id not in ahsp_master for ahsp_id in touched)
+    ahsp_master.update({ahsp_id: recipes[ahsp_id] for ahsp_id in touched})
+    return touched, {"added": n_added, "changed": len(touched) - n_added, "removed": 0}
+
+# Nilai default item baru (baris yang ditambahkan lewat editor)
+ITEM_DEFAULTS = {"name": None, "unit": None, "vol": 0.0, "ahsp": None, "manual_price": 0}
+
+def _is_missing(val):
+    return val is None or val != val  # None atau NaN
+
+def clean_item(item, ahsp_master):
+    """Normalisasi item hasil editor: kosong/NaN -> default, harga manual 0 bila AHSP dipilih"""
+    if _is_missing(item.get('ahsp')):
+        item['ahsp'] = None
+    for key in ('vol', 'manual_price'):
+        if _is_missing(item.get(key)):
+            item[key] = ITEM_DEFAULTS[key]
+    # Reset harga manual jika AHSP dipilih
+    if item['ahsp'] and item['ahsp'] in ahsp_master:
+        item['manual_price'] = 0
+    return item
+
+class AhspLibrary(MutableMapping):
+    """ahsp_master copy-on-write di atas library AHSP bersama (read-only).
+
+    `base` dipakai bersama oleh semua sesi/proyek dan tidak pernah diubah;
+    resep yang dibuat / diganti disimpan di `overrides`, yang dihapus di
+    `removed`. Memori per sesi sebanding jumlah resep yang diedit, bukan
+    besar library. Resep diganti utuh (ahsp_master[id] = resep_baru), tidak
+    diubah in place, sama seperti pemakaian ahsp_master selama ini.
+    """
+
+    def __init__(self, base, overrides=None, removed=None):
+        self.base = base
+        self.overrides = dict(overrides or {})
+        self.removed = set(removed or ())
+
+    def __getitem__(self, ahsp_id):
+        if ahsp_id in self.overrides:
+            return self.overrides[ahsp_id]
+        if ahsp_id in self.removed:
+            raise KeyError(ahsp_id)
+        return self.base[ahsp_id]
+
+    def __setitem__(self, ahsp_id, recipe):
+        self.overrides[ahsp_id] = recipe
+        self.removed.discard(ahsp_id)
+
+    def __delitem__(self, ahsp_id):
+        if ahsp_id not in self:
+            raise KeyError(ahsp_id)
+        self.overrides.pop(ahsp_id, None)
+        if ahsp_id in self.base:
+            self.removed.add(ahsp_id)
+
+    def __contains__(self, ahsp_id):
+        return ahsp_id in self.overrides or (ahsp_id in self.base and ahsp_id not in self.removed)
+
+    def __iter__(self):
+        # Urutan library tetap; resep baru menyusul di akhir
+        for ahsp_id in self.base:
+            if ahsp_id not in self.removed:
+                yield ahsp_id
+        for ahsp_id in self.overrides:
+            if ahsp_id not in self.base:
+                yield ahsp_id
+
+    def __len__(self):
+        n_new = sum(ahsp_id not in self.base for ahsp_id in self.overrides)
+        return len(self.base) - len(self.removed) + n_new
+
+    def __deepcopy__(self, memo):
+        # Library bersama tidak ikut disalin
+        return AhspLibrary(self.base, copy.deepcopy(self.overrides, memo), self.removed)
+
+    def __repr__(self):
+        return f"AhspLibrary({len(self)} resep, {len(self.overrides)} override, {len(self.removed)} dihapus)"
+
+# Stempel versi global: unik lintas indeks, jadi aman dipakai sebagai kunci cache
+_VERSIONS = itertools.count(1)
+
+class ResourceMaps:
+    """Lookup Database Harga untuk satu versi tabel resources.
+
+    id -> harga dibangun sekali saat dibuat, id -> record baru saat pertama
+    dibutuhkan; keduanya dipakai bersama oleh kalkulasi dan tampilan.
+    Tabel dianggap immutable: perubahan harga = tabel baru = ResourceMaps baru.
+    """
+
+    def __init__(self, resources):
+        self.resources = resources
+        self.version = next(_VERSIONS)
+        self.prices = dict(zip(resources['id'].tolist(), resources['price'].tolist()))
+        self._records = None
+        self._search = None
+
+    @property
+    def records(self):
+        """id -> {kolom: nilai} (id duplikat: baris terakhir)"""
+        if self._records is None:
+            self._records = dict(zip(self.resources['id'].tolist(), self.resources.to_dict('records')))
+        return self._records
+
+    @property
+    def search(self):
+        """CodeIndex atas id / nama / satuan resource (dibangun saat pertama dicari)"""
+        if self._search is None:
+            self._search = CodeIndex.from_resources(self.resources)
+        return self._search
+
+def resource_maps(resources):
+    """ResourceMaps dari tabel resources (atau kembalikan apa adanya bila sudah ResourceMaps)"""
+    return resources if isinstance(resources, ResourceMaps) else ResourceMaps(resources)
+
+class DependencyIndex:
+    """Indeks balik Resource -> AHSP -> Item untuk kalkulasi ulang inkremental.
+
+    AHSP yang dipakai sebagai sub-analisa ikut merambatkan perubahan ke resep
+    induknya (dihitung ulang dalam urutan topologis). Setiap perubahan hanya menandai item terdampak sebagai 'dirty', lalu selisih
+    total item dirambatkan ke sub_total, group_total dan grand total.
+    Indeks memegang referensi rab_data & ahsp_master yang sama dengan state,
+    jadi harus dibangun ulang bila objek tersebut diganti (misal: import JSON).
+    `res_maps` (ResourceMaps) adalah lookup harga versi terkini, dipakai juga
+    oleh tampilan agar tidak membangun dict dari DataFrame di setiap rerun.
+    `version` berubah setiap kali data RAB / harga / AHSP berubah lewat indeks.
+    """
+
+    def __init__(self, rab_data, ahsp_master, resources):
+        self.rab_data = rab_data
+        self.ahsp_master = ahsp_master
+        self.res_maps = resource_maps(resources)
+        self.grand_total, self.ahsp_prices = price_project(rab_data, ahsp_master, self.res_maps.resources)
+        count("ahsp_priced", len(self.ahsp_prices))
+
+        # Komponen (resource / sub-analisa) -> AHSP yang memakainya (dan sebaliknya, untuk update resep)
+        self.ahsp_res = {}
+        self.res_to_ahsp = defaultdict(set)
+        for ahsp_id in ahsp_master:
+            self._link_ahsp(ahsp_id)
+
+        # Kode AHSP -> posisi item (g_idx, s_idx, i_idx) yang mereferensikannya, dan
+        # akumulator volume pekerjaan per (g_idx, s_idx, kode AHSP) untuk rekap kebutuhan resource,
+        # integer 1/VOL_SCALE agar +/- berulang tidak menumpuk galat (hasil = hitung penuh)
+        self.ahsp_to_items = defaultdict(set)
+        self.ahsp_volume = defaultdict(int)
+        for g_idx, group in enumerate(rab_data):
+            for s_idx, sub in enumerate(group.get('subgroups', [])):
+                self._link_items(g_idx, s_idx, sub['items'])
+                count("items_priced", len(sub['items']))
+
+        self.dirty = set()
+        self.version = next(_VERSIONS)
+        # Versi per Sub (g_idx, s_idx); Sub yang belum pernah berubah memakai versi awal
+        self.created_version = self.version
+        # Versi terakhir perubahan resep AHSP (untuk autosave / cache yang hanya peduli AHSP)
+        self.ahsp_version = self.version
+        self.sub_versions = {}
+        self._ahsp_search = None
+
+    @property
+    def res_map(self):
+        """id resource -> harga untuk versi tabel harga yang sedang dipakai"""
+        return self.res_maps.prices
+
+    @property
+    def ahsp_search(self):
+        """CodeIndex resep AHSP, dibangun ulang hanya bila resep berubah (ahsp_version)"""
+        if self._ahsp_search is None or self._ahsp_search[0] != self.ahsp_version:
+            self._ahsp_search = (self.ahsp_version, CodeIndex.from_ahsp(self.ahsp_master))
+        return self._ahsp_search[1]
+
+    def ahsp_usage(self):
+        """Kode AHSP -> jumlah item yang memakainya (bobot urutan hasil pencarian)"""
+        return {ahsp_id: len(items) for ahsp_id, items in self.ahsp_to_items.items() if items}
+
+    # --- Pemeliharaan indeks ---
+    def _link_ahsp(self, ahsp_id):
+        res_ids = {comp['id'] for comp in self.ahsp_master[ahsp_id]['components']}
+        self.ahsp_res[ahsp_id] = res_ids
+        for res_id in res_ids:
+            self.res_to_ahsp[res_id].add(ahsp_id)
+
+    def _unlink_ahsp(self, ahsp_id):
+        for res_id in self.ahsp_res.pop(ahsp_id, ()):
+            self.res_to_ahsp[res_id].discard(ahsp_id)
+
+    def _link_item(self, g_idx, s_idx, i_idx, item):
+        if item.get('ahsp'):
+            self.ahsp_to_items[item['ahsp']].add((g_idx, s_idx, i_idx))
+            self.ahsp_volume[g_idx, s_idx, item['ahsp']] += quantize(item['vol'], VOL_SCALE)
+
+    def _unlink_item(self, g_idx, s_idx, i_idx, item):
+        if item.get('ahsp'):
+            self.ahsp_to_items[item['ahsp']].discard((g_idx, s_idx, i_idx))
+            self.ahsp_volume[g_idx, s_idx, item['ahsp']] -= quantize(item['vol'], VOL_SCALE)
+
+    def _link_items(self, g_idx, s_idx, items):
+        for i_idx, item in enumerate(items):
+            self._link_item(g_idx, s_idx, i_idx, item)
+
+    def _unlink_items(self, g_idx, s_idx, items):
+        for i_idx, item in enumerate(items):
+            self._unlink_item(g_idx, s_idx, i_idx, item)
+
+    def _unit_price(self, item):
+        ahsp_id = item.get('ahsp')
+        if ahsp_id and ahsp_id in self.ahsp_prices:
+            return self.ahsp_prices[ahsp_id]
+        return item.get('manual_price', 0)
+
+    def _reprice_item(self, item):
+        """Hitung ulang satu item; mengembalikan selisih total_price-nya dalam sen"""
+        unit_sen = to_sen(self._unit_price(item))
+        total_sen = round_div(unit_sen * quantize(item['vol'], VOL_SCALE), VOL_SCALE)
+        delta = total_sen - to_sen(item.get('total_price', 0))
+        item['current_price'] = from_sen(unit_sen)
+        item['total_price'] = from_sen(total_sen)
+        return delta
+
+    def _propagate(self, group, sub, delta):
+        """Selisih (sen) dirambatkan ke sub_total, group_total dan total fisik secara eksak"""
+        if delta:
+            sub['sub_total'] = from_sen(to_sen(sub['sub_total']) + delta)
+            group['group_total'] = from_sen(to_sen(group['group_total']) + delta)
+            self.grand_total = from_sen(to_sen(self.grand_total) + delta)
+
+    def _bump(self, subs):
+        self.version = next(_VERSIONS)
+        for key in subs:
+            self.sub_versions[key] = self.version
+
+    def sub_version(self, g_idx, s_idx):
+        """Stempel versi unik satu Sub: berubah bila item / harga di Sub itu berubah"""
+        return self.sub_versions.get((g_idx, s_idx), self.created_version)
+
+    def _reprice_ahsp(self, ahsp_id):
+        if ahsp_id in self.ahsp_master:
+            self.ahsp_prices[ahsp_id] = calculate_ahsp_price(ahsp_id, self.res_map, self.ahsp_master, self.ahsp_prices)
+        else:
+            self.ahsp_prices.pop(ahsp_id, None)
+        self.dirty |= self.ahsp_to_items.get(ahsp_id, set())
+
+    def _dependents(self, ids):
+        """AHSP yang memakai salah satu id, langsung maupun lewat sub-analisa"""
+        found, stack = set(), list(ids)
+        while stack:
+            for ahsp_id in self.res_to_ahsp.get(stack.pop(), ()):
+                if ahsp_id not in found:
+                    found.add(ahsp_id)
+                    stack.append(ahsp_id)
+        return found
+
+    def _reprice_many(self, ahsp_ids):
+        """Hitung ulang sekumpulan AHSP: sub-analisa lebih dulu, masing-masing sekali"""
+        for ahsp_id in ahsp_ids:
+            if ahsp_id not in self.ahsp_master:
+                self._reprice_ahsp(ahsp_id)
+        for level in ahsp_order(self.ahsp_master, self.res_map, subset=ahsp_ids):
+            for ahsp_id in level:
+                self._reprice_ahsp(ahsp_id)
+        count("ahsp_priced", len(ahsp_ids))
+
+    # --- Propagasi ---
+    def flush(self):
+        """Menghitung ulang item 'dirty' saja dan merambatkan selisihnya ke atas"""
+        n_dirty = len(self.dirty)
+        for g_idx, s_idx, i_idx in self.dirty:
+            group = self.rab_data[g_idx]
+            sub = group['subgroups'][s_idx]
+            self._propagate(group, sub, self._reprice_item(sub['items'][i_idx]))
+        self._bump({(g_idx, s_idx) for g_idx, s_idx, _ in self.dirty})
+        self.dirty.clear()
+        count("items_priced", n_dirty)
+        return n_dirty
+
+    def update_resources(self, resources):
+        """Database Harga berubah: hanya AHSP yang memakai resource terubah yang dihitung ulang.
+
+        `resources` berupa tabel baru atau ResourceMaps yang sudah dibangun.
+        """
+        old_map = self.res_map
+        self.res_maps = resource_maps(resources)
+        new_map = self.res_map
+
+        changed = [rid for rid in old_map.keys() | new_map.keys() if old_map.get(rid, 0) != new_map.get(rid, 0)]
+        self._reprice_many(self._dependents(changed))
+        return self.flush()
+
+    def update_ahsp(self, *ahsp_ids):
+        """Resep AHSP dibuat / diubah / dihapus di ahsp_master (boleh banyak sekaligus)"""
+        for ahsp_id in ahsp_ids:
+            self._unlink_ahsp(ahsp_id)
+            if ahsp_id in self.ahsp_master:
+                self._link_ahsp(ahsp_id)
+        # Resep induk yang memakainya sebagai sub-analisa ikut berubah harga
+        self._reprice_many(set(ahsp_ids) | self._dependents(ahsp_ids))
+        n_dirty = self.flush()
+        self.ahsp_version = self.version
+        return n_dirty
+
+    def update_items(self, g_idx, s_idx, items):
+        """Item satu Sub diganti (hasil st.data_editor): hanya Sub itu yang dihitung ulang"""
+        group = self.rab_data[g_idx]
+        sub = group['subgroups'][s_idx]
+        self._unlink_items(g_idx, s_idx, sub['items'])
+
+        sub_total = 0
+        for item in items:
+            item['total_price'] = 0
+            sub_total += self._reprice_item(item)
+        sub['items'] = items
+        self._link_items(g_idx, s_idx, items)
+        self._propagate(group, sub, sub_total - to_sen(sub['sub_total']))
+        self._bump([(g_idx, s_idx)])
+        count("items_priced", len(items))
+        return len(items)
+
+    def apply_item_delta(self, g_idx, s_idx, edited_rows=None, added_rows=None, deleted_rows=None):
+        """Menerapkan delta st.data_editor (baris diubah / ditambah / dihapus) ke satu Sub.
+
+        Posisi baris mengacu pada urutan item sebelum delta (sama seperti editor).
+        Hanya item yang tersentuh yang dihitung ulang; selisihnya dirambatkan ke atas.
+        """
+        group = self.rab_data[g_idx]
+        sub = group['subgroups'][s_idx]
+        items = sub['items']
+        delta = 0
+
+        for row, changes in (edited_rows or {}).items():
+            i_idx = int(row)
+            item = items[i_idx]
+            self._unlink_item(g_idx, s_idx, i_idx, item)
+            item.update(changes)
+            clean_item(item, self.ahsp_master)
+            self._link_item(g_idx, s_idx, i_idx, item)
+            delta += self._reprice_item(item)
+
+        for row in added_rows or []:
+            item = clean_item({**ITEM_DEFAULTS, **row, "total_price": 0}, self.ahsp_master)
+            items.append(item)
+            self._link_item(g_idx, s_idx, len(items) - 1, item)
+            delta += self._reprice_item(item)
+
+        if deleted_rows:
+            # Posisi item bergeser: tautan Sub ini dibangun ulang (hanya Sub ini)
+            removed = {int(row) for row in deleted_rows}
+            self._unlink_items(g_idx, s_idx, items)
+            for i_idx in removed:
+                delta -= to_sen(items[i_idx].get('total_price', 0))
+            items[:] = [item for i_idx, item in enumerate(items) if i_idx not in removed]
+            self._link_items(g_idx, s_idx, items)
+
+        self._propagate(group, sub, delta)
+        self._bump([(g_idx, s_idx)])
+        count("items_priced", len(edited_rows or {}) + len(added_rows or []))
+        return len(edited_rows or {}) + len(added_rows or []) + len(deleted_rows or [])
+
+    def update_sub_fields(self, g_idx, s_idx, changes):
+        """Field Sub di luar item (misal jadwal) diubah; nilai kosong menghapus field.
+
+        Harga tidak berubah, tapi versi Sub & indeks dinaikkan agar cache tampilan / export ikut segar.
+        """
+        sub = self.rab_data[g_idx]['subgroups'][s_idx]
+        for key, val in changes.items():
+            if _is_missing(val):
+                sub.pop(key, None)
+            else:
+                sub[key] = val
+        self._bump([(g_idx, s_idx)])
+
+    def takeoff(self):
+        """Kebutuhan resource per Divisi: matriks (n_divisi, n_resource) sejajar tabel harga.
+
+        Dihitung dari akumulator volume per (Divisi, Sub, AHSP) yang diperbarui setiap
+        edit item, jadi tidak perlu menelusuri seluruh item proyek.
+        """
+        ahsp_ids = list(self.ahsp_master.keys())
+        ahsp_pos = {ahsp_id: i for i, ahsp_id in enumerate(ahsp_ids)}
+        volume = defaultdict(int)
+        for (g_idx, _, ahsp_id), vol in self.ahsp_volume.items():
+            if ahsp_id in ahsp_pos:
+                volume[g_idx, ahsp_pos[ahsp_id]] += vol
+        demand = np.zeros((len(self.rab_data), len(ahsp_ids)))
+        for (g_idx, pos), vol in volume.items():
+            demand[g_idx, pos] = vol / VOL_SCALE
+        return expand_demand(demand, self.ahsp_master, ahsp_ids, self.res_maps.resources['id'].tolist())
+
+    def totals(self, tax_settings):
+        return summarize_totals(self.grand_total, self.rab_data, tax_settings)
+
+# ==========================================
+# 3. PROJECT MODEL
+# ==========================================
+@dataclass
+class Project:
+    """Satu proyek RAB lengkap (struktur sama dengan file JSON 'File & Laporan')"""
+    project_info: dict
+    tax_settings: dict
+    resources: "pd.DataFrame"
+    ahsp_master: dict
+    rab_data: list
+    index: DependencyIndex = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def default(cls):
+        """Proyek baru berisi salinan library default"""
+        import pandas as pd
+        return cls(
+            project_info=dict(DEFAULT_PROJECT_INFO),
+            tax_settings=dict(DEFAULT_TAX_SETTINGS),
+            resources=pd.DataFrame(DEFAULT_RESOURCES),
+            ahsp_master=copy.deepcopy(DEFAULT_AHSP_MASTER),
+            rab_data=copy.deepcopy(DEFAULT_RAB_DATA),
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        import pandas as pd
+        return cls(
+            project_info=data['project_info'],
+            tax_settings=data['tax_settings'],
+            resources=pd.DataFrame(data['resources']),
+            ahsp_master=data['ahsp_master'],
+            rab_data=data['rab_data'],
+        )
+
+    def to_dict(self):
+        return {
+            "project_info": self.project_info,
+            "tax_settings": self.tax_settings,
+            "resources": self.resources.to_dict('records'),
+            "ahsp_master": dict(self.ahsp_master),
+            "rab_data": self.rab_data
+        }
+
+    def to_json(self, compact=False):
+        """Serialisasi proyek; compact=True tanpa indentasi/spasi (lebih kecil & cepat)"""
+        if compact:
+            return json.dumps(self.to_dict(), separators=(',', ':'))
+        return json.dumps(self.to_dict(), indent=2)
+
+    def recalculate(self):
+        """Kalkulasi penuh; mengembalikan (real_cost, profit, ppn, grand_total, chart_data)"""
+        self.index = DependencyIndex(self.rab_data, self.ahsp_master, self.resources)
+        return self.totals()
+
+    def totals(self):
+        if self.index is None:
+            return self.recalculate()
+        return self.index.totals(self.tax_settings)
+
+# ==========================================
+# 4. TABEL DATAR (FLAT GRID)
+# ==========================================
+ITEM_COLUMNS = ("name", "unit", "vol", "ahsp", "manual_price", "current_price", "total_price")
+FLAT_KEY_COLUMNS = ("g_idx", "s_idx", "i_idx")
+
+ITEM_NUMERIC = ("vol", "manual_price", "current_price", "total_price")
+ITEM_CODED = ("unit", "ahsp")
+
+class _Codes:
+    """Kode kategori (int32) untuk kolom teks berulang; -1 = kosong"""
+
+    def __init__(self):
+        self.categories = []
+        self.lookup = {}
+
+    def encode(self, values):
+        lookup, categories = self.lookup, self.categories
+        codes = []
+        for val in values:
+            if val is None or val != val:
+                codes.append(-1)
+                continue
+            code = lookup.get(val)
+            if code is None:
+                code = lookup[val] = len(categories)
+                categories.append(val)
+            codes.append(code)
+        return np.array(codes, dtype=np.int32)
+
+    def labels(self):
+        """Array teks per kode; indeks -1 (kosong) mengambil elemen terakhir = None"""
+        return np.array(self.categories + [None], dtype=object)
+
+class ItemStore:
+    """Item RAB dalam bentuk kolom (array) ringkas, sejajar urutan Divisi -> Sub -> item.
+
+    Angka disimpan sebagai float64, satuan & kode AHSP sebagai kode kategori
+    int32, uraian sebagai array objek (string yang sama dengan rab_data). Posisi (g_idx, s_idx,
+    i_idx) tidak disimpan per item: baris Sub ke-k ada di starts[k]:starts[k+1].
+    rab_data tetap model utama (dipakai DependencyIndex); store ini disegarkan
+    per Sub yang versinya berubah (sync) dan dipakai untuk tampilan/export massal.
+    """
+
+    def __init__(self):
+        self.group_ids = []
+        self.sub_keys = []          # (g_idx, s_idx) per Sub, urut
+        self.sub_ids = []
+        self.starts = np.zeros(1, dtype=np.int64)
+        self.name = np.empty(0, dtype=object)
+        self.numeric = {col: np.empty(0) for col in ITEM_NUMERIC}
+        self.codes = {col: np.empty(0, dtype=np.int32) for col in ITEM_CODED}
+        self.categories = {col: _Codes() for col in ITEM_CODED}
+        self.versions = {}          # (g_idx, s_idx) -> versi Sub saat disalin
+
+    @classmethod
+    def from_rab_data(cls, rab_data, index=None):
+        store = cls()
+        store.sync(rab_data, index)
+        return store
+
+    def __len__(self):
+        return len(self.name)
+
+    @property
+    def nbytes(self):
+        """Perkiraan memori kolom (tanpa string uraian yang dipakai bersama dengan rab_data)"""
+        return (self.name.nbytes + self.starts.nbytes + sum(a.nbytes for a in self.numeric.values())
+                + sum(a.nbytes for a in self.codes.values()))
+
+    def _segment(self, items):
+        """Kolom untuk item satu Sub"""
+        seg = {"name": np.array([item.get('name') for item in items], dtype=object)}
+        for col in ITEM_NUMERIC:
+            seg[col] = np.array([item.get(col) for item in items], dtype=float)
+        for col in ITEM_CODED:
+            seg[col] = self.categories[col].encode([item.get(col) for item in items])
+        return seg
+
+    def _rebuild(self, rab_data):
+        self.group_ids = [group['id'] for group in rab_data]
+        self.sub_keys, self.sub_ids, segments = [], [], []
+        for g_idx, group in enumerate(rab_data):
+            for s_idx, sub in enumerate(group.get('subgroups', [])):
+                self.sub_keys.append((g_idx, s_idx))
+                self.sub_ids.append(sub['id'])
+                segments.append(self._segment(sub['items']))
+        counts = [len(seg['name']) for seg in segments]
+        self.starts = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+        self.name = np.concatenate([seg['name'] for seg in segments]) if segments else np.empty(0, dtype=object)
+        for col in ITEM_NUMERIC:
+            self.numeric[col] = np.concatenate([seg[col] for seg in segments]) if segments else np.empty(0)
+        for col in ITEM_CODED:
+            self.codes[col] = np.concatenate([seg[col] for seg in segments]) if segments else np.empty(0, dtype=np.int32)
+
+    def _splice(self, k, items):
+        """Ganti baris Sub ke-k (jumlah item boleh berubah)"""
+        seg = self._segment(items)
+        lo, hi = self.starts[k], self.starts[k + 1]
+        self.name = np.concatenate([self.name[:lo], seg['name'], self.name[hi:]])
+        for col in ITEM_NUMERIC:
+            arr = self.numeric[col]
+            self.numeric[col] = np.concatenate([arr[:lo], seg[col], arr[hi:]])
+        for col in ITEM_CODED:
+            arr = self.codes[col]
+            self.codes[col] = np.concatenate([arr[:lo], seg[col], arr[hi:]])
+        self.starts[k + 1:] += len(items) - (hi - lo)
+
+    def sync(self, rab_data, index=None):
+        """Menyegarkan Sub yang berubah sejak sync terakhir; mengembalikan jumlah Sub yang disalin.
+
+        Tanpa `index` (atau bila struktur Divisi/Sub berubah) seluruh store dibangun ulang.
+        """
+        keys = [(g_idx, s_idx) for g_idx, group in enumerate(rab_data) for s_idx in range(len(group.get('subgroups', [])))]
+        same_structure = (keys == self.sub_keys and self.group_ids == [group['id'] for group in rab_data]
+                          and self.sub_ids == [rab_data[g]['subgroups'][s]['id'] for g, s in keys])
+        if index is None or not same_structure:
+            self._rebuild(rab_data)
+            changed = keys
+        else:
+            changed = [key for key in keys if self.versions.get(key) != index.sub_version(*key)]
+            if len(changed) > max(8, len(keys) // 4):
+                self._rebuild(rab_data)
+            else:
+                for key in changed:
+                    self._splice(keys.index(key), rab_data[key[0]]['subgroups'][key[1]]['items'])
+        if index is not None:
+            self.versions = {key: index.sub_version(*key) for key in keys}
+        return len(changed)
+
+    def sub_rows(self, g_idx, s_idx):
+        k = self.sub_keys.index((g_idx, s_idx))
+        return slice(int(self.starts[k]), int(self.starts[k + 1]))
+
+    def positions(self, rows):
+        """Posisi asli (g_idx, s_idx, i_idx) dan nomor urut Sub untuk array nomor baris"""
+        rows = np.asarray(rows, dtype=np.int64)
+        k = np.searchsorted(self.starts, rows, side='right') - 1
+        keys = np.array(self.sub_keys, dtype=np.int64).reshape(-1, 2)
+        return keys[k, 0], keys[k, 1], rows - self.starts[k], k
+
+    def frame(self, rows=None, with_position=True):
+        """DataFrame item (semua atau baris `rows`: slice / array index) untuk editor & export.
+
+        Kode kategori dikembalikan ke teks biasa supaya editor bebas mengisi nilai baru.
+        """
+        import pandas as pd
+
+        if rows is None:
+            rows = slice(0, len(self))
+        if isinstance(rows, slice):
+            rows = np.arange(*rows.indices(len(self)))
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = {}
+        if with_position:
+            g_idx, s_idx, i_idx, k = self.positions(rows)
+            columns.update({
+                "g_idx": g_idx, "s_idx": s_idx, "i_idx": i_idx,
+                "divisi": np.array(self.group_ids + [None], dtype=object)[g_idx],
+                "sub": np.array(self.sub_ids + [None], dtype=object)[k],
+            })
+        for col in ITEM_COLUMNS:
+            if col == "name":
+                columns[col] = self.name[rows]
+            elif col in ITEM_NUMERIC:
+                columns[col] = self.numeric[col][rows]
+            else:
+                columns[col] = self.categories[col].labels()[self.codes[col][rows]]
+        return pd.DataFrame(columns)
+
+def items_frame(rab_data):
+    """Seluruh item RAB sebagai satu tabel datar: posisi asli, kolom Divisi/Sub, lalu data item"""
+    return ItemStore.from_rab_data(rab_data).frame()
+
+def query_items(store, text="", divisi=None, sort_by=None, ascending=True, page=1, page_size=100):
+    """Filter, urutkan & potong satu halaman dari ItemStore (tervektorisasi).
+
+    Hanya baris halaman yang dijadikan DataFrame.
+    Mengembalikan (halaman_DataFrame, jumlah_baris_lolos_filter, jumlah_halaman).
+    """
+    import pandas as pd
+
+    rows = np.arange(len(store))
+    if divisi is not None and divisi in store.group_ids:
+        g_idx = store.group_ids.index(divisi)
+        subs = [k for k, key in enumerate(store.sub_keys) if key[0] == g_idx]
+        rows = np.arange(store.starts[subs[0]], store.starts[subs[-1] + 1]) if subs else rows[:0]
+    elif divisi:
+        rows = rows[:0]
+    if text:
+        lowered = text.lower()
+        # Kode AHSP dicocokkan di daftar kategorinya (kecil), bukan per item
+        ahsp_cats = store.categories['ahsp'].categories
+        hit_codes = [code for code, val in enumerate(ahsp_cats) if lowered in str(val).lower()]
+        hit = np.isin(store.codes['ahsp'][rows], hit_codes)
+        names = pd.Series(store.name[rows], dtype=object).fillna('').astype(str)
+        hit |= names.str.contains(text, case=False, regex=False).to_numpy()
+        rows = rows[hit]
+
+    if sort_by:
+        if sort_by in ITEM_NUMERIC:
+            key = pd.Series(store.numeric[sort_by][rows])
+        elif sort_by in ITEM_CODED:
+            key = pd.Series(store.categories[sort_by].labels()[store.codes[sort_by][rows]])
+        else:
+            key = pd.Series(store.name[rows])
+        order = key.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+        rows = rows[order]
+
+    n_rows = len(rows)
+    n_pages = max(1, -(-n_rows // page_size))
+    page = min(max(1, page), n_pages)
+    start = (page - 1) * page_size
+    return store.frame(rows[start:start + page_size]), n_rows, n_pages
+
+# ==========================================
+# 5. REKAP KEBUTUHAN SUMBER DAYA (TAKEOFF)
+# ==========================================
+TAKEOFF_COLUMNS = ("divisi_id", "divisi", "id", "category", "name", "unit", "qty", "price", "cost")
+
+def takeoff_frame(qty, rab_data, resources):
+    """Tabel panjang kebutuhan resource per Divisi dari matriks DependencyIndex.takeoff() (qty ≠ 0)"""
+    import pandas as pd
+
+    g_idx, r_idx = np.nonzero(qty)
+    values = qty[g_idx, r_idx]
+
+    def res_col(col):
+        return resources[col].to_numpy()[r_idx] if col in resources.columns else None
+
+    prices = resources['price'].to_numpy(dtype=float)[r_idx]
+    return pd.DataFrame({
+        "divisi_id": [rab_data[g]['id'] for g in g_idx.tolist()],
+        "divisi": [rab_data[g]['title'] for g in g_idx.tolist()],
+        "id": res_col('id'),
+        "category": res_col('category'),
+        "name": res_col('name'),
+        "unit": res_col('unit'),
+        "qty": values,
+        "price": prices,
+        "cost": values * prices,
+    }, columns=list(TAKEOFF_COLUMNS))
+
+def takeoff_summary(frame, by="category"):
+    """Rekap takeoff: by="category" (total proyek per resource) atau by="divisi" (per Divisi)"""
+    keys = ["category", "id", "name", "unit", "price"]
+    if by == "divisi":
+        keys = ["divisi_id", "divisi"] + keys
+    summary = frame.groupby(keys, sort=False, dropna=False, as_index=False)[["qty", "cost"]].sum()
+    return summary.sort_values(keys[:-4] + ["cost"], ascending=[True] * (len(keys) - 4) + [False], kind='stable', ignore_index=True)
+
+# ==========================================
+# 6. PENCARIAN KODE (AHSP / RESOURCE)
+# ==========================================
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+# Kemiripan bigram minimum agar token dianggap cocok secara fuzzy (salah ketik)
+FUZZY_MIN = 0.5
+
+def search_tokens(text):
+    return _TOKEN_RE.findall(str(text or "").lower())
+
+def _bigrams(token):
+    padded = f" {token} "
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+class CodeIndex:
+    """Indeks pencarian kode/uraian/satuan untuk selector (dibangun sekali per versi library).
+
+    Token (dari id, nama, satuan) disimpan sebagai kosakata terurut untuk
+    pencocokan awalan (bisect) dan indeks bigram untuk pencocokan fuzzy.
+    Setiap token query harus cocok dengan salah satu token entri:
+    sama persis (3) > awalan (2) > fuzzy (kemiripan bigram x 1.5).
+    Kode yang diawali query mendapat bonus, kode yang sama persis bonus terbesar.
+    """
+
+    def __init__(self, records, kind=""):
+        self.ids, self.names, self.units, self.kinds = [], [], [], []
+        postings = defaultdict(set)
+        for rec in records:
+            pos = len(self.ids)
+            self.ids.append(rec['id'])
+            self.names.append(rec.get('name'))
+            self.units.append(rec.get('unit'))
+            self.kinds.append(rec.get('kind', kind))
+            for token in search_tokens(rec['id']) + search_tokens(rec.get('name')) + search_tokens(rec.get('unit')):
+                postings[token].add(pos)
+        self._id_keys = ["".join(search_tokens(code)) for code in self.ids]
+        self.vocab = sorted(postings)
+        self.postings = [postings[token] for token in self.vocab]
+        self.bigrams = defaultdict(list)
+        for t_idx, token in enumerate(self.vocab):
+            for gram in _bigrams(token):
+                self.bigrams[gram].append(t_idx)
+
+    @classmethod
+    def from_ahsp(cls, ahsp_master):
+        return cls(({"id": ahsp_id, "name": recipe.get('name'), "unit": recipe.get('unit')}
+                    for ahsp_id, recipe in ahsp_master.items()), kind="AHSP")
+
+    @classmethod
+    def from_resources(cls, resources):
+        def col(name):
+            return resources[name].tolist() if name in resources.columns else [None] * len(resources)
+        return cls({"id": i, "name": n, "unit": u, "kind": k or "Resource"}
+                   for i, n, u, k in zip(col('id'), col('name'), col('unit'), col('category')))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _token_scores(self, token):
+        """Entri -> skor terbaik untuk satu token query"""
+        scores = {}
+        lo = bisect.bisect_left(self.vocab, token)
+        hi = bisect.bisect_left(self.vocab, token + "\uffff")
+        for t_idx in range(lo, hi):
+            score = 3.0 if self.vocab[t_idx] == token else 2.0
+            for pos in self.postings[t_idx]:
+                if scores.get(pos, 0) < score:
+                    scores[pos] = score
+        if len(token) < 3:
+            return scores
+        grams = _bigrams(token)
+        shared = defaultdict(int)
+        for gram in grams:
+            for t_idx in self.bigrams.get(gram, ()):
+                shared[t_idx] += 1
+        for t_idx, n in shared.items():
+            sim = n / (len(grams) + len(self.vocab[t_idx]) + 1 - n)
+            if sim >= FUZZY_MIN:
+                score = sim * 1.5
+                for pos in self.postings[t_idx]:
+                    if scores.get(pos, 0) < score:
+                        scores[pos] = score
+        return scores
+
+    def score(self, query):
+        """{posisi entri: skor} untuk semua entri yang cocok; query kosong -> semua entri skor 0"""
+        tokens = search_tokens(query)
+        if not tokens:
+            return dict.fromkeys(range(len(self.ids)), 0.0)
+        per_token = [self._token_scores(token) for token in tokens]
+        common = set(per_token[0]).intersection(*per_token[1:])
+        scores = {pos: sum(s[pos] for s in per_token) for pos in common}
+        key = "".join(tokens)
+        for pos in scores:
+            if self._id_keys[pos].startswith(key):
+                scores[pos] += 10.0 if self._id_keys[pos] == key else 5.0
+        return scores
+
+    def entry(self, pos, score=0.0):
+        return {"id": self.ids[pos], "name": self.names[pos], "unit": self.units[pos],
+                "kind": self.kinds[pos], "score": score}
+
+def search_codes(query, indexes, page=1, page_size=20, boost=None):
+    """Cari di satu/lebih CodeIndex; hasil diurutkan skor, lalu `boost` (id -> bobot, misal
+    jumlah pemakaian), lalu urutan library. Mengembalikan (entri halaman, jumlah cocok, jumlah halaman).
+    """
+    boost = boost or {}
+    ranked = []
+    for rank, index in enumerate(indexes):
+        for pos, score in index.score(query).items():
+            ranked.append((-score, -boost.get(index.ids[pos], 0), rank, pos))
+    n_hits = len(ranked)
+    n_pages = max(1, -(-n_hits // page_size))
+    page = min(max(1, page), n_pages)
+    top = heapq.nsmallest(page * page_size, ranked)[(page - 1) * page_size:]
+    return [indexes[rank].entry(pos, -neg_score) for neg_score, _, rank, pos in top], n_hits, n_pages
+
+# ==========================================
+# 7. KUBUS BIAYA (DASHBOARD)
+# ==========================================
+CUBE_LEVELS = ("divisi", "sub", "category", "resource")
+MANUAL_CATEGORY = "Harga Manual"
+OTHERS_LABEL = "Lainnya"
+# Baris Sub per panggilan expand_demand (membatasi ukuran matriks padat n_sub x n_ahsp)
+_EXPAND_CHUNK = 256
+
+class CostCube:
+    """Biaya per (Divisi, Sub, kategori resource, resource) untuk grafik distribusi biaya.
+
+    Kebutuhan resource per Sub diturunkan dari akumulator volume DependencyIndex
+    dan di-cache per Sub: saat sync hanya Sub yang volume AHSP-nya berubah yang
+    diurai ulang (perubahan resep / susunan tabel harga mengurai ulang semua).
+    Perubahan harga saja cukup mengalikan ulang qty x harga. Biaya disimpan dalam
+    sen (integer, kolom `cost_sen`); selisih sub_total dengan biaya resource (item
+    berharga manual + pembulatan, bisa negatif) masuk kategori "Harga Manual", jadi
+    jumlah kubus per Divisi/Sub/proyek sama persis dengan RAB.
+    Rollup per kombinasi level di-cache sampai `version` berubah.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.res_ids = None
+        self.ahsp_version = None
+        self.demand = {}            # (g_idx, s_idx) -> {kode AHSP: volume}
+        self.qty = {}               # (g_idx, s_idx) -> (kolom resource, qty) sparse
+        self.table = None
+        self._plan = None
+        self._labels = None
+        self._rollups = {}
+
+    def sync(self, index):
+        """Segarkan dari DependencyIndex; mengembalikan jumlah Sub yang diurai ulang"""
+        if self.version == index.version:
+            return 0
+        res_ids = index.res_maps.resources['id'].tolist()
+        if res_ids != self.res_ids or index.ahsp_version != self.ahsp_version:
+            self.qty.clear()
+            self._plan = None
+            self.res_ids, self.ahsp_version = res_ids, index.ahsp_version
+
+        demand = defaultdict(dict)
+        for (g_idx, s_idx, ahsp_id), vol in index.ahsp_volume.items():
+            if vol:
+                demand[g_idx, s_idx][ahsp_id] = vol / VOL_SCALE
+        stale = [key for key, row in demand.items() if key not in self.qty or self.demand.get(key) != row]
+        for key in self.qty.keys() - demand.keys():
+            del self.qty[key]
+        self.demand = demand
+        self._expand(stale, index.ahsp_master)
+
+        self._build(index.rab_data, index.res_maps)
+        self.version = index.version
+        self._rollups = {}
+        count("cube_subs_expanded", len(stale))
+        return len(stale)
+
+    def _expand(self, keys, ahsp_master):
+        ahsp_ids = list(ahsp_master.keys())
+        ahsp_pos = {ahsp_id: i for i, ahsp_id in enumerate(ahsp_ids)}
+        if keys and self._plan is None:
+            self._plan = demand_plan(ahsp_master, ahsp_ids, self.res_ids)
+        for start in range(0, len(keys), _EXPAND_CHUNK):
+            chunk = keys[start:start + _EXPAND_CHUNK]
+            matrix = np.zeros((len(chunk), len(ahsp_ids)))
+            for row, key in enumerate(chunk):
+                for ahsp_id, vol in self.demand[key].items():
+                    if ahsp_id in ahsp_pos:
+                        matrix[row, ahsp_pos[ahsp_id]] = vol
+            qty = expand_demand(matrix, ahsp_master, ahsp_ids, self.res_ids, plan=self._plan)
+            for row, key in enumerate(chunk):
+                cols = np.flatnonzero(qty[row])
+                self.qty[key] = (cols, qty[row, cols])
+
+    def _resource_labels(self, res_maps):
+        """Label resource & kode kategori (+ satu posisi ekstra untuk Harga Manual), per versi tabel harga"""
+        import pandas as pd
+
+        if self._labels is not None and self._labels[0] == res_maps.version:
+            return self._labels[1:]
+        resources = res_maps.resources
+
+        def col(name):
+            return resources[name].fillna("").astype(str).tolist() if name in resources.columns else [""] * len(resources)
+        labels = _unique_labels([f"{res_id} {name}".strip() for res_id, name in zip(self.res_ids, col('name'))] + [MANUAL_CATEGORY])
+        cat_codes, cat_labels = pd.factorize(np.array([c or OTHERS_LABEL for c in col('category')] + [MANUAL_CATEGORY], dtype=object))
+        self._labels = (res_maps.version, labels, cat_codes, list(cat_labels))
+        return self._labels[1:]
+
+    def _build(self, rab_data, res_maps):
+        """Tabel panjang satu baris per (Sub, resource) + baris Harga Manual per Sub"""
+        import pandas as pd
+
+        prices = quantize_array(res_maps.resources['price'].to_numpy(dtype=float), MONEY_SCALE)
+        res_labels, cat_codes, cat_labels = self._resource_labels(res_maps)
+        manual_pos = len(self.res_ids)
+        empty = (np.empty(0, dtype=np.intp), np.empty(0))
+        no_cost = np.empty(0, dtype=np.int64)
+
+        div_labels, sub_labels, g_of_sub = [], [], []
+        sub_col, res_col, cost_col = [], [], []
+        for g_idx, group in enumerate(rab_data):
+            div_labels.append(f"{group.get('id')}. {group.get('title')}")
+            for s_idx, sub in enumerate(group.get('subgroups', [])):
+                cols, qty = self.qty.get((g_idx, s_idx), empty)
+                cost = quantize_array(qty * prices[cols], 1)
+                sub_col.append(np.full(len(cols) + 1, len(sub_labels)))
+                res_col.append(np.append(cols, manual_pos))
+                # Sisa sub_total di luar resource: item harga manual dan selisih pembulatan
+                # (negatif bila pembulatan per item di bawah biaya resource) -> jumlah tetap eksak
+                manual = to_sen(sub.get('sub_total', 0)) - int(cost.sum())
+                cost_col.append(np.append(cost, np.array([manual], dtype=cost.dtype)))
+                sub_labels.append(f"{sub.get('id')} {sub.get('title')}")
+                g_of_sub.append(g_idx)
+
+        k = np.concatenate(sub_col).astype(np.intp) if sub_col else np.empty(0, dtype=np.intp)
+        r = np.concatenate(res_col).astype(np.intp) if res_col else np.empty(0, dtype=np.intp)
+        cost = np.concatenate(cost_col) if cost_col else no_cost
+        keep = cost != 0
+        k, r, cost = k[keep], r[keep], cost[keep]
+        self.table = pd.DataFrame({
+            "divisi": pd.Categorical.from_codes(np.asarray(g_of_sub, dtype=np.intp)[k], categories=_unique_labels(div_labels)),
+            "sub": pd.Categorical.from_codes(k, categories=_unique_labels(sub_labels)),
+            "category": pd.Categorical.from_codes(cat_codes[r], categories=cat_labels),
+            "resource": pd.Categorical.from_codes(r, categories=res_labels),
+            "cost_sen": cost,
+        })
+
+    def rollup(self, levels, divisi=None):
+        """Total biaya (kolom `cost`, Rupiah) per kombinasi `levels` (urut CUBE_LEVELS), opsional satu Divisi saja"""
+        key = (tuple(levels), divisi)
+        frame = self._rollups.get(key)
+        if frame is None:
+            table = self.table if divisi is None else self.table[self.table['divisi'] == divisi]
+            # Dijumlah dalam sen (eksak), baru dikonversi ke Rupiah
+            frame = table.groupby(list(levels), observed=True, sort=False, as_index=False)['cost_sen'].sum()
+            frame['cost'] = from_sen(frame.pop('cost_sen').to_numpy(dtype=float))
+            self._rollups[key] = frame
+        return frame
+
+def _unique_labels(labels):
+    """Label kategori harus unik: label kembar diberi akhiran urutan"""
+    seen = {}
+    out = []
+    for label in labels:
+        n = seen.get(label, 0)
+        seen[label] = n + 1
+        out.append(label if n == 0 else f"{label} ({n + 1})")
+    return out
+
+def top_n(frame, label, n, value="cost", group=None, other_label=OTHERS_LABEL):
+    """N baris terbesar (per kolom `group` bila diberikan); sisanya digabung jadi satu baris `other_label`"""
+    import pandas as pd
+
+    keys = list(group or [])
+    frame = frame.sort_values(value, ascending=False, kind='stable')
+    rank = frame.groupby(keys, observed=True).cumcount() if keys else pd.Series(np.arange(len(frame)), index=frame.index)
+    top = frame.loc[rank < n, keys + [label, value]].astype({label: object})
+    rest = frame[rank >= n]
+    if rest.empty:
+        return top.reset_index(drop=True)
+    others = rest.groupby(keys, observed=True, as_index=False)[value].sum() if keys else pd.DataFrame({value: [rest[value].sum()]})
+    others[label] = other_label
+    return pd.concat([top, others[keys + [label, value]]], ignore_index=True)
+
+def top_items(store, n=20, divisi=None):
+    """Item dengan total terbesar (dari ItemStore) + satu baris "Lainnya" untuk sisanya"""
+    import pandas as pd
+
+    rows = np.arange(len(store))
+    if divisi is not None:
+        g_idx = store.group_ids.index(divisi) if divisi in store.group_ids else -1
+        subs = [k for k, key in enumerate(store.sub_keys) if key[0] == g_idx]
+        rows = np.arange(store.starts[subs[0]], store.starts[subs[-1] + 1]) if subs else rows[:0]
+    totals = np.nan_to_num(store.numeric['total_price'][rows])
+    if len(rows) > n:
+        top = np.argpartition(-totals, n)[:n]
+        top = top[np.argsort(-totals[top], kind='stable')]
+    else:
+        top = np.argsort(-totals, kind='stable')
+    frame = store.frame(rows[top])[["divisi", "sub", "name", "unit", "vol", "total_price"]]
+    rest = totals.sum() - totals[top].sum()
+    if len(rows) > len(top):
+        frame = pd.concat([frame, pd.DataFrame([{"name": f"{OTHERS_LABEL} ({len(rows) - len(top)} item)", "total_price": rest}])],
+                          ignore_index=True)
+    return frame
+
+# ==========================================
+# 8. JADWAL & KURVA S
+# ==========================================
+# Field jadwal opsional pada Sub (dan item, menimpa jadwal Sub-nya):
+# start = minggu mulai (1 = minggu pertama), duration = lama (minggu), profile = pola sebaran biaya
+SCHEDULE_FIELDS = ("start", "duration", "profile")
+SCHEDULE_PROFILES = ("linear", "front", "back", "bell")
+DEFAULT_WEEKS = 24
+
+# Fungsi kumulatif tiap profil: porsi biaya yang terserap saat porsi durasi x (0..1) berjalan
+_PROFILE_CDF = (
+    lambda x: x,                            # merata
+    lambda x: x * (2 - x),                  # menumpuk di awal
+    lambda x: x * x,                        # menumpuk di akhir
+    lambda x: x * x * (3 - 2 * x),          # lambat - cepat - lambat (kurva S)
+)
+
+def _schedule_int(val, default):
+    """Minggu / durasi bulat >= 1; kosong, NaN atau tidak valid -> default"""
+    try:
+        val = int(round(float(val)))
+    except (TypeError, ValueError, OverflowError):
+        return default
+    return val if val >= 1 else default
+
+def resolve_schedule(obj, fallback):
+    """(start, duration, kode profil) dari field jadwal `obj`; field kosong memakai `fallback`"""
+    start, duration, code = fallback
+    profile = obj.get('profile')
+    return (_schedule_int(obj.get('start'), start), _schedule_int(obj.get('duration'), duration),
+            SCHEDULE_PROFILES.index(profile) if profile in SCHEDULE_PROFILES else code)
+
+def project_weeks(project_info):
+    """Durasi proyek (minggu) dari project_info['weeks'], default DEFAULT_WEEKS"""
+    return _schedule_int(project_info.get('weeks'), DEFAULT_WEEKS)
+
+def sub_schedule(sub, weeks=DEFAULT_WEEKS):
+    """Jadwal efektif satu Sub; Sub tanpa jadwal tersebar merata sepanjang durasi proyek"""
+    return resolve_schedule(sub, (1, weeks, 0))
+
+# Resolusi porsi kumulatif kurva S; int64 cukup untuk total item hingga ~Rp 23 miliar,
+# di atasnya exact_dtype beralih ke integer Python
+_CDF_SCALE = 1_000_000
+
+def _item_schedules(items, fallback):
+    """Array (total sen, start, duration, kode profil) item satu Sub"""
+    n = len(items)
+    totals = np.fromiter((to_sen(item.get('total_price', 0)) for item in items), dtype=np.int64, count=n)
+    sched = np.empty((n, 3), dtype=np.int64)
+    sched[:] = fallback
+    for i_idx, item in enumerate(items):
+        if 'start' in item or 'duration' in item or 'profile' in item:
+            sched[i_idx] = resolve_schedule(item, fallback)
+    return totals, sched[:, 0], sched[:, 1], sched[:, 2]
+
+def spread_costs(totals, starts, durations, codes, n_weeks):
+    """Matriks (n_item, n_weeks) biaya per minggu dalam sen.
+
+    Porsi kumulatif di batas minggu dikuantisasi ke 1/_CDF_SCALE, biaya kumulatif
+    dibulatkan ke sen (round_div, setengah menjauhi nol) lalu diselisihkan, jadi
+    setiap baris berjumlah tepat `totals` (n_weeks harus >= minggu akhir).
+    """
+    totals = np.asarray(totals, dtype=np.int64)
+    codes = np.asarray(codes)
+    offset = np.arange(n_weeks + 1) - (np.asarray(starts)[:, None] - 1)
+    x = np.clip(offset / np.asarray(durations)[:, None], 0.0, 1.0)
+    # Profil linear (kode 0) adalah x itu sendiri; profil lain dihitung hanya untuk barisnya
+    cdf = x.copy() if codes.any() else x
+    for code in np.unique(codes[codes != 0]):
+        rows = codes == code
+        cdf[rows] = _PROFILE_CDF[code](x[rows])
+    shares, totals = exact_dtype(quantize_array(cdf, _CDF_SCALE), totals[:, None])
+    cum = round_div_array(shares * totals, _CDF_SCALE)
+    # Selisih kumulatif tidak melebihi total item, jadi selalu muat kembali di int64
+    return np.diff(cum, axis=1).astype(np.int64)
+
+def _week_end(starts, durations):
+    return int((np.asarray(starts) + np.asarray(durations) - 1).max(initial=0))
+
+class CostSchedule:
+    """Rencana biaya per minggu (kurva S) dari jadwal Sub / item.
+
+    Setiap item disebar menurut jadwalnya (atau jadwal Sub-nya) sebagai baris
+    matriks item x minggu dalam sen; jumlah baris per Sub di-cache per (versi Sub,
+    jadwal Sub), jadi setelah edit hanya Sub yang berubah yang disebar ulang.
+    Total mingguan tepat sama dengan total fisik RAB. `version` berubah setiap
+    kali angka mingguan berubah (kunci cache grafik / export).
+    """
+
+    def __init__(self):
+        self.version = None
+        self.weeks = DEFAULT_WEEKS
+        self.n_weeks = 0
+        self.subs = {}              # (g_idx, s_idx) -> (kunci cache, biaya per minggu dalam sen)
+        self.by_division = np.zeros((0, 0), dtype=np.int64)
+        self._frame = None
+
+    def sync(self, index, weeks=DEFAULT_WEEKS):
+        """Segarkan dari DependencyIndex & field jadwal; mengembalikan jumlah Sub yang disebar ulang"""
+        rab_data = index.rab_data
+        keys, stale = [], 0
+        for g_idx, group in enumerate(rab_data):
+            for s_idx, sub in enumerate(group.get('subgroups', [])):
+                key = (g_idx, s_idx)
+                keys.append(key)
+                cache_key = (index.sub_version(g_idx, s_idx), sub_schedule(sub, weeks))
+                hit = self.subs.get(key)
+                if hit is None or hit[0] != cache_key:
+                    totals, starts, durations, codes = _item_schedules(sub['items'], cache_key[1])
+                    matrix = spread_costs(totals, starts, durations, codes, _week_end(starts, durations))
+                    self.subs[key] = (cache_key, matrix.sum(axis=0))
+                    stale += 1
+        for key in self.subs.keys() - set(keys):
+            del self.subs[key]
+            stale += 1
+
+        n_weeks = max([weeks] + [len(self.subs[key][1]) for key in keys])
+        if stale or n_weeks != self.n_weeks or self.by_division.shape[0] != len(rab_data) or self.version is None:
+            by_division = np.zeros((len(rab_data), n_weeks), dtype=np.int64)
+            for key in keys:
+                row = self.subs[key][1]
+                by_division[key[0], :len(row)] += row
+            self.by_division, self.n_weeks, self.weeks = by_division, n_weeks, weeks
+            self.version = next(_VERSIONS)
+            self._frame = None
+        count("schedule_subs_spread", stale)
+        return stale
+
+    @property
+    def weekly(self):
+        """Biaya per minggu seluruh proyek (sen)"""
+        return self.by_division.sum(axis=0)
+
+    def frame(self):
+        """Tabel kurva S: biaya & bobot (%) per minggu beserta kumulatifnya (Rupiah)"""
+        import pandas as pd
+
+        if self._frame is None:
+            weekly = self.weekly
+            cumulative = np.cumsum(weekly)
+            total = cumulative[-1] if len(cumulative) else 0
+            scale = 100.0 / total if total else 0.0
+            self._frame = pd.DataFrame({
+                "week": np.arange(1, len(weekly) + 1),
+                "cost": weekly / MONEY_SCALE,
+                "cumulative": cumulative / MONEY_SCALE,
+                "weight": weekly * scale,
+                "cum_weight": cumulative * scale,
+            })
+        return self._frame
+
+    def division_frame(self, rab_data):
+        """Biaya per (Divisi, minggu) dalam bentuk panjang untuk grafik batang bertumpuk"""
+        import pandas as pd
+
+        n_div, n_weeks = self.by_division.shape
+        labels = [f"{group.get('id')}. {group.get('title')}" for group in rab_data[:n_div]]
+        return pd.DataFrame({
+            "divisi": np.repeat(np.array(labels, dtype=object), n_weeks),
+            "week": np.tile(np.arange(1, n_weeks + 1), n_div),
+            "cost": self.by_division.ravel() / MONEY_SCALE,
+        })
+
+    def sub_table(self, rab_data):
+        """Jadwal efektif & biaya per minggu (Rupiah) tiap Sub, dari baris Sub yang di-cache"""
+        import pandas as pd
+
+        rows, weekly_rows = [], []
+        for g_idx, group in enumerate(rab_data):
+            for s_idx, sub in enumerate(group.get('subgroups', [])):
+                hit = self.subs.get((g_idx, s_idx))
+                if hit is None:
+                    continue
+                (_, (start, duration, code)), weekly = hit
+                weekly_rows.append(weekly)
+                rows.append({"divisi": group.get('id'), "sub": sub.get('id'), "title": sub.get('title'),
+                             "total_price": sub.get('sub_total', 0), "start": start, "duration": duration,
+                             "profile": SCHEDULE_PROFILES[code]})
+        matrix = np.zeros((len(rows), self.n_weeks), dtype=np.int64)
+        for row, weekly in enumerate(weekly_rows):
+            matrix[row, :len(weekly)] = weekly
+        frame = pd.DataFrame(rows, columns=["divisi", "sub", "title", "total_price", "start", "duration", "profile"])
+        weeks = pd.DataFrame(matrix / MONEY_SCALE, columns=[f"M{week}" for week in range(1, self.n_weeks + 1)])
+        return pd.concat([frame, weeks], axis=1)
+
+    def item_table(self, rab_data):
+        """Matriks item x minggu (Rupiah) lengkap dengan jadwal efektif tiap item, untuk export"""
+        import pandas as pd
+
+        parts, labels = [], []
+        for group in rab_data:
+            for sub in group.get('subgroups', []):
+                parts.append(_item_schedules(sub['items'], sub_schedule(sub, self.weeks)))
+                labels.append((group.get('id'), sub.get('id'), len(sub['items'])))
+        if not parts:
+            return pd.DataFrame(columns=["divisi", "sub", "name", "total_price", "start", "duration", "profile"])
+        totals, starts, durations, codes = (np.concatenate(cols) for cols in zip(*parts))
+        n_weeks = max(self.n_weeks, _week_end(starts, durations))
+        matrix = spread_costs(totals, starts, durations, codes, n_weeks) / MONEY_SCALE
+        columns = {
+            "divisi": np.repeat(np.array([g for g, _, _ in labels], dtype=object), [n for _, _, n in labels]),
+            "sub": np.repeat(np.array([s for _, s, _ in labels], dtype=object), [n for _, _, n in labels]),
+            "name": [item.get('name') for group in rab_data for sub in group.get('subgroups', []) for item in sub['items']],
+            "total_price": totals / MONEY_SCALE,
+            "start": starts,
+            "duration": durations,
+            "profile": np.array(SCHEDULE_PROFILES, dtype=object)[codes],
+        }
+        weeks = pd.DataFrame(matrix, columns=[f"M{week}" for week in range(1, n_weeks + 1)])
+        return pd.concat([pd.DataFrame(columns), weeks], axis=1)
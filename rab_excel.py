@@ -0,0 +1,445 @@
+"""RAB EXCEL: export RAB lengkap ke .xlsx dan import library harga/AHSP dari .xlsx.
+
+Sheet yang ditulis:
+    Rekap  - total per divisi, Profit, PPN & Grand Total
+    RAB    - seluruh item per Divisi / Sub
+    AHSP   - analisa harga satuan tiap resep
+    Harga  - daftar harga dasar resource
+
+export_schedule_excel menulis kurva S (bobot mingguan & kumulatif + grafik)
+serta jadwal biaya per Sub dari CostSchedule ke workbook terpisah.
+
+Harga satuan item AHSP, komponen analisa dan semua total ditulis sebagai
+RUMUS yang merujuk sheet Harga, jadi mengubah harga dasar di Excel ikut
+menghitung ulang seluruh RAB. Nilai hasil hitungan engine disertakan sebagai
+cached value agar angka tampil di viewer yang tidak menghitung ulang rumus.
+Dengan constant_memory setiap baris langsung dibuang ke file sementara, jadi
+memori tidak bertambah mengikuti jumlah baris.
+
+Import (read_library) membaca spreadsheet HSPK / AHSP dengan openpyxl mode
+read-only (baris di-stream, tidak dimuat sekaligus). Kolom dikenali dari
+judulnya (Kode, Uraian, Satuan, Harga, Koefisien, ...), jadi workbook hasil
+export di atas juga bisa diimpor kembali.
+"""
+import itertools
+import re
+
+import xlsxwriter
+from xlsxwriter.utility import xl_rowcol_to_cell
+
+def _layout_resources(resources):
+    """Baris (0-based) tiap resource di sheet Harga; id duplikat -> baris terakhir"""
+    return {res_id: 1 + i for i, res_id in enumerate(resources['id'].tolist())}
+
+def _layout_ahsp(ahsp_master):
+    """Baris total (harga satuan) tiap AHSP di sheet AHSP, tanpa menulis apa pun"""
+    rows = {}
+    row = 1
+    for ahsp_id, recipe in ahsp_master.items():
+        # judul + komponen + baris total + baris kosong
+        row += 1 + len(recipe['components'])
+        rows[ahsp_id] = row
+        row += 2
+    return rows
+
+def _layout_rab(rab_data):
+    """Baris total tiap Divisi di sheet RAB (untuk rumus di sheet Rekap)"""
+    rows = []
+    row = 1  # judul divisi pertama
+    for group in rab_data:
+        for sub in group.get('subgroups', []):
+            row += 1 + len(sub['items']) + 1  # judul sub + item + subtotal
+        row += 1  # total divisi
+        rows.append(row)
+        row += 2  # baris kosong + judul divisi berikutnya
+    return rows
+
+def export_excel(project, output):
+    """Menulis workbook RAB ke `output` (path file atau objek file biner, misal BytesIO)"""
+    from rab_engine import COEF_SCALE, quantize
+
+    real_cost, profit, ppn, final_total, _ = project.totals()
+    tax = project.tax_settings
+
+    res_rows = _layout_resources(project.resources)
+    ahsp_rows = _layout_ahsp(project.ahsp_master)
+    group_rows = _layout_rab(project.rab_data)
+
+    wb = xlsxwriter.Workbook(output, {'constant_memory': True, 'nan_inf_to_errors': True})
+    fmt_head = wb.add_format({'bold': True, 'bg_color': '#F0F0F0', 'border': 1})
+    fmt_bold = wb.add_format({'bold': True})
+    fmt_money = wb.add_format({'num_format': '#,##0'})
+    fmt_money_bold = wb.add_format({'num_format': '#,##0', 'bold': True})
+    fmt_num = wb.add_format({'num_format': '#,##0.0000'})
+
+    ws_rekap = wb.add_worksheet("Rekap")
+    ws_rab = wb.add_worksheet("RAB")
+    ws_ahsp = wb.add_worksheet("AHSP")
+    ws_res = wb.add_worksheet("Harga")
+
+    # --- Harga dasar ---
+    res_price = project.index.res_map
+    ws_res.write_row(0, 0, ["Kode", "Kategori", "Nama", "Satuan", "Harga (Rp)"], fmt_head)
+    for row, rec in enumerate(project.resources.itertuples(index=False), start=1):
+        ws_res.write_row(row, 0, [rec.id, getattr(rec, 'category', None), getattr(rec, 'name', None), getattr(rec, 'unit', None)])
+        ws_res.write_number(row, 4, rec.price, fmt_money)
+    ws_res.set_column(0, 0, 10)
+    ws_res.set_column(2, 2, 30)
+    ws_res.set_column(4, 4, 15)
+
+    # --- Analisa AHSP ---
+    ws_ahsp.write_row(0, 0, ["Kode", "Uraian", "Satuan", "Koefisien", "Harga Satuan", "Jumlah"], fmt_head)
+    row = 1
+    for ahsp_id, recipe in project.ahsp_master.items():
+        ws_ahsp.write_row(row, 0, [ahsp_id, recipe['name'], recipe['unit']], fmt_bold)
+        first = row + 1
+        total = 0
+        for comp in recipe['components']:
+            row += 1
+            # Koefisien yang dipakai engine (dibulatkan ke 1/10.000), agar rumus Excel = total RAB
+            coef = quantize(comp['coef'], COEF_SCALE) / COEF_SCALE
+            ws_ahsp.write(row, 0, comp['id'])
+            ws_ahsp.write_number(row, 3, coef, fmt_num)
+            if comp['id'] in res_rows:
+                price = res_price.get(comp['id'], 0)
+                res_row = res_rows[comp['id']]
+                ws_ahsp.write_formula(row, 1, f"=Harga!{xl_rowcol_to_cell(res_row, 2)}", None, _text(res_row, project.resources, 'name'))
+                ws_ahsp.write_formula(row, 2, f"=Harga!{xl_rowcol_to_cell(res_row, 3)}", None, _text(res_row, project.resources, 'unit'))
+                ws_ahsp.write_formula(row, 4, f"=Harga!{xl_rowcol_to_cell(res_row, 4, True, True)}", fmt_money, price)
+            elif comp['id'] in ahsp_rows:
+                # Sub-analisa: harga satuan merujuk baris total analisa tersebut di sheet ini
+                price = project.index.ahsp_prices.get(comp['id'], 0)
+                sub = project.ahsp_master[comp['id']]
+                ws_ahsp.write_row(row, 1, [sub['name'], sub['unit']])
+                ws_ahsp.write_formula(row, 4, f"={xl_rowcol_to_cell(ahsp_rows[comp['id']], 5, True, True)}", fmt_money, price)
+            else:
+                price = 0
+                # Resource sudah dihapus dari database: harga 0 (sama seperti engine)
+                ws_ahsp.write_number(row, 4, 0, fmt_money)
+            ws_ahsp.write_formula(row, 5, f"={xl_rowcol_to_cell(row, 3)}*{xl_rowcol_to_cell(row, 4)}", fmt_money, price * coef)
+            total += price * coef
+        row += 1
+        ws_ahsp.write(row, 4, "Harga Satuan", fmt_bold)
+        # Harga satuan dibulatkan ke sen seperti engine (ROUND Excel = setengah menjauhi nol)
+        ws_ahsp.write_formula(row, 5, f"=ROUND({_sum(first, row - 1, 5)[1:]},2)", fmt_money_bold,
+                              project.index.ahsp_prices.get(ahsp_id, total))
+        row += 2
+    ws_ahsp.set_column(1, 1, 30)
+    ws_ahsp.set_column(4, 5, 15)
+
+    # --- RAB item ---
+    ws_rab.write_row(0, 0, ["No", "Uraian Pekerjaan", "Sat", "Volume", "Kode AHSP", "Harga Satuan", "Jumlah Harga"], fmt_head)
+    row = 1
+    for group, group_row in zip(project.rab_data, group_rows):
+        ws_rab.write_row(row, 0, [group['id'], group['title']], fmt_bold)
+        sub_total_cells = []
+        for sub in group.get('subgroups', []):
+            row += 1
+            ws_rab.write_row(row, 0, [sub['id'], sub['title']], fmt_bold)
+            first = row + 1
+            for no, item in enumerate(sub['items'], start=1):
+                row += 1
+                ws_rab.write_row(row, 0, [no, item.get('name'), item.get('unit')])
+                ws_rab.write_number(row, 3, item['vol'])
+                ahsp_id = item.get('ahsp')
+                if ahsp_id and ahsp_id in ahsp_rows:
+                    ws_rab.write(row, 4, ahsp_id)
+                    ws_rab.write_formula(
+                        row, 5, f"=AHSP!{xl_rowcol_to_cell(ahsp_rows[ahsp_id], 5, True, True)}", fmt_money, item['current_price']
+                    )
+                else:
+                    ws_rab.write_number(row, 5, item['current_price'], fmt_money)
+                ws_rab.write_formula(row, 6, f"=ROUND({xl_rowcol_to_cell(row, 3)}*{xl_rowcol_to_cell(row, 5)},2)", fmt_money, item['total_price'])
+            row += 1
+            ws_rab.write(row, 5, "Sub Total", fmt_bold)
+            ws_rab.write_formula(row, 6, _sum(first, row - 1, 6), fmt_money_bold, sub['sub_total'])
+            sub_total_cells.append(xl_rowcol_to_cell(row, 6))
+        row += 1
+        ws_rab.write(row, 5, f"TOTAL {group['id']}", fmt_bold)
+        formula = "=" + "+".join(sub_total_cells) if sub_total_cells else "=0"
+        ws_rab.write_formula(row, 6, formula, fmt_money_bold, group['group_total'])
+        row += 2
+    ws_rab.set_column(1, 1, 40)
+    ws_rab.set_column(4, 4, 12)
+    ws_rab.set_column(5, 6, 16)
+
+    # --- Rekap ---
+    info = project.project_info
+    ws_rekap.write(0, 0, f"REKAPITULASI RAB: {info.get('name', '')}", fmt_bold)
+    ws_rekap.write(1, 0, f"Lokasi: {info.get('location', '')} | Owner: {info.get('owner', '')}")
+    ws_rekap.write_row(3, 0, ["No", "Uraian Pekerjaan", "Jumlah (Rp)"], fmt_head)
+    row = 3
+    for group, group_row in zip(project.rab_data, group_rows):
+        row += 1
+        ws_rekap.write_row(row, 0, [group['id'], group['title']])
+        ws_rekap.write_formula(row, 2, f"=RAB!{xl_rowcol_to_cell(group_row, 6)}", fmt_money, group['group_total'])
+    cost_cell = xl_rowcol_to_cell(row + 2, 2)
+    profit_cell = xl_rowcol_to_cell(row + 3, 2)
+    ppn_cell = xl_rowcol_to_cell(row + 4, 2)
+    rows = [
+        ("REAL COST (FISIK)", _sum(4, row, 2) if row >= 4 else "=0", real_cost),
+        (f"PROFIT ({tax['profit']}%)", f"=ROUND({cost_cell}*{tax['profit']}/100,2)", profit),
+        (f"PPN ({tax['ppn']}%)", f"=ROUND(({cost_cell}+{profit_cell})*{tax['ppn']}/100,2)", ppn),
+        ("GRAND TOTAL", f"={cost_cell}+{profit_cell}+{ppn_cell}", final_total),
+    ]
+    row += 1
+    for label, formula, value in rows:
+        row += 1
+        ws_rekap.write(row, 1, label, fmt_bold)
+        ws_rekap.write_formula(row, 2, formula, fmt_money_bold, value)
+    ws_rekap.set_column(1, 1, 40)
+    ws_rekap.set_column(2, 2, 20)
+
+    wb.close()
+
+def export_takeoff_excel(frame, output):
+    """Rekap kebutuhan sumber daya (dari rab_engine.takeoff_frame) ke .xlsx: per kategori & per Divisi"""
+    from rab_engine import takeoff_summary
+
+    headers = {
+        "divisi_id": "Kode Divisi", "divisi": "Divisi", "category": "Kategori", "id": "Kode", "name": "Nama",
+        "unit": "Satuan", "price": "Harga (Rp)", "qty": "Kebutuhan", "cost": "Jumlah (Rp)",
+    }
+    wb = xlsxwriter.Workbook(output, {'constant_memory': True, 'nan_inf_to_errors': True})
+    fmt_head = wb.add_format({'bold': True, 'bg_color': '#F0F0F0', 'border': 1})
+    fmt_money = wb.add_format({'num_format': '#,##0'})
+    fmt_num = wb.add_format({'num_format': '#,##0.00'})
+    formats = {"price": fmt_money, "cost": fmt_money, "qty": fmt_num}
+    for title, by in (("Per Kategori", "category"), ("Per Divisi", "divisi")):
+        summary = takeoff_summary(frame, by)
+        ws = wb.add_worksheet(title)
+        columns = list(summary.columns)
+        ws.write_row(0, 0, [headers.get(col, col) for col in columns], fmt_head)
+        for row, values in enumerate(summary.itertuples(index=False), start=1):
+            for col, (name, val) in enumerate(zip(columns, values)):
+                if val is None or val != val:
+                    continue
+                ws.write(row, col, val, formats.get(name))
+        ws.set_column(0, len(columns) - 1, 14)
+    wb.close()
+
+def export_schedule_excel(weekly, subs, output):
+    """Kurva S (rab_engine.CostSchedule.frame) + jadwal per Sub (CostSchedule.sub_table) ke .xlsx.
+
+    Sheet "Kurva S" memuat grafik bawaan Excel: batang bobot mingguan dan garis
+    bobot kumulatif (sumbu kanan), merujuk langsung ke tabel di sheet yang sama.
+    """
+    from rab_engine import SCHEDULE_FIELDS
+
+    wb = xlsxwriter.Workbook(output, {'constant_memory': True, 'nan_inf_to_errors': True})
+    fmt_head = wb.add_format({'bold': True, 'bg_color': '#F0F0F0', 'border': 1})
+    fmt_money = wb.add_format({'num_format': '#,##0'})
+    fmt_pct = wb.add_format({'num_format': '0.00'})
+
+    ws = wb.add_worksheet("Kurva S")
+    ws.write_row(0, 0, ["Minggu", "Biaya (Rp)", "Kumulatif (Rp)", "Bobot (%)", "Bobot Kumulatif (%)"], fmt_head)
+    for row, rec in enumerate(weekly.itertuples(index=False), start=1):
+        ws.write_number(row, 0, rec.week)
+        ws.write_number(row, 1, rec.cost, fmt_money)
+        ws.write_number(row, 2, rec.cumulative, fmt_money)
+        ws.write_number(row, 3, rec.weight, fmt_pct)
+        ws.write_number(row, 4, rec.cum_weight, fmt_pct)
+    ws.set_column(0, 0, 8)
+    ws.set_column(1, 4, 18)
+    if len(weekly):
+        last = len(weekly)
+        chart = wb.add_chart({'type': 'column'})
+        chart.add_series({'name': "Bobot (%)", 'categories': ["Kurva S", 1, 0, last, 0], 'values': ["Kurva S", 1, 3, last, 3]})
+        line = wb.add_chart({'type': 'line'})
+        line.add_series({'name': "Kumulatif (%)", 'categories': ["Kurva S", 1, 0, last, 0],
+                         'values': ["Kurva S", 1, 4, last, 4], 'y2_axis': True})
+        chart.combine(line)
+        chart.set_title({'name': "Kurva S Rencana"})
+        chart.set_x_axis({'name': "Minggu"})
+        chart.set_y_axis({'name': "Bobot mingguan (%)"})
+        line.set_y2_axis({'name': "Kumulatif (%)", 'max': 100})
+        chart.set_size({'width': 900, 'height': 420})
+        ws.insert_chart(1, 6, chart)
+
+    headers = {"divisi": "Divisi", "sub": "Kode", "title": "Uraian", "total_price": "Jumlah (Rp)",
+               "start": "Mulai (Minggu)", "duration": "Durasi (Minggu)", "profile": "Profil"}
+    ws = wb.add_worksheet("Jadwal Sub")
+    columns = list(subs.columns)
+    ws.write_row(0, 0, [headers.get(col, col) for col in columns], fmt_head)
+    for row, values in enumerate(subs.itertuples(index=False), start=1):
+        for col, (name, val) in enumerate(zip(columns, values)):
+            if val is None or val != val or (val == 0 and name not in headers):
+                continue
+            ws.write(row, col, val, None if name in SCHEDULE_FIELDS or name in ("divisi", "sub", "title") else fmt_money)
+    ws.set_column(2, 2, 36)
+    ws.set_column(3, 3, 16)
+    ws.freeze_panes(1, 7)
+    wb.close()
+
+def _sum(first_row, last_row, col):
+    if last_row < first_row:
+        return "=0"
+    return f"=SUM({xl_rowcol_to_cell(first_row, col)}:{xl_rowcol_to_cell(last_row, col)})"
+
+def _text(res_row, resources, column):
+    if column not in resources.columns:
+        return ""
+    val = resources[column].iat[res_row - 1]
+    return "" if val is None else str(val)
+
+# ==========================================
+# IMPORT LIBRARY (HSPK & AHSP)
+# ==========================================
+# Judul kolom yang dikenali (huruf kecil, isi dalam kurung diabaikan)
+COLUMN_ALIASES = {
+    'ahsp': ("kode ahsp", "id ahsp", "ahsp", "kode analisa"),
+    'id': ("id", "kode", "kode resource", "kode hspk", "kode komponen", "komponen", "kode barang"),
+    'category': ("category", "kategori", "jenis", "kelompok"),
+    'name': ("name", "nama", "uraian", "nama barang"),
+    'unit': ("unit", "satuan", "sat"),
+    # Judul resep pada tata letak Kode AHSP per baris (Uraian/Satuan di sana milik komponen)
+    'ahsp_name': ("uraian pekerjaan", "nama pekerjaan", "uraian analisa", "nama analisa"),
+    'ahsp_unit': ("satuan pekerjaan", "satuan analisa"),
+    'price': ("price", "harga", "harga satuan", "harga dasar", "hspk"),
+    'coef': ("coef", "koefisien", "koef", "indeks"),
+}
+_ALIAS_TO_FIELD = {alias: key for key, aliases in COLUMN_ALIASES.items() for alias in aliases}
+HEADER_SCAN_ROWS = 20
+
+def _normalize_header(val):
+    if val is None:
+        return ""
+    return " ".join(re.sub(r"\(.*?\)", " ", str(val)).lower().replace("_", " ").split())
+
+def _map_columns(header):
+    """{field: index kolom} dari satu baris judul; kolom pertama yang cocok dipakai"""
+    mapping = {}
+    for col, val in enumerate(header):
+        key = _ALIAS_TO_FIELD.get(_normalize_header(val))
+        if key and key not in mapping:
+            mapping[key] = col
+    return mapping
+
+def _find_header(rows):
+    """Mencari baris judul di awal sheet; mengembalikan (jenis, mapping) atau (None, None)"""
+    for row in itertools.islice(rows, HEADER_SCAN_ROWS):
+        mapping = _map_columns(row)
+        if 'id' in mapping and 'coef' in mapping:
+            return 'ahsp', mapping
+        if 'id' in mapping and 'price' in mapping:
+            return 'resources', mapping
+    return None, None
+
+def _to_number(series):
+    """Angka dari sel Excel; teks berformat Indonesia ("Rp 1.250.000,50") ikut dikonversi"""
+    import pandas as pd
+
+    num = pd.to_numeric(series, errors='coerce')
+    is_text = num.isna() & series.map(lambda v: isinstance(v, str))
+    if is_text.any():
+        text = series[is_text].str.replace(r"(?i)rp\.?|\s", "", regex=True)
+        # Titik ribuan + koma desimal, atau titik ribuan saja (12.500)
+        indo = text.str.contains(",", regex=False) | text.str.fullmatch(r"-?\d{1,3}(\.\d{3})+")
+        text = text.where(~indo, text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+        num[is_text] = pd.to_numeric(text, errors='coerce')
+    return num
+
+def _cell(row, col):
+    if col is None or col >= len(row):
+        return None
+    val = row[col]
+    if isinstance(val, str):
+        val = val.strip()
+        return val or None
+    return val
+
+def _read_resource_rows(rows, mapping, columns):
+    """Baris harga: baris tanpa harga tapi berteks dianggap judul kategori
+    (bila sheet tidak punya kolom kategori), seperti "A. UPAH" di HSPK"""
+    section = None
+    for row in rows:
+        res_id = _cell(row, mapping['id'])
+        price = _cell(row, mapping['price'])
+        name = _cell(row, mapping.get('name', mapping.get('ahsp_name')))
+        if price is None:
+            if 'category' not in mapping and (name or res_id):
+                section = str(name or res_id)
+            continue
+        if res_id is None:
+            continue
+        columns['id'].append(str(res_id))
+        columns['category'].append(_cell(row, mapping['category']) if 'category' in mapping else section)
+        columns['name'].append(name)
+        columns['unit'].append(_cell(row, mapping.get('unit')))
+        columns['price'].append(price)
+
+def _read_ahsp_rows(rows, mapping, comp_rows, heads):
+    """Dua tata letak: kolom Kode AHSP per baris (boleh kosong = sama dengan baris
+    atas, sel merge), atau blok seperti sheet AHSP hasil export: baris berkode
+    tanpa koefisien = judul resep, baris berkoefisien di bawahnya = komponen.
+
+    Pada tata letak per baris, Uraian/Satuan adalah milik komponen; nama & satuan
+    resep hanya diambil dari kolom Uraian/Satuan Pekerjaan bila ada."""
+    current = None
+    for row in rows:
+        code = _cell(row, mapping['id'])
+        coef = _cell(row, mapping['coef'])
+        if 'ahsp' in mapping:
+            current = _cell(row, mapping['ahsp']) or current
+            if current is not None and str(current) not in heads and ('ahsp_name' in mapping or 'ahsp_unit' in mapping):
+                heads[str(current)] = (_cell(row, mapping.get('ahsp_name')), _cell(row, mapping.get('ahsp_unit')))
+        elif code is not None and coef is None:
+            current = code
+            heads[str(current)] = (_cell(row, mapping.get('name', mapping.get('ahsp_name'))),
+                                   _cell(row, mapping.get('unit', mapping.get('ahsp_unit'))))
+            continue
+        if current is None or code is None or coef is None:
+            continue
+        comp_rows.append((str(current), str(code), coef))
+
+def read_library(source):
+    """Membaca workbook HSPK / AHSP (path atau file biner) secara streaming.
+
+    Setiap sheet dikenali dari baris judulnya: berkolom Kode + Harga menjadi
+    tabel harga, berkolom Kode + Koefisien menjadi resep AHSP. Sheet lain
+    dilewati. Mengembalikan (price_df atau None, {ahsp_id: resep}, peringatan).
+    Resep tanpa nama / satuan di file tidak memuat key tersebut (lihat upsert_ahsp).
+    """
+    import openpyxl
+    import pandas as pd
+
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    warnings = []
+    columns = {key: [] for key in ('id', 'category', 'name', 'unit', 'price')}
+    comp_rows, heads = [], {}
+    try:
+        for ws in wb.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            kind, mapping = _find_header(rows)
+            if kind == 'resources':
+                _read_resource_rows(rows, mapping, columns)
+            elif kind == 'ahsp':
+                _read_ahsp_rows(rows, mapping, comp_rows, heads)
+            else:
+                warnings.append(f"Sheet '{ws.title}' dilewati: judul kolom tidak dikenali")
+    finally:
+        wb.close()
+
+    price_df = None
+    if columns['id']:
+        price_df = pd.DataFrame(columns)
+        price_df['price'] = _to_number(price_df['price'])
+        bad = price_df['price'].isna()
+        if bad.any():
+            warnings.append(f"{int(bad.sum())} baris harga dilewati (harga bukan angka), cth: {price_df['id'][bad].iloc[0]}")
+            price_df = price_df[~bad].reset_index(drop=True)
+
+    recipes = {}
+    if comp_rows:
+        comps = pd.DataFrame(comp_rows, columns=['ahsp', 'id', 'coef'])
+        comps['coef'] = _to_number(comps['coef'])
+        bad = comps['coef'].isna()
+        if bad.any():
+            warnings.append(f"{int(bad.sum())} komponen AHSP dilewati (koefisien bukan angka)")
+            comps = comps[~bad]
+        for ahsp_id, group in comps.groupby('ahsp', sort=False):
+            name, unit = heads.get(ahsp_id, (None, None))
+            recipe = {key: val for key, val in (("name", name), ("unit", unit)) if val is not None}
+            recipe["components"] = [{"id": cid, "coef": coef} for cid, coef in zip(group['id'].tolist(), group['coef'].tolist())]
+            recipes[ahsp_id] = recipe
+    return price_df, recipes, warnings
@@ -0,0 +1,375 @@
+"""RAB HISTORY: riwayat revisi proyek (kontrak, addendum, CCO) dan diff antar versi.
+
+Snapshot disimpan content-addressed: setiap bagian proyek diserialisasi ke JSON
+kanonik dan disimpan dengan kunci hash isinya. Pohon satu revisi:
+
+    root      - info, pajak, total + ref tabel harga, ref resep AHSP, daftar Divisi
+    Divisi    - id, judul, total + daftar Sub (masing-masing dengan ref daftar item)
+    item Sub  - daftar item satu Sub
+
+Bagian yang tidak berubah menghasilkan hash yang sama, jadi dipakai bersama
+antar revisi (Divisi yang tidak tersentuh addendum tidak menambah isi database).
+Saat snapshot, Sub yang versinya di DependencyIndex belum berubah sejak snapshot
+sebelumnya tidak diserialisasi ulang.
+
+Diff menyejajarkan Divisi & Sub per id dan item per kunci item (`id` item bila
+ada, selain itu nama + urutan kemunculan nama yang sama di Sub itu). Sub/Divisi
+dengan hash sama dilewati tanpa dibuka, sehingga biaya diff sebanding dengan
+jumlah item di bagian yang berubah.
+"""
+import hashlib
+import json
+import time
+import zlib
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from rab_engine import (
+    MONEY_SCALE, VOL_SCALE, Project, apply_tax, from_sen, quantize, quantize_array, to_sen,
+)
+
+FORMAT_VERSION = 1
+_EMPTY = {}
+ITEM_STATUSES = ("added", "removed", "changed")
+DIFF_ITEM_COLUMNS = (
+    "divisi_id", "divisi", "sub_id", "sub", "status", "name", "unit", "ahsp_old", "ahsp_new",
+    "vol_old", "vol_new", "price_old", "price_new", "total_old", "total_new", "delta",
+)
+DIFF_DIVISION_COLUMNS = (
+    "divisi_id", "divisi", "status", "total_old", "total_new", "delta", "added", "removed", "changed",
+)
+
+def _json_default(val):
+    """Tipe numpy -> tipe Python; selain itu string"""
+    if hasattr(val, 'item'):
+        return val.item()
+    return str(val)
+
+def encode_object(obj):
+    """(digest, data terkompresi) dari JSON kanonik sebuah objek"""
+    raw = json.dumps(obj, sort_keys=True, separators=(',', ':'), default=_json_default).encode('utf-8')
+    return hashlib.blake2b(raw, digest_size=20).hexdigest(), zlib.compress(raw, 1)
+
+def decode_object(data):
+    return json.loads(zlib.decompress(data))
+
+class ObjectStore:
+    """Penyimpanan objek di memori: digest -> data terkompresi"""
+
+    def __init__(self):
+        self.data = {}
+
+    def __contains__(self, digest):
+        return digest in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        return sum(len(blob) for blob in self.data.values())
+
+    def get(self, digest):
+        return decode_object(self.data[digest])
+
+    def put_many(self, blobs):
+        for digest, data in blobs.items():
+            self.data.setdefault(digest, data)
+
+class _Overlay:
+    """Objek baru yang belum disimpan dibaca lebih dulu, lalu store di bawahnya"""
+
+    def __init__(self, pending, objects):
+        self.pending = pending
+        self.objects = objects
+
+    def get(self, digest):
+        data = self.pending.get(digest)
+        return decode_object(data) if data is not None else self.objects.get(digest)
+
+# ==========================================
+# SNAPSHOT
+# ==========================================
+def snapshot(project, cache=None):
+    """Pohon objek satu proyek; mengembalikan (root digest, {digest: data}).
+
+    `cache` (dict, milik pemanggil) menyimpan digest bagian yang versinya tidak
+    berubah di DependencyIndex, jadi snapshot berikutnya hanya menyerialisasi
+    Sub / tabel harga / resep yang berubah.
+    """
+    real_cost, *_ = project.totals()
+    index = project.index
+    cache = {} if cache is None else cache
+    blobs = {}
+
+    def put(obj):
+        digest, data = encode_object(obj)
+        blobs[digest] = data
+        return digest
+
+    def cached(key, version, build):
+        # Data ikut disimpan di cache: objek tetap terkirim walau snapshot sebelumnya tidak di-commit
+        hit = cache.get(key)
+        if hit is None or hit[0] != version:
+            hit = (version,) + encode_object(build())
+            cache[key] = hit
+        blobs[hit[1]] = hit[2]
+        return hit[1]
+
+    resources_ref = cached(("resources",), index.res_maps.version, lambda: project.resources.to_dict('records'))
+    ahsp_ref = cached(("ahsp",), index.ahsp_version, lambda: dict(project.ahsp_master))
+
+    divisions = []
+    n_items = 0
+    for g_idx, group in enumerate(project.rab_data):
+        subgroups = []
+        for s_idx, sub in enumerate(group.get('subgroups', [])):
+            items = sub['items']
+            n_items += len(items)
+            entry = {k: v for k, v in sub.items() if k != 'items'}
+            entry['items'] = cached(("sub", g_idx, s_idx), index.sub_version(g_idx, s_idx), lambda: items)
+            subgroups.append(entry)
+        division = {k: v for k, v in group.items() if k != 'subgroups'}
+        division['subgroups'] = subgroups
+        divisions.append({"id": group.get('id'), "title": group.get('title'),
+                          "group_total": group.get('group_total', 0), "ref": put(division)})
+
+    root = {
+        "format": FORMAT_VERSION,
+        "project_info": project.project_info,
+        "tax_settings": project.tax_settings,
+        "real_cost": real_cost,
+        "n_items": n_items,
+        "resources": resources_ref,
+        "ahsp": ahsp_ref,
+        "divisions": divisions,
+    }
+    return put(root), blobs
+
+def load_revision(root, objects):
+    """Proyek utuh dari satu revisi (sudah dihitung ulang)"""
+    import pandas as pd
+
+    tree = objects.get(root)
+    rab_data = []
+    for entry in tree['divisions']:
+        division = objects.get(entry['ref'])
+        for sub in division['subgroups']:
+            sub['items'] = objects.get(sub['items'])
+        rab_data.append(division)
+    project = Project(
+        tree['project_info'], tree['tax_settings'], pd.DataFrame(objects.get(tree['resources'])),
+        objects.get(tree['ahsp']), rab_data,
+    )
+    project.recalculate()
+    return project
+
+def reachable(root, objects):
+    """Semua digest yang dipakai satu revisi (untuk membersihkan objek yatim)"""
+    tree = objects.get(root)
+    found = {root, tree['resources'], tree['ahsp']}
+    for entry in tree['divisions']:
+        found.add(entry['ref'])
+        found.update(sub['items'] for sub in objects.get(entry['ref'])['subgroups'])
+    return found
+
+# ==========================================
+# DIFF
+# ==========================================
+@dataclass
+class RevisionDiff:
+    """Hasil diff dua revisi: item berubah, rekap per Divisi dan total proyek"""
+    items: "pd.DataFrame"
+    divisions: "pd.DataFrame"
+    totals: dict = field(default_factory=dict)
+
+    @property
+    def identical(self):
+        return self.items.empty and not self.totals.get('delta')
+
+def item_keys(items):
+    """Kunci penyejajaran item: `id` bila ada, selain itu (nama, kemunculan ke-n nama itu)"""
+    seen = {}
+    keys = []
+    for item in items:
+        base = item.get('id') or item.get('name')
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        keys.append((base, n))
+    return keys
+
+def _differs(old, new, scale):
+    # Bandingkan nilai mentah dulu; kuantisasi hanya untuk menyaring derau float
+    return old != new and quantize(old, scale) != quantize(new, scale)
+
+def _item_changed(old, new):
+    return (
+        _differs(old.get('vol'), new.get('vol'), VOL_SCALE)
+        or _differs(old.get('current_price'), new.get('current_price'), MONEY_SCALE)
+        or _differs(old.get('total_price'), new.get('total_price'), MONEY_SCALE)
+        or (old.get('ahsp') or None) != (new.get('ahsp') or None)
+        or old.get('unit') != new.get('unit')
+    )
+
+class _Differ:
+    """Mengumpulkan pasangan item (lama, baru) yang berbeda; kolom tabel dibangun sekali di frame()"""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.ctx = []
+        self.status = []
+        self.old = []
+        self.new = []
+
+    def _add(self, ctx, status, old, new):
+        self.ctx.append(ctx)
+        self.status.append(status)
+        self.old.append(old)
+        self.new.append(new)
+
+    def items(self, ctx, old_ref, new_ref, counts):
+        """Item satu Sub; ref None = Sub tidak ada di sisi itu"""
+        if old_ref == new_ref:
+            return
+        old_items = self.objects.get(old_ref) if old_ref else []
+        new_items = self.objects.get(new_ref) if new_ref else []
+        old_by_key = dict(zip(item_keys(old_items), old_items))
+        for key, item in zip(item_keys(new_items), new_items):
+            prev = old_by_key.pop(key, None)
+            if prev is None:
+                self._add(ctx, "added", _EMPTY, item)
+                counts['added'] += 1
+            elif prev != item and _item_changed(prev, item):
+                self._add(ctx, "changed", prev, item)
+                counts['changed'] += 1
+        for item in old_by_key.values():
+            self._add(ctx, "removed", item, _EMPTY)
+            counts['removed'] += 1
+
+    def frame(self):
+        import pandas as pd
+
+        def column(side, key, default=None):
+            return [item.get(key, default) for item in side]
+
+        ref = [new if status != "removed" else old for status, old, new in zip(self.status, self.old, self.new)]
+        ctx = list(zip(*self.ctx)) or [[]] * 4
+        total_old = quantize_array(np.array(column(self.old, 'total_price', 0.0), dtype=float), MONEY_SCALE)
+        total_new = quantize_array(np.array(column(self.new, 'total_price', 0.0), dtype=float), MONEY_SCALE)
+        return pd.DataFrame({
+            "divisi_id": ctx[0], "divisi": ctx[1], "sub_id": ctx[2], "sub": ctx[3],
+            "status": self.status,
+            "name": column(ref, 'name'), "unit": column(ref, 'unit'),
+            "ahsp_old": column(self.old, 'ahsp'), "ahsp_new": column(self.new, 'ahsp'),
+            "vol_old": np.array(column(self.old, 'vol', 0.0), dtype=float),
+            "vol_new": np.array(column(self.new, 'vol', 0.0), dtype=float),
+            "price_old": np.array(column(self.old, 'current_price', 0.0), dtype=float),
+            "price_new": np.array(column(self.new, 'current_price', 0.0), dtype=float),
+            "total_old": total_old / MONEY_SCALE,
+            "total_new": total_new / MONEY_SCALE,
+            "delta": (total_new - total_old) / MONEY_SCALE,
+        }, columns=list(DIFF_ITEM_COLUMNS))
+
+    def division(self, old_entry, new_entry, counts):
+        ref = new_entry or old_entry
+        old_div = self.objects.get(old_entry['ref']) if old_entry else {"subgroups": []}
+        new_div = self.objects.get(new_entry['ref']) if new_entry else {"subgroups": []}
+        old_subs = {sub.get('id'): sub for sub in old_div['subgroups']}
+        for sub in new_div['subgroups']:
+            prev = old_subs.pop(sub.get('id'), None)
+            ctx = (ref['id'], ref['title'], sub.get('id'), sub.get('title'))
+            self.items(ctx, prev['items'] if prev else None, sub['items'], counts)
+        for sub in old_subs.values():
+            self.items((ref['id'], ref['title'], sub.get('id'), sub.get('title')), sub['items'], None, counts)
+
+def diff_revisions(old_root, new_root, objects):
+    """Diff dua revisi (root digest) di `objects`; Divisi/Sub yang hash-nya sama tidak dibuka"""
+    import pandas as pd
+
+    old_tree, new_tree = objects.get(old_root), objects.get(new_root)
+    differ = _Differ(objects)
+    div_rows = []
+    old_divs = {entry['id']: entry for entry in old_tree['divisions']}
+    pairs = [(old_divs.pop(entry['id'], None), entry) for entry in new_tree['divisions']]
+    pairs += [(entry, None) for entry in old_divs.values()]
+    for old_entry, new_entry in pairs:
+        counts = {status: 0 for status in ITEM_STATUSES}
+        if old_entry is None or new_entry is None or old_entry['ref'] != new_entry['ref']:
+            differ.division(old_entry, new_entry, counts)
+        total_old = to_sen(old_entry['group_total']) if old_entry else 0
+        total_new = to_sen(new_entry['group_total']) if new_entry else 0
+        if old_entry is None:
+            status = "added"
+        elif new_entry is None:
+            status = "removed"
+        else:
+            status = "changed" if total_old != total_new or any(counts.values()) else "unchanged"
+        ref = new_entry or old_entry
+        div_rows.append((ref['id'], ref['title'], status, from_sen(total_old), from_sen(total_new),
+                         from_sen(total_new - total_old), counts['added'], counts['removed'], counts['changed']))
+
+    totals = {}
+    for side, tree in (("old", old_tree), ("new", new_tree)):
+        totals[f"real_cost_{side}"] = tree['real_cost']
+        totals[f"grand_total_{side}"] = apply_tax(tree['real_cost'], tree['tax_settings'])[2]
+    totals['delta'] = from_sen(to_sen(totals['real_cost_new']) - to_sen(totals['real_cost_old']))
+    totals['grand_delta'] = from_sen(to_sen(totals['grand_total_new']) - to_sen(totals['grand_total_old']))
+    return RevisionDiff(
+        items=differ.frame(),
+        divisions=pd.DataFrame(div_rows, columns=list(DIFF_DIVISION_COLUMNS)),
+        totals=totals,
+    )
+
+# ==========================================
+# RIWAYAT REVISI
+# ==========================================
+class RevisionHistory:
+    """Daftar revisi satu proyek di atas sebuah object store.
+
+    `objects` cukup menyediakan get(digest) dan put_many({digest: data}):
+    ObjectStore (memori) atau rab_store.SqliteObjects (persisten). Revisi berupa
+    dict: rev, label, root, real_cost, n_items, created_at.
+    """
+
+    def __init__(self, objects=None, revisions=None):
+        self.objects = ObjectStore() if objects is None else objects
+        self.revisions = list(revisions or [])
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.revisions)
+
+    def revision(self, rev):
+        for revision in self.revisions:
+            if revision['rev'] == rev:
+                return revision
+        raise KeyError(f"Revisi {rev} tidak ada")
+
+    def commit(self, project, label=""):
+        """Simpan proyek sebagai revisi baru; hanya objek yang belum ada yang ditulis"""
+        root, blobs = snapshot(project, self._cache)
+        self.objects.put_many(blobs)
+        tree = decode_object(blobs[root])
+        revision = {
+            "rev": self.revisions[-1]['rev'] + 1 if self.revisions else 1,
+            "label": label or f"Revisi {len(self.revisions) + 1}",
+            "root": root,
+            "real_cost": tree['real_cost'],
+            "n_items": tree['n_items'],
+            "created_at": time.time(),
+        }
+        self.revisions.append(revision)
+        return revision
+
+    def checkout(self, rev):
+        """Proyek dari satu revisi (salinan baru, tidak berbagi objek dengan sesi)"""
+        return load_revision(self.revision(rev)['root'], self.objects)
+
+    def diff(self, old_rev, new=None):
+        """Diff revisi `old_rev` terhadap revisi lain (nomor rev) atau Project yang sedang diedit"""
+        old_root = self.revision(old_rev)['root']
+        if isinstance(new, Project):
+            new_root, pending = snapshot(new, self._cache)
+            return diff_revisions(old_root, new_root, _Overlay(pending, self.objects))
+        return diff_revisions(old_root, self.revision(new)['root'], self.objects)
@@ -0,0 +1,362 @@
+"""RAB IO: import file proyek JSON secara streaming & tervalidasi.
+
+File dibaca per potongan (chunk) lalu diurai per elemen: setiap item RAB,
+setiap resep AHSP dan setiap baris resource didekode satu per satu, jadi
+memori puncak ~ ukuran model proyek + satu chunk, bukan beberapa kali ukuran
+file. Skema diperiksa sambil jalan; kesalahan langsung dilaporkan lengkap
+dengan path data (misal `rab_data[2].subgroups[0].items[15].vol`) serta
+baris & kolom di file.
+"""
+import json
+
+from rab_engine import AhspCycleError, Project, ahsp_order
+
+REQUIRED_KEYS = ("project_info", "tax_settings", "resources", "ahsp_master", "rab_data")
+RESOURCE_COLUMNS = ("id", "category", "name", "unit", "price")
+MAX_WARNINGS = 50
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',:]}'
+_LITERALS = ('true', 'false', 'null', 'NaN', 'Infinity', '-Infinity')
+
+class ProjectImportError(ValueError):
+    """File proyek tidak valid; menyimpan path data dan posisi (baris, kolom) di file"""
+
+    def __init__(self, message, path="", line=None, column=None):
+        self.message = message
+        self.path = path
+        self.line = line
+        self.column = column
+        location = f" (baris {line}, kolom {column})" if line is not None else ""
+        super().__init__(f"{path}: {message}{location}" if path else f"{message}{location}")
+
+class _JsonStream:
+    """Pembaca JSON inkremental di atas file teks (hanya menahan satu jendela buffer)"""
+
+    def __init__(self, fp, total_size=None, progress=None, chunk_size=1 << 16, max_element=1 << 24):
+        self.fp = fp
+        self.total_size = total_size
+        self.progress = progress
+        self.chunk_size = chunk_size
+        self.max_element = max_element
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        # Posisi awal buffer di file (untuk pelaporan baris/kolom & progres)
+        self.consumed = 0
+        self.line = 1
+        self.col_base = 0
+
+    def _fill(self):
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+
+        # Buang bagian buffer yang sudah diproses
+        done = self.buf[:self.pos]
+        n_lines = done.count('\n')
+        if n_lines:
+            self.line += n_lines
+            self.col_base = len(done) - done.rfind('\n') - 1
+        else:
+            self.col_base += len(done)
+        self.consumed += self.pos
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+        if self.progress and self.total_size:
+            self.progress(min(1.0, (self.consumed + len(self.buf)) / self.total_size))
+        return True
+
+    def tell(self):
+        """Posisi absolut (karakter) di file"""
+        return self.consumed + self.pos
+
+    def start(self):
+        """Posisi absolut awal nilai berikutnya (setelah spasi)"""
+        self.peek()
+        return self.tell()
+
+    def location(self, at=None):
+        # Posisi yang sudah dibuang dari buffer -> pakai posisi sekarang
+        pos = at - self.consumed if at is not None and at >= self.consumed else self.pos
+        line = self.line + self.buf.count('\n', 0, pos)
+        nl = self.buf.rfind('\n', 0, pos)
+        column = pos - nl if nl >= 0 else self.col_base + pos + 1
+        return line, column
+
+    def error(self, message, path, at=None):
+        line, column = self.location(at)
+        return ProjectImportError(message, path, line, column)
+
+    def peek(self):
+        """Karakter non-spasi berikutnya ('' bila EOF), tanpa mengonsumsinya"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char, path):
+        if self.peek() != char:
+            found = self.buf[self.pos] if self.pos < len(self.buf) else "akhir file"
+            raise self.error(f"diharapkan '{char}', ditemukan '{found}'", path)
+        self.pos += 1
+
+    def _truncated(self, err):
+        """Error dekode karena input habis di ujung buffer, bukan karena isi yang rusak"""
+        if err.pos >= len(self.buf) - 1 or err.msg.startswith("Unterminated string"):
+            return True
+        # Literal / escape \uXXXX yang terpotong ("tru", "-Infin", "\ud83d\ude0") melapor di awalnya
+        rest = self.buf[err.pos:]
+        if err.msg.startswith("Invalid \\uXXXX escape"):
+            return len(rest) <= len("uXXXX\\uXXXX")
+        return any(lit.startswith(rest) for lit in _LITERALS)
+
+    def value(self, path):
+        """Mendekode satu nilai JSON utuh di posisi sekarang"""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # Hanya error di ujung buffer (elemen terpotong di batas chunk) yang dibaca
+                # lagi; error di tengah buffer berarti JSON rusak -> langsung gagal
+                if (not self._truncated(e) or self.eof
+                        or len(self.buf) - self.pos > self.max_element or not self._fill()):
+                    raise self.error(f"JSON rusak: {e.msg}", path, self.consumed + e.pos) from None
+                continue
+            # Angka/literal bisa terpotong di batas chunk ("12" dari "12.5"):
+            # baru dianggap utuh bila sudah diikuti pemisah
+            if (not isinstance(obj, (str, dict, list)) and not self.eof
+                    and (end == len(self.buf) or self.buf[end] not in _DELIMITERS) and self._fill()):
+                continue
+            self.pos = end
+            return obj
+
+    def _members(self, open_char, close_char, path):
+        self.expect(open_char, path)
+        if self.peek() == close_char:
+            self.pos += 1
+            return
+        while True:
+            yield
+            sep = self.peek()
+            if sep == ',':
+                self.pos += 1
+            elif sep == close_char:
+                self.pos += 1
+                return
+            else:
+                raise self.error(f"diharapkan ',' atau '{close_char}'", path)
+
+    def iter_object(self, path):
+        """Menghasilkan key satu per satu; pemanggil WAJIB membaca nilainya sebelum lanjut"""
+        for _ in self._members('{', '}', path):
+            key_at = self.start()
+            key = self.value(path)
+            if not isinstance(key, str):
+                raise self.error("key objek harus string", path, key_at)
+            self.expect(':', path)
+            yield key
+
+    def iter_array(self, path):
+        """Menghasilkan indeks elemen; pemanggil WAJIB membaca elemennya sebelum lanjut"""
+        for idx, _ in enumerate(self._members('[', ']', path)):
+            yield idx
+
+# ==========================================
+# VALIDASI SKEMA
+# ==========================================
+def _is_number(val):
+    return isinstance(val, (int, float)) and not isinstance(val, bool)
+
+class _Importer:
+    def __init__(self, stream):
+        self.s = stream
+        self.warnings = []
+        self.n_warnings = 0
+        self.res_ids = None
+        self.ahsp_ids = None
+        # Referensi yang target-nya belum terbaca (urutan key di file tidak standar).
+        # Komponen AHSP selalu ditunda: bisa resource atau sub-analisa (AHSP lain)
+        self.pending_comp_refs = []
+        self.pending_ahsp_refs = []
+
+    def warn(self, message):
+        self.n_warnings += 1
+        if len(self.warnings) < MAX_WARNINGS:
+            self.warnings.append(message)
+
+    def check_type(self, obj, kind, path, at):
+        if not isinstance(obj, kind):
+            expected = "objek" if kind is dict else "list"
+            raise self.s.error(f"harus berupa {expected}", path, at)
+
+    def check_fields(self, obj, path, at, required=(), numbers=(), strings=()):
+        for key in required:
+            if key not in obj:
+                raise self.s.error(f"field '{key}' wajib ada", path, at)
+        for key in numbers:
+            if key in obj and not _is_number(obj[key]):
+                raise self.s.error(f"field '{key}' harus berupa angka, bukan {obj[key]!r}", f"{path}.{key}", at)
+        for key in strings:
+            if key in obj and obj[key] is not None and not isinstance(obj[key], str):
+                raise self.s.error(f"field '{key}' harus berupa teks, bukan {obj[key]!r}", f"{path}.{key}", at)
+
+    # --- Bagian file ---
+    def read_dict(self, path, numbers=()):
+        at = self.s.start()
+        obj = self.s.value(path)
+        self.check_type(obj, dict, path, at)
+        self.check_fields(obj, path, at, required=numbers, numbers=numbers)
+        return obj
+
+    def read_resources(self):
+        """Resource disusun per kolom (bukan list of dict) lalu langsung jadi DataFrame"""
+        import pandas as pd
+
+        columns = {col: [] for col in RESOURCE_COLUMNS}
+        n_rows = 0
+        for idx in self.s.iter_array("resources"):
+            path = f"resources[{idx}]"
+            at = self.s.start()
+            row = self.s.value(path)
+            self.check_type(row, dict, path, at)
+            self.check_fields(row, path, at, required=("id", "price"), numbers=("price",), strings=("id",))
+            for key in row.keys() - columns.keys():
+                columns[key] = [None] * n_rows
+            for key, col in columns.items():
+                col.append(row.get(key))
+            n_rows += 1
+
+        self.res_ids = set(columns['id'])
+        self.check_components()
+        return pd.DataFrame(columns)
+
+    def read_ahsp_master(self):
+        ahsp_master = {}
+        for ahsp_id in self.s.iter_object("ahsp_master"):
+            path = f"ahsp_master[{ahsp_id!r}]"
+            at = self.s.start()
+            recipe = self.s.value(path)
+            self.check_type(recipe, dict, path, at)
+            self.check_fields(recipe, path, at, required=("name", "unit", "components"), strings=("name", "unit"))
+            self.check_type(recipe['components'], list, f"{path}.components", at)
+            for c_idx, comp in enumerate(recipe['components']):
+                c_path = f"{path}.components[{c_idx}]"
+                self.check_type(comp, dict, c_path, at)
+                self.check_fields(comp, c_path, at, required=("id", "coef"), numbers=("coef",), strings=("id",))
+                self.pending_comp_refs.append((c_path, comp['id']))
+            ahsp_master[ahsp_id] = recipe
+
+        self.ahsp_ids = set(ahsp_master)
+        self.check_components()
+        for path, ahsp_id in self.pending_ahsp_refs:
+            self.check_ref(ahsp_id, self.ahsp_ids, "AHSP", path)
+        self.pending_ahsp_refs = []
+        return ahsp_master
+
+    def read_items(self, path):
+        items = []
+        for idx in self.s.iter_array(path):
+            i_path = f"{path}[{idx}]"
+            at = self.s.start()
+            item = self.s.value(i_path)
+            self.check_type(item, dict, i_path, at)
+            self.check_fields(
+                item, i_path, at, required=("vol",), numbers=("vol", "manual_price", "start", "duration"),
+                strings=("name", "unit", "ahsp", "profile"),
+            )
+            if item.get('ahsp'):
+                self.ref(item['ahsp'], self.ahsp_ids, self.pending_ahsp_refs, "AHSP", i_path)
+            items.append(item)
+        return items
+
+    def read_container(self, path, child_key, read_child):
+        """Objek Divisi / Sub: field biasa didekode utuh, anak (child_key) dibaca streaming"""
+        at = self.s.start()
+        obj = {}
+        for key in self.s.iter_object(path):
+            obj[key] = read_child(f"{path}.{key}") if key == child_key else self.s.value(f"{path}.{key}")
+        self.check_fields(obj, path, at, required=("id", "title", child_key), numbers=("start", "duration"),
+                          strings=("id", "title", "profile"))
+        return obj
+
+    def read_subgroups(self, path):
+        return [
+            self.read_container(f"{path}[{idx}]", "items", self.read_items)
+            for idx in self.s.iter_array(path)
+        ]
+
+    def read_rab_data(self):
+        return [
+            self.read_container(f"rab_data[{idx}]", "subgroups", self.read_subgroups)
+            for idx in self.s.iter_array("rab_data")
+        ]
+
+    # --- Referensi ---
+    def ref(self, target_id, known, pending, kind, path):
+        if known is None:
+            pending.append((path, target_id))
+        else:
+            self.check_ref(target_id, known, kind, path)
+
+    def check_ref(self, target_id, known, kind, path):
+        # Referensi hilang tidak fatal (engine memakai harga 0 / harga manual), cukup diperingatkan
+        if target_id not in known:
+            self.warn(f"{path}: {kind} '{target_id}' tidak ditemukan")
+
+    def check_components(self):
+        """Komponen AHSP dicek setelah resources DAN ahsp_master terbaca"""
+        if self.res_ids is None or self.ahsp_ids is None:
+            return
+        known = self.res_ids | self.ahsp_ids
+        for path, comp_id in self.pending_comp_refs:
+            self.check_ref(comp_id, known, "resource/AHSP", path)
+        self.pending_comp_refs = []
+
+    def read_project(self):
+        parts = {}
+        readers = {
+            "project_info": lambda: self.read_dict("project_info"),
+            "tax_settings": lambda: self.read_dict("tax_settings", numbers=("profit", "ppn")),
+            "resources": self.read_resources,
+            "ahsp_master": self.read_ahsp_master,
+            "rab_data": self.read_rab_data,
+        }
+        for key in self.s.iter_object("$"):
+            if key in readers:
+                parts[key] = readers[key]()
+            else:
+                self.s.value(key)
+                self.warn(f"key '{key}' tidak dikenal, diabaikan")
+
+        if self.s.peek() != "":
+            raise self.s.error("ada data setelah akhir objek JSON", "$")
+        missing = [key for key in REQUIRED_KEYS if key not in parts]
+        if missing:
+            raise ProjectImportError(f"bagian wajib tidak ada: {', '.join(missing)}", "$")
+        try:
+            ahsp_order(parts['ahsp_master'], self.res_ids)
+        except AhspCycleError as e:
+            # Siklus sub-analisa membuat harga tidak terdefinisi: fatal, bukan peringatan
+            raise ProjectImportError(str(e), "ahsp_master") from None
+        return Project(**parts)
+
+def load_project_stream(fp, total_size=None, progress=None, chunk_size=1 << 16):
+    """Import file proyek JSON dari file teks `fp` secara streaming.
+
+    `progress(fraksi)` dipanggil setiap chunk terbaca bila `total_size` diketahui.
+    Mengembalikan (Project, daftar_peringatan); melempar ProjectImportError bila file
+    rusak atau tidak sesuai skema.
+    """
+    importer = _Importer(_JsonStream(fp, total_size, progress, chunk_size))
+    project = importer.read_project()
+    if importer.n_warnings > len(importer.warnings):
+        importer.warnings.append(f"... dan {importer.n_warnings - len(importer.warnings)} peringatan lainnya")
+    return project, importer.warnings
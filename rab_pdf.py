@@ -0,0 +1,184 @@
+"""RAB PDF: laporan PDF lengkap (rekap, rincian item, lampiran AHSP).
+
+Tabel dipotong otomatis per halaman (auto page break FPDF) dan judul kolom
+tabel yang sedang ditulis diulang di setiap halaman baru lewat header().
+Modul ini headless: tidak memakai session state, jadi aman dijalankan di
+thread/proses worker. Progres dilaporkan lewat callback `progress(frac)`.
+"""
+from fpdf import FPDF
+
+# (judul, lebar mm, perataan); lebar total 190 mm = A4 dikurangi margin
+REKAP_COLUMNS = (("NO", 15, 'C'), ("URAIAN PEKERJAAN", 120, 'L'), ("JUMLAH (Rp)", 55, 'R'))
+RAB_COLUMNS = (
+    ("NO", 10, 'C'), ("URAIAN PEKERJAAN", 70, 'L'), ("SAT", 12, 'C'), ("VOLUME", 18, 'R'),
+    ("KODE AHSP", 22, 'C'), ("HARGA SAT.", 28, 'R'), ("JUMLAH (Rp)", 30, 'R'),
+)
+AHSP_COLUMNS = (
+    ("KODE", 20, 'C'), ("URAIAN", 70, 'L'), ("SAT", 15, 'C'), ("KOEF", 20, 'R'),
+    ("HARGA SAT.", 30, 'R'), ("JUMLAH (Rp)", 35, 'R'),
+)
+ROW_H = 6
+PROGRESS_EVERY = 200  # baris per laporan progres
+
+def _latin1(text):
+    # Font inti FPDF hanya mendukung latin-1; karakter lain diganti '?'
+    return str(text).encode('latin-1', 'replace').decode('latin-1')
+
+def _money(val):
+    return f"{val:,.0f}"
+
+class PDFReport(FPDF):
+    def __init__(self, project_info):
+        super().__init__()
+        self.project_info = project_info
+        self.section = "REKAPITULASI RAB"
+        self.columns = None  # judul kolom tabel aktif, diulang di tiap halaman
+        self.alias_nb_pages()
+        self.set_auto_page_break(True, margin=20)
+
+    def header(self):
+        self.set_font('Arial', 'B', 14)
+        self.cell(0, 10, _latin1(f"{self.section}: {self.project_info.get('name', '').upper()}"), 0, 1, 'C')
+        self.set_font('Arial', 'I', 10)
+        self.cell(0, 10, _latin1(f"Lokasi: {self.project_info.get('location', '')} | Owner: {self.project_info.get('owner', '')}"), 0, 1, 'C')
+        self.line(10, 30, 200, 30)
+        self.ln(10)
+        if self.columns:
+            self.table_header()
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Page {self.page_no()}/{{nb}}', 0, 0, 'C')
+
+    def table_header(self):
+        self.set_fill_color(240, 240, 240)
+        self.set_font("Arial", 'B', 9)
+        for title, width, _ in self.columns:
+            self.cell(width, 8, title, 1, 0, 'C', 1)
+        self.ln()
+
+    def start_table(self, section, columns, new_page=True):
+        self.section = section
+        self.columns = columns
+        if new_page:
+            self.add_page()
+        else:
+            self.table_header()
+
+    def row(self, values, style='', h=ROW_H, fill=False):
+        """Satu baris tabel aktif; teks yang terlalu panjang dipotong sesuai lebar kolom"""
+        self.set_font("Arial", style, 9)
+        for (_, width, align), val in zip(self.columns, values):
+            self.cell(width, h, self.fit(val, width), 1, 0, align, fill)
+        self.ln()
+
+    def fit(self, text, width):
+        text = _latin1("" if text is None or text != text else text)  # None / NaN
+        if self.get_string_width(text) <= width - 2:
+            return text
+        while text and self.get_string_width(text + "..") > width - 2:
+            text = text[:-1]
+        return text + ".."
+
+    def space_left(self):
+        return self.page_break_trigger - self.get_y()
+
+def _used_ahsp(project):
+    """Kode AHSP yang dipakai item (termasuk sub-analisanya), urut sesuai ahsp_master"""
+    master = project.ahsp_master
+    stack = [item.get('ahsp') for group in project.rab_data for sub in group.get('subgroups', []) for item in sub['items']]
+    used = set()
+    while stack:
+        ahsp_id = stack.pop()
+        if ahsp_id in master and ahsp_id not in used:
+            used.add(ahsp_id)
+            stack.extend(comp['id'] for comp in master[ahsp_id]['components'])
+    return [ahsp_id for ahsp_id in master if ahsp_id in used]
+
+def build_pdf(project, progress=None):
+    """Membuat PDF laporan RAB lengkap; mengembalikan bytes"""
+    real_cost, profit, ppn, final_total, _ = project.totals()
+    tax = project.tax_settings
+    ahsp_ids = _used_ahsp(project)
+    n_items = sum(len(sub['items']) for group in project.rab_data for sub in group.get('subgroups', []))
+    n_rows = max(1, n_items + sum(len(project.ahsp_master[a]['components']) for a in ahsp_ids))
+    done = 0
+
+    def step(n=1):
+        nonlocal done
+        done += n
+        if progress and done % PROGRESS_EVERY < n:
+            progress(min(done / n_rows, 1.0))
+
+    pdf = PDFReport(project.project_info)
+
+    # --- Rekap ---
+    pdf.start_table("REKAPITULASI RAB", REKAP_COLUMNS)
+    for group in project.rab_data:
+        pdf.row([group['id'], group['title'], _money(group['group_total'])], 'B', h=8)
+        for sub in group.get('subgroups', []):
+            pdf.row(["", f"  > {sub['title']}", _money(sub['sub_total'])], 'I')
+    pdf.columns = None
+    pdf.ln(5)
+    pdf.set_font("Arial", 'B', 10)
+    for label, val in (
+        ("REAL COST (FISIK)", real_cost), (f"PROFIT ({tax['profit']}%)", profit), (f"PPN ({tax['ppn']}%)", ppn),
+    ):
+        pdf.cell(135, 8, label, 1, 0, 'R')
+        pdf.cell(55, 8, _money(val), 1, 1, 'R')
+    pdf.set_fill_color(230, 240, 255)
+    pdf.cell(135, 10, "GRAND TOTAL", 1, 0, 'R', 1)
+    pdf.cell(55, 10, _money(final_total), 1, 1, 'R', 1)
+
+    # --- Rincian item ---
+    pdf.start_table("RINCIAN RAB", RAB_COLUMNS)
+    for group in project.rab_data:
+        pdf.row([group['id'], group['title'], "", "", "", "", ""], 'B')
+        for sub in group.get('subgroups', []):
+            pdf.row(["", sub['title'], "", "", "", "", ""], 'I')
+            for no, item in enumerate(sub['items'], start=1):
+                pdf.row([
+                    no, item.get('name'), item.get('unit'), f"{item['vol']:,.2f}", item.get('ahsp') or "-",
+                    _money(item['current_price']), _money(item['total_price']),
+                ])
+                step()
+            pdf.row(["", f"Sub Total {sub['title']}", "", "", "", "", _money(sub['sub_total'])], 'B')
+        pdf.set_fill_color(230, 240, 255)
+        pdf.row(["", f"TOTAL {group['id']}. {group['title']}", "", "", "", "", _money(group['group_total'])], 'B', fill=True)
+
+    # --- Lampiran AHSP ---
+    if ahsp_ids:
+        records = project.index.res_maps.records
+        pdf.start_table("LAMPIRAN ANALISA HARGA SATUAN", AHSP_COLUMNS)
+        first = True
+        for ahsp_id in ahsp_ids:
+            recipe = project.ahsp_master[ahsp_id]
+            block_h = (len(recipe['components']) + 3) * ROW_H
+            # Satu analisa tidak dipecah ke dua halaman bila muat di satu halaman
+            if not first and block_h > pdf.space_left() and block_h < pdf.page_break_trigger - 40:
+                pdf.add_page()
+            elif not first:
+                pdf.ln(3)
+                pdf.table_header()
+            first = False
+            pdf.set_fill_color(245, 245, 245)
+            pdf.row([ahsp_id, recipe['name'], recipe['unit'], "", "", ""], 'B', fill=True)
+            total = 0
+            for comp in recipe['components']:
+                rec = records.get(comp['id'])
+                if rec is not None:
+                    name, unit, price = rec.get('name'), rec.get('unit'), rec['price']
+                elif comp['id'] in project.ahsp_master:
+                    sub = project.ahsp_master[comp['id']]
+                    name, unit, price = f"[Analisa] {sub['name']}", sub['unit'], project.index.ahsp_prices.get(comp['id'], 0)
+                else:
+                    name, unit, price = "(tidak ada di database)", "", 0
+                total += price * comp['coef']
+                pdf.row([comp['id'], name, unit, f"{comp['coef']:.4f}", _money(price), _money(price * comp['coef'])])
+            step(len(recipe['components']))
+            pdf.row(["", "HARGA SATUAN PEKERJAAN", "", "", "", _money(project.index.ahsp_prices.get(ahsp_id, total))], 'B')
+
+    if progress:
+        progress(1.0)
+    return pdf.output(dest='S').encode('latin-1')
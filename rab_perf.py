@@ -0,0 +1,151 @@
+"""RAB PERF: instrumentasi waktu & counter per rerun (headless).
+
+Pemakaian:
+    recorder = PerfRecorder(history=20, log_path="perf.log")
+    recorder.enabled = True
+    activate(recorder)             # recorder aktif untuk thread ini
+    recorder.start_run("Dashboard")
+    ...
+    recorder.lap("init_state")       # waktu sejak lap sebelumnya
+    with phase("chart"):             # blok tertentu (boleh bersarang di dalam lap)
+        ...
+    count("items_priced", n)
+    recorder.finish_run()
+
+`phase()` dan `count()` adalah fungsi modul: kode engine cukup memanggilnya
+tanpa tahu ada recorder atau tidak. Bila tidak ada recorder aktif / recorder
+dimatikan, `phase()` mengembalikan context no-op bersama dan `count()` langsung
+kembali, jadi biaya saat nonaktif hanya satu lookup atribut.
+"""
+import json
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+_NOOP = nullcontext()
+_local = threading.local()
+
+class _Phase:
+    __slots__ = ("run", "name", "start")
+
+    def __init__(self, run, name):
+        self.run = run
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        phases = self.run['phases']
+        phases[self.name] = phases.get(self.name, 0.0) + (time.perf_counter() - self.start) * 1000
+
+class PerfRecorder:
+    """Catatan kinerja beberapa rerun terakhir (ms per fase + counter)"""
+
+    def __init__(self, history=20, log_path=None):
+        self.enabled = False
+        self.history = deque(maxlen=history)
+        self.background = deque(maxlen=history)
+        self.log_path = log_path
+        self.current = None
+        self.n_runs = 0
+
+    def start_run(self, label="", stage="script"):
+        """Mulai rerun baru.
+
+        Callback widget berjalan sebelum script pada rerun yang sama: run yang dibuka
+        callback (stage="callback") diteruskan oleh script, bukan ditutup. Run lain yang
+        masih terbuka berarti script sebelumnya terputus (st.rerun) dan ditutup lebih dulu.
+        """
+        run = self.current
+        if run is not None and run['stage'] == "callback":
+            if stage == "script":
+                run['stage'], run['label'] = stage, label
+            return
+        if run is not None:
+            self.finish_run(interrupted=True)
+        if not self.enabled:
+            return
+        self.n_runs += 1
+        now = time.perf_counter()
+        self.current = {
+            "run": self.n_runs, "label": label, "stage": stage, "started": time.time(), "t0": now, "lap": now,
+            "phases": {}, "counters": {},
+        }
+
+    def lap(self, name):
+        """Waktu sejak lap sebelumnya (atau awal run) dicatat sebagai fase `name`"""
+        run = self.current
+        if run is not None:
+            now = time.perf_counter()
+            run['phases'][name] = run['phases'].get(name, 0.0) + (now - run['lap']) * 1000
+            run['lap'] = now
+
+    def note(self, name, ms):
+        """Pekerjaan di luar rerun (misal export di thread download) dicatat terpisah"""
+        if self.enabled:
+            self.background.append({"time": time.time(), "name": name, "ms": ms})
+
+    def finish_run(self, interrupted=False):
+        run, self.current = self.current, None
+        if run is None:
+            return None
+        run['total_ms'] = (time.perf_counter() - run.pop('t0')) * 1000
+        del run['lap'], run['stage']
+        run['interrupted'] = interrupted
+        self.history.append(run)
+        if self.log_path:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(run) + "\n")
+        return run
+
+    def phase(self, name):
+        if self.current is None:
+            return _NOOP
+        return _Phase(self.current, name)
+
+    def count(self, name, n=1):
+        if self.current is not None:
+            counters = self.current['counters']
+            counters[name] = counters.get(name, 0) + n
+
+    def to_frame(self):
+        """Riwayat rerun sebagai DataFrame: total, satu kolom per fase (ms) dan per counter"""
+        import pandas as pd
+
+        rows = []
+        for run in reversed(self.history):
+            row = {"run": run['run'], "label": run['label'], "total_ms": run['total_ms'], "interrupted": run['interrupted']}
+            row.update({f"{name} (ms)": ms for name, ms in run['phases'].items()})
+            row.update(run['counters'])
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def export_log(self):
+        """Riwayat sebagai JSON Lines (satu rerun per baris)"""
+        return "".join(json.dumps(run) + "\n" for run in self.history)
+
+def activate(recorder):
+    """Pasang recorder untuk thread ini (setiap sesi Streamlit berjalan di thread-nya sendiri)"""
+    _local.recorder = recorder
+
+def phase(name):
+    """Context pengukur waktu satu fase pada recorder aktif (no-op bila tidak ada)"""
+    recorder = getattr(_local, 'recorder', None)
+    if recorder is None:
+        return _NOOP
+    return recorder.phase(name)
+
+def lap(name):
+    """Lap pada recorder aktif (no-op bila tidak ada)"""
+    recorder = getattr(_local, 'recorder', None)
+    if recorder is not None:
+        recorder.lap(name)
+
+def count(name, n=1):
+    """Tambah counter pada recorder aktif (no-op bila tidak ada)"""
+    recorder = getattr(_local, 'recorder', None)
+    if recorder is not None:
+        recorder.count(name, n)
@@ -0,0 +1,194 @@
+"""RAB RISK: simulasi Monte Carlo risiko biaya & sensitivitas harga resource.
+
+Total fisik proyek linear terhadap harga resource:
+    real_cost = biaya_manual + Σ kebutuhan_r × harga_r
+(kebutuhan_r dari rab_engine.resource_demand). Jadi ribuan skenario harga
+cukup dihitung sebagai matriks skenario × driver dikali vektor eksposur,
+tanpa menghitung ulang struktur AHSP / RAB per skenario.
+
+Spesifikasi distribusi (persen perubahan harga terhadap harga database):
+    {"target": "M.08",  "dist": "triangular", "low": -10, "mode": 0, "high": 25}
+    {"target": "Upah",  "dist": "uniform",    "low": -5,  "high": 10}
+    {"target": "L.*",   "dist": "normal",     "mode": 0,  "sd": 5, "per_resource": True}
+`target` berupa id resource, nama kategori, atau pola id (fnmatch). Resource
+yang cocok dengan satu spesifikasi bergerak bersama (satu undian per skenario),
+kecuali `per_resource` True (undian independen per resource). Bila satu
+resource cocok dengan beberapa spesifikasi, yang terakhir yang dipakai.
+"""
+import fnmatch
+
+import numpy as np
+
+from rab_engine import resource_demand, tax_factor
+
+DISTRIBUTIONS = ("triangular", "uniform", "normal")
+PERCENTILES = (10, 50, 90)
+
+def _match(target, ids, categories):
+    """Index resource yang cocok dengan target: id persis, kategori, atau pola id"""
+    target = str(target).strip()
+    if target in ids:
+        return [i for i, res_id in enumerate(ids) if res_id == target]
+    lowered = target.lower()
+    by_category = [i for i, cat in enumerate(categories) if str(cat).lower() == lowered]
+    if by_category:
+        return by_category
+    return [i for i, res_id in enumerate(ids) if fnmatch.fnmatchcase(str(res_id), target)]
+
+def _check_spec(spec):
+    dist = spec.get('dist', 'triangular')
+    if dist not in DISTRIBUTIONS:
+        raise ValueError(f"Distribusi '{dist}' tidak dikenal (pilih: {', '.join(DISTRIBUTIONS)})")
+    if dist == 'normal':
+        if spec.get('sd', 0) < 0:
+            raise ValueError(f"{spec['target']}: simpangan baku (sd) tidak boleh negatif")
+    else:
+        low, high = spec.get('low', 0), spec.get('high', 0)
+        mode = spec.get('mode', (low + high) / 2)
+        if not low <= high or (dist == 'triangular' and not low <= mode <= high):
+            raise ValueError(f"{spec['target']}: harus low <= mode <= high")
+    return dist
+
+def _sample(rng, spec, size):
+    """Undian perubahan harga (fraksi, misal 0.1 = naik 10%)"""
+    dist = spec.get('dist', 'triangular')
+    low, high = spec.get('low', 0), spec.get('high', 0)
+    if dist == 'normal':
+        draws = rng.normal(spec.get('mode', 0), spec.get('sd', 0), size)
+    elif low == high:
+        draws = np.full(size, float(low))
+    elif dist == 'uniform':
+        draws = rng.uniform(low, high, size)
+    else:
+        draws = rng.triangular(low, spec.get('mode', (low + high) / 2), high, size)
+    # Harga tidak bisa turun lebih dari 100%
+    return np.maximum(draws, -100.0) / 100.0
+
+def build_drivers(project, specs):
+    """Memetakan spesifikasi ke driver acak.
+
+    Mengembalikan (drivers, exposure): drivers = list (label, spec, [index resource]),
+    exposure = biaya fisik (Rp) yang dipengaruhi tiap resource (kebutuhan × harga).
+    """
+    res = project.resources
+    ids = res['id'].tolist()
+    categories = res['category'].tolist() if 'category' in res.columns else [None] * len(ids)
+    exposure = resource_demand(project.rab_data, project.ahsp_master, res) * res['price'].to_numpy(dtype=float)
+
+    owner = {}
+    for s_idx, spec in enumerate(specs):
+        _check_spec(spec)
+        matched = _match(spec['target'], ids, categories)
+        if not matched:
+            raise ValueError(f"Target '{spec['target']}' tidak cocok dengan resource mana pun")
+        for i in matched:
+            owner[i] = s_idx
+
+    drivers = []
+    for s_idx, spec in enumerate(specs):
+        members = sorted(i for i, owner_idx in owner.items() if owner_idx == s_idx)
+        if not members:
+            continue
+        if spec.get('per_resource'):
+            drivers.extend((ids[i], spec, [i]) for i in members)
+        else:
+            drivers.append((str(spec['target']), spec, members))
+    return drivers, exposure
+
+def simulate_cost_risk(project, specs, n_scenarios=10000, seed=None, chunk_size=2000):
+    """Monte Carlo Grand Total (termasuk Profit & PPN) atas skenario harga acak.
+
+    Mengembalikan dict:
+        totals       - array Grand Total per skenario
+        base         - Grand Total deterministik (harga database)
+        percentiles  - {10: P10, 50: P50, 90: P90}
+        drivers      - DataFrame sensitivitas per driver (eksposur, dampak P10/P90, korelasi)
+    """
+    import pandas as pd
+
+    real_cost = project.totals()[0]
+    # Profit & PPN linear terhadap biaya fisik: Grand Total = faktor × real_cost
+    factor = tax_factor(project.tax_settings)
+    drivers, exposure = build_drivers(project, specs)
+    driver_exposure = np.array([exposure[members].sum() for _, _, members in drivers], dtype=float)
+
+    # Driver berurutan per spesifikasi -> satu undian (size, k) per blok spesifikasi
+    blocks = []
+    for d, (_, spec, _) in enumerate(drivers):
+        if blocks and blocks[-1][0] is spec:
+            blocks[-1][2] = d + 1
+        else:
+            blocks.append([spec, d, d + 1])
+
+    rng = np.random.default_rng(seed)
+    n_drivers = len(drivers)
+    totals = np.empty(n_scenarios)
+    # Statistik berjalan untuk korelasi driver vs total (tanpa menyimpan seluruh matriks)
+    sum_x = np.zeros(n_drivers)
+    sum_xx = np.zeros(n_drivers)
+    sum_xy = np.zeros(n_drivers)
+    for start in range(0, n_scenarios, chunk_size):
+        size = min(chunk_size, n_scenarios - start)
+        # Matriks skenario × driver berisi fraksi perubahan harga
+        shocks = np.empty((size, n_drivers))
+        for spec, first, last in blocks:
+            shocks[:, first:last] = _sample(rng, spec, (size, last - first))
+        chunk_totals = (real_cost + shocks @ driver_exposure) * factor
+        totals[start:start + size] = chunk_totals
+        sum_x += shocks.sum(axis=0)
+        sum_xx += (shocks * shocks).sum(axis=0)
+        sum_xy += shocks.T @ chunk_totals
+
+    # Korelasi Pearson tiap driver dengan Grand Total
+    mean_x = sum_x / n_scenarios
+    mean_y = totals.mean()
+    cov = sum_xy / n_scenarios - mean_x * mean_y
+    var_x = sum_xx / n_scenarios - mean_x ** 2
+    std_y = totals.std()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = np.where((var_x > 1e-18) & (std_y > 0), cov / np.sqrt(np.maximum(var_x, 1e-18)) / std_y, 0.0)
+
+    # Dampak driver sendirian (driver lain di harga dasar) pada P10 / P90 undiannya
+    check_rng = np.random.default_rng(None if seed is None else seed + 1)
+    spread = np.empty((n_drivers, 2))
+    for spec, first, last in blocks:
+        spread[first:last] = np.percentile(_sample(check_rng, spec, 2000), [10, 90])
+    rows = []
+    for d, (label, spec, members) in enumerate(drivers):
+        lo, hi = spread[d]
+        rows.append({
+            "driver": label,
+            "resources": len(members),
+            "exposure": driver_exposure[d],
+            "share": driver_exposure[d] / real_cost if real_cost else 0.0,
+            "impact_p10": lo * driver_exposure[d] * factor,
+            "impact_p90": hi * driver_exposure[d] * factor,
+            "corr": float(corr[d]),
+        })
+    drivers_df = pd.DataFrame(rows, columns=["driver", "resources", "exposure", "share", "impact_p10", "impact_p90", "corr"])
+    drivers_df = drivers_df.sort_values("corr", key=np.abs, ascending=False, ignore_index=True)
+
+    return {
+        "totals": totals,
+        "base": real_cost * factor,
+        "percentiles": dict(zip(PERCENTILES, np.percentile(totals, PERCENTILES).tolist())),
+        "drivers": drivers_df,
+    }
+
+def resource_sensitivity(project):
+    """Sensitivitas deterministik semua resource: eksposur Rp & kenaikan Grand Total per +1% harga"""
+    import pandas as pd
+
+    res = project.resources
+    real_cost = project.totals()[0]
+    factor = tax_factor(project.tax_settings)
+    exposure = resource_demand(project.rab_data, project.ahsp_master, res) * res['price'].to_numpy(dtype=float)
+    df = pd.DataFrame({
+        "id": res['id'].to_numpy(),
+        "name": res['name'].to_numpy() if 'name' in res.columns else None,
+        "category": res['category'].to_numpy() if 'category' in res.columns else None,
+        "exposure": exposure,
+        "share": exposure / real_cost if real_cost else 0.0,
+        "per_1pct": exposure * factor / 100,
+    })
+    return df[df['exposure'] != 0].sort_values("exposure", ascending=False, ignore_index=True)
@@ -0,0 +1,613 @@
+"""RAB STORE: penyimpanan proyek persisten di SQLite (autosave inkremental).
+
+Satu file database menampung banyak proyek. Tabel:
+    projects          - info proyek, pajak + ringkasan (total, jumlah item) untuk daftar proyek
+    resources         - Database Harga per proyek (urut `pos`)
+    ahsp, ahsp_components - resep AHSP & komponennya
+    divisions, subgroups, items - struktur RAB (kunci posisi g_idx / s_idx / i_idx)
+    objects, revisions - riwayat revisi (rab_history): objek content-addressed
+                         dipakai bersama antar revisi & proyek
+
+Autosave memakai SaveState: hash setiap baris yang terakhir disimpan. Hanya
+baris yang hash-nya berubah yang ditulis ulang, dan hanya bagian yang versinya
+berubah di DependencyIndex (Sub, tabel harga, AHSP) yang dibandingkan.
+
+load_project membuka proyek tanpa membaca item: Divisi berupa LazyDivision
+yang memuat Sub & item-nya dari database saat pertama kali diakses.
+"""
+import json
+import math
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+
+from rab_engine import Project
+from rab_history import RevisionHistory, decode_object, reachable
+
+RESOURCE_FIELDS = ("id", "category", "name", "unit", "price")
+ITEM_FIELDS = ("name", "unit", "vol", "ahsp", "manual_price", "current_price", "total_price")
+CONTAINER_FIELDS = ("id", "title")
+
+SCHEMA = """
+PRAGMA foreign_keys = ON;
+CREATE TABLE IF NOT EXISTS projects (
+    project_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    name         TEXT,
+    location     TEXT,
+    owner        TEXT,
+    info         TEXT NOT NULL,
+    tax          TEXT NOT NULL,
+    grand_total  REAL DEFAULT 0,
+    n_items      INTEGER DEFAULT 0,
+    created_at   REAL NOT NULL,
+    updated_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_projects_updated ON projects(updated_at);
+CREATE INDEX IF NOT EXISTS idx_projects_name ON projects(name);
+
+CREATE TABLE IF NOT EXISTS resources (
+    project_id INTEGER NOT NULL REFERENCES projects(project_id) ON DELETE CASCADE,
+    pos        INTEGER NOT NULL,
+    id         TEXT,
+    category   TEXT,
+    name       TEXT,
+    unit       TEXT,
+    price      REAL,
+    extra      TEXT,
+    PRIMARY KEY (project_id, pos)
+);
+CREATE INDEX IF NOT EXISTS idx_resources_id ON resources(project_id, id);
+
+CREATE TABLE IF NOT EXISTS ahsp (
+    project_id INTEGER NOT NULL REFERENCES projects(project_id) ON DELETE CASCADE,
+    id         TEXT NOT NULL,
+    pos        INTEGER NOT NULL,
+    name       TEXT,
+    unit       TEXT,
+    extra      TEXT,
+    PRIMARY KEY (project_id, id)
+);
+CREATE TABLE IF NOT EXISTS ahsp_components (
+    project_id INTEGER NOT NULL,
+    ahsp_id    TEXT NOT NULL,
+    pos        INTEGER NOT NULL,
+    comp_id    TEXT NOT NULL,
+    coef       REAL NOT NULL,
+    PRIMARY KEY (project_id, ahsp_id, pos),
+    FOREIGN KEY (project_id, ahsp_id) REFERENCES ahsp(project_id, id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_components_comp ON ahsp_components(project_id, comp_id);
+
+CREATE TABLE IF NOT EXISTS divisions (
+    project_id  INTEGER NOT NULL REFERENCES projects(project_id) ON DELETE CASCADE,
+    g_idx       INTEGER NOT NULL,
+    id          TEXT,
+    title       TEXT,
+    group_total REAL DEFAULT 0,
+    extra       TEXT,
+    PRIMARY KEY (project_id, g_idx)
+);
+CREATE TABLE IF NOT EXISTS subgroups (
+    project_id INTEGER NOT NULL,
+    g_idx      INTEGER NOT NULL,
+    s_idx      INTEGER NOT NULL,
+    id         TEXT,
+    title      TEXT,
+    sub_total  REAL DEFAULT 0,
+    extra      TEXT,
+    PRIMARY KEY (project_id, g_idx, s_idx),
+    FOREIGN KEY (project_id, g_idx) REFERENCES divisions(project_id, g_idx) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS items (
+    project_id    INTEGER NOT NULL,
+    g_idx         INTEGER NOT NULL,
+    s_idx         INTEGER NOT NULL,
+    i_idx         INTEGER NOT NULL,
+    name          TEXT,
+    unit          TEXT,
+    vol           REAL,
+    ahsp          TEXT,
+    manual_price  REAL,
+    current_price REAL,
+    total_price   REAL,
+    extra         TEXT,
+    PRIMARY KEY (project_id, g_idx, s_idx, i_idx),
+    FOREIGN KEY (project_id, g_idx, s_idx) REFERENCES subgroups(project_id, g_idx, s_idx) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_items_ahsp ON items(project_id, ahsp);
+
+CREATE TABLE IF NOT EXISTS objects (
+    digest TEXT PRIMARY KEY,
+    data   BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS revisions (
+    project_id INTEGER NOT NULL REFERENCES projects(project_id) ON DELETE CASCADE,
+    rev        INTEGER NOT NULL,
+    label      TEXT,
+    root       TEXT NOT NULL,
+    real_cost  REAL,
+    n_items    INTEGER,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (project_id, rev)
+);
+"""
+REVISION_FIELDS = ("rev", "label", "root", "real_cost", "n_items", "created_at")
+
+def _clean(val):
+    """Nilai siap disimpan: NaN -> None, tipe numpy -> tipe Python"""
+    if hasattr(val, 'item'):
+        val = val.item()
+    if isinstance(val, float) and math.isnan(val):
+        return None
+    return val
+
+def _extra(record, known):
+    """Field di luar kolom tetap disimpan sebagai JSON agar tidak hilang"""
+    rest = {k: v for k, v in record.items() if k not in known}
+    return json.dumps(rest, sort_keys=True, default=str) if rest else None
+
+def _item_row(item):
+    return tuple(_clean(item.get(f)) for f in ITEM_FIELDS) + (_extra(item, ITEM_FIELDS),)
+
+def _resource_rows(resources):
+    cols = list(resources.columns)
+    extra_cols = [c for c in cols if c not in RESOURCE_FIELDS]
+    data = {c: resources[c].tolist() for c in cols}
+    n = len(resources)
+    rows = []
+    for i in range(n):
+        base = tuple(_clean(data[c][i]) if c in data else None for c in RESOURCE_FIELDS)
+        extra = {c: _clean(data[c][i]) for c in extra_cols}
+        rows.append(base + (json.dumps(extra, sort_keys=True, default=str) if extra else None,))
+    return rows
+
+def _container_row(obj, total_key, child_key):
+    known = CONTAINER_FIELDS + (total_key, child_key)
+    return (obj.get('id'), obj.get('title'), _clean(obj.get(total_key, 0)), _extra(obj, known))
+
+def _recipe_hash(recipe):
+    return hash(json.dumps(recipe, sort_keys=True, default=str))
+
+class SqliteObjects:
+    """Object store rab_history di tabel `objects` (objek yang sudah ada tidak ditulis ulang)"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __contains__(self, digest):
+        with self.store._lock:
+            return self.store.conn.execute("SELECT 1 FROM objects WHERE digest = ?", (digest,)).fetchone() is not None
+
+    def get(self, digest):
+        with self.store._lock:
+            row = self.store.conn.execute("SELECT data FROM objects WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(digest)
+        return decode_object(row[0])
+
+    def put_many(self, blobs):
+        with self.store._transaction() as conn:
+            conn.executemany("INSERT OR IGNORE INTO objects (digest, data) VALUES (?, ?)", list(blobs.items()))
+
+@dataclass
+class SaveState:
+    """Jejak hash baris yang terakhir tersimpan untuk satu proyek (basis diff autosave)"""
+    project_id: int
+    info: str = ""
+    resources: list = field(default_factory=list)        # hash per baris (pos)
+    res_version: int = None
+    ahsp: dict = field(default_factory=dict)              # id -> hash resep
+    ahsp_version: int = None
+    containers: dict = field(default_factory=dict)        # (g,) / (g, s) -> hash baris
+    items: dict = field(default_factory=dict)             # (g, s) -> [hash per item]
+    sub_versions: dict = field(default_factory=dict)      # (g, s) -> versi Sub saat disimpan
+    index_version: int = None
+    last_saved: float = None
+    last_written: int = 0
+
+class LazyDivision(dict):
+    """Divisi hasil load_project(lazy=True): id, judul & group_total langsung tersedia,
+    Sub & item baru dibaca dari database saat Divisi pertama kali diakses lebih dalam.
+
+    Akses lain (termasuk iterasi, json.dumps, copy) dan setiap perubahan memuat
+    Divisi lebih dulu, jadi engine & exporter memperlakukannya seperti dict biasa.
+    """
+    SUMMARY = ("id", "title", "group_total")
+
+    def __init__(self, summary, loader):
+        super().__init__(summary)
+        self._loader = loader
+
+    @property
+    def loaded(self):
+        return self._loader is None
+
+    def load(self):
+        loader, self._loader = self._loader, None
+        if loader is not None:
+            dict.update(self, loader())
+        return self
+
+    def __missing__(self, key):
+        if self.loaded:
+            raise KeyError(key)
+        return self.load()[key]
+
+    def get(self, key, default=None):
+        if key not in self.SUMMARY:
+            self.load()
+        return dict.get(self, key, default)
+
+    def __reduce_ex__(self, protocol):
+        # Salinan / pickle berupa dict biasa yang sudah dimuat
+        return (dict, (dict(self.load().items()),))
+
+def _loading(name):
+    method = getattr(dict, name)
+
+    def wrapper(self, *args, **kwargs):
+        self.load()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    return wrapper
+
+for _name in ("__contains__", "__iter__", "__len__", "__eq__", "__ne__", "__repr__", "__setitem__", "__delitem__",
+              "keys", "items", "values", "copy", "pop", "popitem", "setdefault", "update", "clear"):
+    setattr(LazyDivision, _name, _loading(_name))
+
+class ProjectStore:
+    """Akses database proyek. Satu koneksi (WAL) dipakai bersama antar thread dengan lock."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _transaction(self):
+        store = self
+
+        class _Tx:
+            def __enter__(self):
+                store._lock.acquire()
+                store.conn.execute("BEGIN")
+                return store.conn
+
+            def __exit__(self, exc_type, exc, tb):
+                try:
+                    store.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+                finally:
+                    store._lock.release()
+        return _Tx()
+
+    # --- Daftar proyek (tanpa memuat isi) ---
+    def list_projects(self, search="", limit=50, offset=0):
+        sql = ("SELECT project_id, name, location, owner, grand_total, n_items, updated_at FROM projects "
+               "WHERE name LIKE ? ORDER BY updated_at DESC LIMIT ? OFFSET ?")
+        with self._lock:
+            cur = self.conn.execute(sql, (f"%{search}%", limit, offset))
+            cols = [d[0] for d in cur.description]
+            return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+    def count_projects(self, search=""):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM projects WHERE name LIKE ?", (f"%{search}%",)).fetchone()[0]
+
+    def delete_project(self, project_id):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM projects WHERE project_id = ?", (project_id,))
+
+    # --- Simpan ---
+    def create_project(self, project):
+        """Menyimpan proyek baru secara utuh; mengembalikan SaveState untuk autosave berikutnya"""
+        now = time.time()
+        info = json.dumps(project.project_info, sort_keys=True, default=str)
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "INSERT INTO projects (name, location, owner, info, tax, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (project.project_info.get('name'), project.project_info.get('location'), project.project_info.get('owner'),
+                 info, json.dumps(project.tax_settings), now, now),
+            )
+            state = SaveState(cur.lastrowid)
+        self.save_changes(project, state)
+        return state
+
+    def save_changes(self, project, state):
+        """Autosave: tulis hanya baris yang berubah sejak SaveState. Mengembalikan jumlah baris tertulis."""
+        # Info proyek & pajak (selalu dibandingkan; murah)
+        info = json.dumps([project.project_info, project.tax_settings], sort_keys=True, default=str)
+        index = project.index
+        # Rerun tanpa perubahan (misal hanya widget tampilan): tanpa kalkulasi & transaksi
+        if (index is not None and info == state.info and index.version == state.index_version
+                and index.res_maps.version == state.res_version and index.ahsp_version == state.ahsp_version):
+            return 0
+        real_cost = project.totals()[0]
+        index = project.index
+        pid = state.project_id
+        written = 0
+        with self._transaction() as conn:
+            # Tabel harga & resep hanya dibandingkan bila versinya berubah di DependencyIndex
+            if index.res_maps.version != state.res_version:
+                written += self._save_resources(conn, pid, project.resources, state)
+                state.res_version = index.res_maps.version
+            if index.ahsp_version != state.ahsp_version:
+                written += self._save_ahsp(conn, pid, project.ahsp_master, state)
+                state.ahsp_version = index.ahsp_version
+
+            written += self._save_rab(conn, pid, project.rab_data, index, state)
+            state.index_version = index.version
+
+            # Ringkasan daftar proyek (total, jumlah item, waktu ubah) hanya bila ada yang berubah
+            if info != state.info or written:
+                n_items = sum(len(sub['items']) for group in project.rab_data for sub in group.get('subgroups', []))
+                conn.execute(
+                    "UPDATE projects SET name = ?, location = ?, owner = ?, info = ?, tax = ?, grand_total = ?, "
+                    "n_items = ?, updated_at = ? WHERE project_id = ?",
+                    (project.project_info.get('name'), project.project_info.get('location'),
+                     project.project_info.get('owner'), json.dumps(project.project_info, default=str),
+                     json.dumps(project.tax_settings), _clean(real_cost), n_items, time.time(), pid),
+                )
+                state.info = info
+                written += 1
+        state.last_saved = time.time()
+        state.last_written = written
+        return written
+
+    def _save_resources(self, conn, pid, resources, state):
+        rows = _resource_rows(resources)
+        hashes = [hash(row) for row in rows]
+        old = state.resources
+        changed = [pos for pos, h in enumerate(hashes) if pos >= len(old) or old[pos] != h]
+        conn.executemany(
+            "INSERT OR REPLACE INTO resources (project_id, pos, id, category, name, unit, price, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(pid, pos) + rows[pos] for pos in changed],
+        )
+        if len(old) > len(rows):
+            conn.execute("DELETE FROM resources WHERE project_id = ? AND pos >= ?", (pid, len(rows)))
+        state.resources = hashes
+        return len(changed) + max(0, len(old) - len(rows))
+
+    def _save_ahsp(self, conn, pid, ahsp_master, state):
+        written = 0
+        new_hashes = {}
+        for pos, (ahsp_id, recipe) in enumerate(ahsp_master.items()):
+            h = hash((pos, _recipe_hash(recipe)))
+            new_hashes[ahsp_id] = h
+            if state.ahsp.get(ahsp_id) == h:
+                continue
+            conn.execute(
+                "INSERT INTO ahsp (project_id, id, pos, name, unit, extra) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (project_id, id) DO UPDATE SET pos = excluded.pos, name = excluded.name, "
+                "unit = excluded.unit, extra = excluded.extra",
+                (pid, ahsp_id, pos, recipe.get('name'), recipe.get('unit'), _extra(recipe, ("name", "unit", "components"))),
+            )
+            # Komponen satu resep ditulis ulang utuh (resep pendek; urutan komponen ikut tersimpan)
+            conn.execute("DELETE FROM ahsp_components WHERE project_id = ? AND ahsp_id = ?", (pid, ahsp_id))
+            conn.executemany(
+                "INSERT INTO ahsp_components (project_id, ahsp_id, pos, comp_id, coef) VALUES (?, ?, ?, ?, ?)",
+                [(pid, ahsp_id, c_pos, comp['id'], _clean(comp['coef'])) for c_pos, comp in enumerate(recipe['components'])],
+            )
+            written += 1 + len(recipe['components'])
+        removed = state.ahsp.keys() - new_hashes.keys()
+        conn.executemany("DELETE FROM ahsp WHERE project_id = ? AND id = ?", [(pid, ahsp_id) for ahsp_id in removed])
+        state.ahsp = new_hashes
+        return written + len(removed)
+
+    def _save_rab(self, conn, pid, rab_data, index, state):
+        written = 0
+        seen_subs = set()
+        for g_idx, group in enumerate(rab_data):
+            row = _container_row(group, 'group_total', 'subgroups')
+            if state.containers.get((g_idx,)) != hash(row):
+                conn.execute(
+                    "INSERT INTO divisions (project_id, g_idx, id, title, group_total, extra) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (project_id, g_idx) DO UPDATE SET id = excluded.id, title = excluded.title, "
+                    "group_total = excluded.group_total, extra = excluded.extra",
+                    (pid, g_idx) + row,
+                )
+                state.containers[(g_idx,)] = hash(row)
+                written += 1
+            for s_idx, sub in enumerate(group.get('subgroups', [])):
+                key = (g_idx, s_idx)
+                seen_subs.add(key)
+                row = _container_row(sub, 'sub_total', 'items')
+                if state.containers.get(key) != hash(row):
+                    conn.execute(
+                        "INSERT INTO subgroups (project_id, g_idx, s_idx, id, title, sub_total, extra) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (project_id, g_idx, s_idx) DO UPDATE SET id = excluded.id, title = excluded.title, "
+                        "sub_total = excluded.sub_total, extra = excluded.extra",
+                        (pid, g_idx, s_idx) + row,
+                    )
+                    state.containers[key] = hash(row)
+                    written += 1
+                # Item hanya dibandingkan di Sub yang versinya berubah sejak autosave terakhir
+                version = index.sub_version(g_idx, s_idx)
+                if state.sub_versions.get(key) != version or key not in state.items:
+                    written += self._save_items(conn, pid, g_idx, s_idx, sub['items'], state)
+                    state.sub_versions[key] = version
+
+        # Sub / Divisi yang sudah tidak ada (struktur menyusut)
+        for key in [k for k in state.items if k not in seen_subs]:
+            conn.execute("DELETE FROM subgroups WHERE project_id = ? AND g_idx = ? AND s_idx = ?", (pid,) + key)
+            state.items.pop(key)
+            state.containers.pop(key, None)
+            state.sub_versions.pop(key, None)
+            written += 1
+        n_groups = len(rab_data)
+        for key in [k for k in state.containers if len(k) == 1 and k[0] >= n_groups]:
+            conn.execute("DELETE FROM divisions WHERE project_id = ? AND g_idx = ?", (pid, key[0]))
+            state.containers.pop(key)
+            written += 1
+        return written
+
+    def _save_items(self, conn, pid, g_idx, s_idx, items, state):
+        rows = [_item_row(item) for item in items]
+        hashes = [hash(row) for row in rows]
+        old = state.items.get((g_idx, s_idx), [])
+        changed = [i for i, h in enumerate(hashes) if i >= len(old) or old[i] != h]
+        conn.executemany(
+            "INSERT OR REPLACE INTO items (project_id, g_idx, s_idx, i_idx, name, unit, vol, ahsp, manual_price, "
+            "current_price, total_price, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(pid, g_idx, s_idx, i) + rows[i] for i in changed],
+        )
+        if len(old) > len(rows):
+            conn.execute(
+                "DELETE FROM items WHERE project_id = ? AND g_idx = ? AND s_idx = ? AND i_idx >= ?",
+                (pid, g_idx, s_idx, len(rows)),
+            )
+        state.items[(g_idx, s_idx)] = hashes
+        return len(changed) + max(0, len(old) - len(rows))
+
+    # --- Riwayat revisi ---
+    def revision_history(self, project_id):
+        """RevisionHistory proyek ini; revisi baru dicatat dengan record_revision()"""
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(REVISION_FIELDS)} FROM revisions WHERE project_id = ? ORDER BY rev", (project_id,)
+            ).fetchall()
+        return RevisionHistory(SqliteObjects(self), [dict(zip(REVISION_FIELDS, row)) for row in rows])
+
+    def record_revision(self, project_id, revision):
+        with self._transaction() as conn:
+            conn.execute(
+                f"INSERT INTO revisions (project_id, {', '.join(REVISION_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (project_id,) + tuple(revision[f] for f in REVISION_FIELDS),
+            )
+
+    def prune_objects(self):
+        """Hapus objek yang tidak dipakai revisi mana pun (misal setelah proyek dihapus)"""
+        objects = SqliteObjects(self)
+        with self._lock:
+            roots = [row[0] for row in self.conn.execute("SELECT DISTINCT root FROM revisions")]
+            used = set()
+            for root in roots:
+                used |= reachable(root, objects)
+            stale = [row[0] for row in self.conn.execute("SELECT digest FROM objects") if row[0] not in used]
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM objects WHERE digest = ?", [(digest,) for digest in stale])
+        return len(stale)
+
+    # --- Muat ---
+    def load_divisions(self, project_id):
+        """Ringkasan Divisi (tanpa item) untuk pratinjau cepat"""
+        sql = ("SELECT d.g_idx, d.id, d.title, d.group_total, "
+               "(SELECT COUNT(*) FROM items i WHERE i.project_id = d.project_id AND i.g_idx = d.g_idx) AS n_items "
+               "FROM divisions d WHERE d.project_id = ? ORDER BY d.g_idx")
+        with self._lock:
+            cur = self.conn.execute(sql, (project_id,))
+            cols = [d[0] for d in cur.description]
+            return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+    def load_division(self, project_id, g_idx):
+        """Satu Divisi lengkap dengan Sub & item-nya (muat malas per Divisi)"""
+        with self._lock:
+            group = self.conn.execute(
+                "SELECT id, title, group_total, extra FROM divisions WHERE project_id = ? AND g_idx = ?", (project_id, g_idx)
+            ).fetchone()
+            if group is None:
+                raise KeyError(f"Divisi {g_idx} tidak ada di proyek {project_id}")
+            subs = self.conn.execute(
+                "SELECT s_idx, id, title, sub_total, extra FROM subgroups WHERE project_id = ? AND g_idx = ? ORDER BY s_idx",
+                (project_id, g_idx),
+            ).fetchall()
+            items = self.conn.execute(
+                f"SELECT s_idx, {', '.join(ITEM_FIELDS)}, extra FROM items WHERE project_id = ? AND g_idx = ? ORDER BY s_idx, i_idx",
+                (project_id, g_idx),
+            ).fetchall()
+        by_sub = {}
+        for s_idx, *values, extra in items:
+            item = dict(zip(ITEM_FIELDS, values))
+            if extra:
+                item.update(json.loads(extra))
+            by_sub.setdefault(s_idx, []).append(item)
+        subgroups = []
+        for s_idx, sub_id, title, sub_total, extra in subs:
+            sub = {"id": sub_id, "title": title, "items": by_sub.get(s_idx, []), "sub_total": sub_total}
+            if extra:
+                sub.update(json.loads(extra))
+            subgroups.append(sub)
+        g_id, g_title, group_total, g_extra = group
+        division = {"id": g_id, "title": g_title, "subgroups": subgroups, "group_total": group_total}
+        if g_extra:
+            division.update(json.loads(g_extra))
+        return division
+
+    def load_project(self, project_id, lazy=True):
+        """Membuka proyek; mengembalikan (Project, SaveState) yang sinkron dengan database.
+
+        Harga, AHSP dan ringkasan Divisi dibaca langsung; dengan lazy=True Sub & item
+        tiap Divisi (LazyDivision) baru dibaca saat Divisi itu pertama kali diakses.
+        Project.totals() / DependencyIndex menelusuri semua item, jadi memuat semuanya.
+        """
+        import pandas as pd
+
+        with self._lock:
+            row = self.conn.execute("SELECT info, tax FROM projects WHERE project_id = ?", (project_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"Proyek {project_id} tidak ditemukan")
+            res_rows = self.conn.execute(
+                f"SELECT {', '.join(RESOURCE_FIELDS)}, extra FROM resources WHERE project_id = ? ORDER BY pos", (project_id,)
+            ).fetchall()
+            ahsp_rows = self.conn.execute(
+                "SELECT id, name, unit, extra FROM ahsp WHERE project_id = ? ORDER BY pos", (project_id,)
+            ).fetchall()
+            comp_rows = self.conn.execute(
+                "SELECT ahsp_id, comp_id, coef FROM ahsp_components WHERE project_id = ? ORDER BY ahsp_id, pos", (project_id,)
+            ).fetchall()
+            div_rows = self.conn.execute(
+                "SELECT g_idx, id, title, group_total FROM divisions WHERE project_id = ? ORDER BY g_idx", (project_id,)
+            ).fetchall()
+
+        columns = {f: [r[i] for r in res_rows] for i, f in enumerate(RESOURCE_FIELDS)}
+        extras = [json.loads(r[-1]) if r[-1] else {} for r in res_rows]
+        for key in sorted({k for e in extras for k in e}):
+            columns[key] = [e.get(key) for e in extras]
+        resources = pd.DataFrame(columns)
+
+        components = {}
+        for ahsp_id, comp_id, coef in comp_rows:
+            components.setdefault(ahsp_id, []).append({"id": comp_id, "coef": coef})
+        ahsp_master = {}
+        for ahsp_id, name, unit, extra in ahsp_rows:
+            recipe = {"name": name, "unit": unit, "components": components.get(ahsp_id, [])}
+            if extra:
+                recipe.update(json.loads(extra))
+            ahsp_master[ahsp_id] = recipe
+
+        # SaveState = isi database saat ini, supaya autosave berikutnya hanya menulis perubahan.
+        # Baris Divisi / Sub / item dicatat saat Divisi dimuat (sebelum sempat diubah).
+        project = Project(json.loads(row[0]), json.loads(row[1]), resources, ahsp_master, [])
+        state = SaveState(project_id)
+        self._save_into_state(project, state)
+
+        def loader(g_idx):
+            def load():
+                division = self.load_division(project_id, g_idx)
+                self._division_into_state(state, g_idx, division)
+                return division
+            return load
+
+        for g_idx, g_id, title, group_total in div_rows:
+            division = LazyDivision({"id": g_id, "title": title, "group_total": group_total}, loader(g_idx))
+            project.rab_data.append(division if lazy else division.load())
+        return project, state
+
+    def _save_into_state(self, project, state):
+        """Hash baris harga, AHSP & info proyek (Divisi dicatat terpisah lewat _division_into_state)"""
+        state.info = json.dumps([project.project_info, project.tax_settings], sort_keys=True, default=str)
+        state.resources = [hash(row) for row in _resource_rows(project.resources)]
+        state.ahsp = {a: hash((pos, _recipe_hash(r))) for pos, (a, r) in enumerate(project.ahsp_master.items())}
+        state.last_saved = time.time()
+
+    def _division_into_state(self, state, g_idx, group):
+        state.containers[(g_idx,)] = hash(_container_row(group, 'group_total', 'subgroups'))
+        for s_idx, sub in enumerate(group.get('subgroups', [])):
+            state.containers[(g_idx, s_idx)] = hash(_container_row(sub, 'sub_total', 'items'))
+            state.items[(g_idx, s_idx)] = [hash(_item_row(item)) for item in sub['items']]
+
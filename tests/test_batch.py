@@ -0,0 +1,28 @@
+"""Batch repricing: baris per Divisi berjumlah tepat sama dengan baris TOTAL proyek."""
+from rab_batch import price_file
+from rab_engine import Project, allocate_sen, to_sen
+
+def test_allocate_sen_is_exact():
+    assert allocate_sen(10, [1, 1, 1]) == [4, 3, 3]
+    assert allocate_sen(7, [0, 5, 0]) == [0, 7, 0]
+    assert allocate_sen(-10, [1, 2]) == [-3, -7]
+    assert allocate_sen(5, [-2, 6]) == [-2, 7]
+    assert allocate_sen(3, [0, 0]) == [3, 0]
+    weights = [102_965, 7, 33_333_333, 1, 999]
+    for total in (0, 1, 12_458_875_002, -77):
+        assert sum(allocate_sen(total, weights)) == total
+
+def test_division_rows_reconcile_with_total(tmp_path):
+    project = Project.default()
+    project.recalculate()
+    path = tmp_path / "proyek.json"
+    path.write_text(project.to_json(), encoding='utf-8')
+
+    result = price_file(path)
+    assert result['error'] is None
+    totals = [to_sen(val) for val in result['totals']]
+    for col, total in enumerate(totals):
+        assert sum(to_sen(row[2 + col]) for row in result['divisions']) == total
+    for _, _, real, profit, ppn, final in result['divisions']:
+        assert to_sen(real) + to_sen(profit) + to_sen(ppn) == to_sen(final)
+    assert [to_sen(row[2]) for row in result['divisions']] == [to_sen(g['group_total']) for g in project.rab_data]
@@ -0,0 +1,39 @@
+"""Kubus biaya: jumlah (dalam sen) sama persis dengan biaya fisik RAB."""
+from rab_engine import CostCube, Project, to_sen
+
+def _cube_sen(index):
+    cube = CostCube()
+    cube.sync(index)
+    return cube, int(cube.table['cost_sen'].sum())
+
+def test_cube_total_equals_real_cost():
+    project = Project.default()
+    real_cost = project.recalculate()[0]
+    cube, total = _cube_sen(project.index)
+    assert total == to_sen(real_cost) == 102_965_909_104
+    by_divisi = cube.rollup(("divisi",))['cost']
+    assert [to_sen(v) for v in by_divisi] == [to_sen(group['group_total']) for group in project.rab_data]
+
+def test_negative_manual_residual_is_kept():
+    project = Project.default()
+    project.recalculate()
+    index = project.index
+    # Item harga manual bervolume negatif (pengurangan): sisa Harga Manual Sub jadi negatif
+    index.apply_item_delta(1, 0, added_rows=[{"name": "Pengurangan", "vol": -1000, "manual_price": 250000}])
+    cube, total = _cube_sen(index)
+    assert (cube.table['cost_sen'] < 0).any()
+    assert total == to_sen(sum(group['group_total'] for group in project.rab_data))
+
+def test_incremental_sync_matches_fresh_cube():
+    project = Project.default()
+    project.recalculate()
+    index = project.index
+    cube = CostCube()
+    cube.sync(index)
+    index.apply_item_delta(2, 1, edited_rows={0: {"vol": 77.777}})
+    cube.sync(index)
+    fresh, total = _cube_sen(index)
+    assert int(cube.table['cost_sen'].sum()) == total == to_sen(sum(group['group_total'] for group in project.rab_data))
+    levels = ("category", "resource")
+    assert cube.rollup(levels).sort_values(list(levels)).reset_index(drop=True).equals(
+        fresh.rollup(levels).sort_values(list(levels)).reset_index(drop=True))
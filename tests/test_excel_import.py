@@ -0,0 +1,53 @@
+"""Import library Excel: tata letak AHSP dikenali tanpa menimpa judul resep lama."""
+import openpyxl
+
+from rab_engine import Project, upsert_ahsp
+from rab_excel import read_library
+
+def _workbook(path, rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    return path
+
+def test_per_row_layout_does_not_take_head_from_component(tmp_path):
+    path = _workbook(tmp_path / "ahsp.xlsx", [
+        ["Kode AHSP", "Kode", "Uraian", "Satuan", "Koefisien"],
+        ["A.1", "L.01", "Pekerja", "OH", 0.5],
+        [None, "M.01", "Semen", "Kg", 10],
+    ])
+    _, recipes, warnings = read_library(path)
+    assert warnings == []
+    assert recipes == {"A.1": {"components": [{"id": "L.01", "coef": 0.5}, {"id": "M.01", "coef": 10}]}}
+
+    master = {"A.1": {"name": "Pasang Dinding", "unit": "m2", "components": [{"id": "L.01", "coef": 0.5}, {"id": "M.01", "coef": 10}]}}
+    touched, report = upsert_ahsp(master, recipes)
+    assert touched == [] and report == {"added": 0, "changed": 0, "removed": 0}
+    assert master["A.1"]["name"] == "Pasang Dinding" and master["A.1"]["unit"] == "m2"
+
+    touched, report = upsert_ahsp(master, {"B.1": recipes["A.1"]})
+    assert touched == ["B.1"] and report["added"] == 1
+    assert master["B.1"]["name"] == "B.1" and master["B.1"]["unit"] == ""
+
+def test_per_row_layout_reads_recipe_head_columns(tmp_path):
+    path = _workbook(tmp_path / "ahsp.xlsx", [
+        ["Kode AHSP", "Uraian Pekerjaan", "Satuan Pekerjaan", "Kode", "Uraian", "Satuan", "Koefisien"],
+        ["A.1", "Pasang Dinding", "m2", "L.01", "Pekerja", "OH", 0.5],
+        [None, None, None, "M.01", "Semen", "Kg", 10],
+    ])
+    _, recipes, _ = read_library(path)
+    assert recipes["A.1"]["name"] == "Pasang Dinding" and recipes["A.1"]["unit"] == "m2"
+
+def test_exported_block_layout_round_trips(tmp_path):
+    from rab_excel import export_excel
+
+    project = Project.default()
+    project.recalculate()
+    path = tmp_path / "rab.xlsx"
+    export_excel(project, str(path))
+    price_df, recipes, _ = read_library(path)
+    assert len(price_df) == len(project.resources)
+    touched, _ = upsert_ahsp(dict(project.ahsp_master), recipes)
+    assert touched == []
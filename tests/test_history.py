@@ -0,0 +1,93 @@
+"""Riwayat revisi: snapshot content-addressed, diff per item & pembersihan objek."""
+from rab_engine import Project, from_sen, to_sen
+from rab_history import RevisionHistory, reachable
+from rab_store import ProjectStore
+
+def _project():
+    project = Project.default()
+    project.recalculate()
+    return project
+
+def _tree(history, rev):
+    return history.objects.get(history.revision(rev)['root'])
+
+def test_identical_commit_shares_root():
+    project = _project()
+    history = RevisionHistory()
+    first = history.commit(project, "Kontrak")
+    n_objects = len(history.objects)
+    second = history.commit(project, "Tanpa perubahan")
+    assert first['root'] == second['root']
+    assert len(history.objects) == n_objects
+    assert history.diff(1, 2).identical
+    assert history.diff(1, project).identical
+    # Snapshot tanpa cache (diserialisasi ulang penuh) menghasilkan root yang sama
+    assert RevisionHistory().commit(project)['root'] == first['root']
+
+def test_unchanged_divisions_share_digests():
+    project = _project()
+    history = RevisionHistory()
+    history.commit(project)
+    project.index.apply_item_delta(1, 0, edited_rows={0: {"vol": 99.5}})
+    history.commit(project)
+    old, new = _tree(history, 1), _tree(history, 2)
+    changed = [g for g, (a, b) in enumerate(zip(old['divisions'], new['divisions'])) if a['ref'] != b['ref']]
+    assert changed == [1]
+    assert old['resources'] == new['resources'] and old['ahsp'] == new['ahsp']
+    old_subs = history.objects.get(old['divisions'][1]['ref'])['subgroups']
+    new_subs = history.objects.get(new['divisions'][1]['ref'])['subgroups']
+    assert [a['items'] == b['items'] for a, b in zip(old_subs, new_subs)] == [False] + [True] * (len(new_subs) - 1)
+
+def test_diff_counts_and_delta_after_item_delta():
+    project = _project()
+    history = RevisionHistory()
+    history.commit(project)
+    old_total = project.rab_data[1]['group_total']
+    items = project.rab_data[1]['subgroups'][0]['items']
+    assert len(items) >= 2 and items[0]['name'] != items[1]['name']
+    removed_name, edited_name = items[1]['name'], items[0]['name']
+    project.index.apply_item_delta(1, 0, edited_rows={0: {"vol": items[0]['vol'] + 7}}, deleted_rows=[1],
+                                   added_rows=[{"name": "Pekerjaan Tambah", "vol": 2, "manual_price": 150000}])
+
+    diff = history.diff(1, project)
+    assert not diff.identical
+    rows = diff.divisions.set_index('divisi_id')
+    div_id = project.rab_data[1]['id']
+    assert rows.loc[div_id, ['added', 'removed', 'changed']].tolist() == [1, 1, 1]
+    assert rows.loc[div_id, 'status'] == "changed"
+    assert to_sen(rows.loc[div_id, 'delta']) == to_sen(project.rab_data[1]['group_total']) - to_sen(old_total)
+    assert (rows.drop(index=div_id)['status'] == "unchanged").all()
+    assert dict(zip(diff.items['status'], diff.items['name'])) == {
+        "added": "Pekerjaan Tambah", "removed": removed_name, "changed": edited_name,
+    }
+    assert to_sen(diff.items['delta'].sum()) == to_sen(rows.loc[div_id, 'delta'])
+    assert diff.totals['delta'] == from_sen(to_sen(project.totals()[0]) - to_sen(history.revisions[0]['real_cost']))
+
+def test_prune_keeps_objects_of_surviving_revisions(tmp_path):
+    store = ProjectStore(str(tmp_path / "rab.db"))
+    try:
+        ids, roots = [], {}
+        for owner in ("A", "B"):
+            project = _project()
+            project.project_info['owner'] = owner
+            pid = store.create_project(project).project_id
+            history = store.revision_history(pid)
+            store.record_revision(pid, history.commit(project, "Kontrak"))
+            project.index.apply_item_delta(0, 0, edited_rows={0: {"vol": 123.0 if owner == "A" else 321.0}})
+            store.record_revision(pid, history.commit(project, "Addendum"))
+            ids.append(pid)
+            roots[pid] = [revision['root'] for revision in history.revisions]
+
+        assert store.prune_objects() == 0
+        store.delete_project(ids[0])
+        assert store.prune_objects() > 0
+
+        history = store.revision_history(ids[1])
+        assert [revision['root'] for revision in history.revisions] == roots[ids[1]]
+        kept = {row[0] for row in store.conn.execute("SELECT digest FROM objects")}
+        for root in roots[ids[1]]:
+            assert reachable(root, history.objects) <= kept
+        assert history.checkout(2).rab_data[0]['subgroups'][0]['items'][0]['vol'] == 321.0
+        assert history.diff(1, 2).divisions['changed'].sum() == 1
+    finally:
+        store.close()
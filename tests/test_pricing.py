@@ -0,0 +1,91 @@
+"""Regresi kalkulasi fixed-point: total terkunci, tidak bergantung urutan, tanpa overflow int64."""
+import copy
+import random
+
+import pandas as pd
+
+from rab_engine import (
+    COEF_SCALE, VOL_SCALE, DependencyIndex, Project, calculate_ahsp_price, from_sen, price_project, quantize, round_div,
+    to_sen,
+)
+
+# Proyek default: total fisik & grand total (sen) yang sudah direkonsiliasi
+DEFAULT_REAL_COST_SEN = 102_965_909_104
+DEFAULT_GRAND_TOTAL_SEN = 125_721_375_016
+
+def _totals_sen(project):
+    real_cost, profit, ppn, final_total, _ = project.recalculate()
+    return to_sen(real_cost), to_sen(final_total)
+
+def _permuted(project, seed):
+    """Salinan proyek dengan urutan Divisi, Sub, item, resource, resep & komponen diacak"""
+    rng = random.Random(seed)
+    data = copy.deepcopy(project.to_dict())
+    rng.shuffle(data['rab_data'])
+    for group in data['rab_data']:
+        rng.shuffle(group['subgroups'])
+        for sub in group['subgroups']:
+            rng.shuffle(sub['items'])
+    rng.shuffle(data['resources'])
+    recipes = list(data['ahsp_master'].items())
+    rng.shuffle(recipes)
+    for _, recipe in recipes:
+        rng.shuffle(recipe['components'])
+    data['ahsp_master'] = dict(recipes)
+    return Project.from_dict(data)
+
+def test_default_project_total_is_pinned():
+    assert _totals_sen(Project.default()) == (DEFAULT_REAL_COST_SEN, DEFAULT_GRAND_TOTAL_SEN)
+
+def test_total_independent_of_summation_order():
+    base = Project.default()
+    base.recalculate()
+    group_totals = {group['id']: to_sen(group['group_total']) for group in base.rab_data}
+    for seed in range(5):
+        project = _permuted(base, seed)
+        assert _totals_sen(project) == (DEFAULT_REAL_COST_SEN, DEFAULT_GRAND_TOTAL_SEN)
+        assert {group['id']: to_sen(group['group_total']) for group in project.rab_data} == group_totals
+
+def test_incremental_updates_match_full_recalculation():
+    project = Project.default()
+    project.recalculate()
+    index = project.index
+    index.apply_item_delta(1, 0, edited_rows={0: {"vol": 12.345}}, added_rows=[{"name": "Tambahan", "vol": 3.5, "manual_price": 1234.56}])
+    resources = project.resources.astype({"price": float})
+    resources.loc[0, 'price'] = resources.loc[0, 'price'] * 1.0375
+    project.resources = resources
+    index.update_resources(resources)
+
+    incremental = to_sen(index.grand_total)
+    full = DependencyIndex(copy.deepcopy(project.rab_data), project.ahsp_master, project.resources)
+    assert to_sen(full.grand_total) == incremental
+    assert to_sen(sum(group['group_total'] for group in project.rab_data)) == incremental
+
+def test_vector_path_exact_beyond_int64():
+    """Nilai antara di atas 2^63 sen dihitung eksak (int Python), tidak wrap-around diam-diam.
+
+    Field Rupiah tetap float, jadi dibandingkan dengan from_sen(hasil integer eksak).
+    """
+    resources = pd.DataFrame([{"id": "X.01", "category": "Bahan", "name": "Mahal", "unit": "Ls", "price": 9.5e12}])
+    ahsp_master = {"X": {"name": "Raksasa", "unit": "Ls", "components": [{"id": "X.01", "coef": 3.0e6}]}}
+    items = [
+        {"name": "AHSP raksasa", "unit": "Ls", "vol": 4.0e5, "ahsp": "X", "manual_price": 0},
+        {"name": "Manual raksasa", "unit": "Ls", "vol": 7.5e5, "ahsp": None, "manual_price": 8.25e13},
+        {"name": "Biasa", "unit": "M2", "vol": 2.5, "ahsp": None, "manual_price": 1000.0},
+    ]
+    rab_data = [{"id": "A", "title": "Besar", "subgroups": [{"id": "A.1", "title": "Besar", "items": items}]}]
+
+    grand_total, ahsp_prices = price_project(rab_data, ahsp_master, resources)
+
+    unit_sen = round_div(to_sen(9.5e12) * quantize(3.0e6, COEF_SCALE), COEF_SCALE)
+    assert ahsp_prices["X"] == from_sen(unit_sen)
+    assert ahsp_prices["X"] == calculate_ahsp_price("X", {"X.01": 9.5e12}, ahsp_master)
+    expected = [
+        round_div(unit_sen * quantize(4.0e5, VOL_SCALE), VOL_SCALE),
+        round_div(to_sen(8.25e13) * quantize(7.5e5, VOL_SCALE), VOL_SCALE),
+        round_div(to_sen(1000.0) * quantize(2.5, VOL_SCALE), VOL_SCALE),
+    ]
+    assert sum(expected) > 2 ** 63
+    assert grand_total == from_sen(sum(expected))
+    assert [item['total_price'] for item in items] == [from_sen(sen) for sen in expected]
+    assert rab_data[0]['group_total'] == from_sen(sum(expected))
@@ -0,0 +1,30 @@
+"""Kurva S: sebaran biaya mengikuti aturan pembulatan fixed-point dan tetap eksak."""
+import numpy as np
+
+from rab_engine import SCHEDULE_PROFILES, CostSchedule, Project, quantize, round_div, spread_costs, to_sen
+
+def test_half_sen_rounds_away_from_zero():
+    # 0.5 sen di akhir minggu pertama: dibulatkan menjauhi nol, bukan ke genap
+    assert spread_costs([1], [1], [2], [0], 2).tolist() == [[1, 0]]
+    assert spread_costs([-1], [1], [2], [0], 2).tolist() == [[-1, 0]]
+    assert spread_costs([5], [1], [2], [0], 2).tolist() == [[3, 2]]
+
+def test_rows_exact_beyond_float_precision():
+    total = 2 ** 60 + 12_345
+    weeks = spread_costs([total, 7], [1, 2], [3, 2], [3, 0], 4)
+    assert weeks.dtype == np.int64
+    assert weeks.sum(axis=1).tolist() == [total, 7]
+    expected = [round_div(quantize(x * x * (3 - 2 * x), 1_000_000) * total, 1_000_000) for x in (0, 1 / 3, 2 / 3, 1)]
+    assert np.cumsum(weeks[0]).tolist() == expected[1:] + [total]
+
+def test_schedule_matches_real_cost_for_every_profile():
+    project = Project.default()
+    for code, profile in enumerate(SCHEDULE_PROFILES):
+        for g_idx, group in enumerate(project.rab_data):
+            for s_idx, sub in enumerate(group['subgroups']):
+                sub.update(start=1 + (g_idx + s_idx) % 5, duration=3 + s_idx, profile=profile)
+        real_cost = project.recalculate()[0]
+        schedule = CostSchedule()
+        schedule.sync(project.index, weeks=12)
+        assert int(schedule.weekly.sum()) == to_sen(real_cost), profile
+        assert (schedule.by_division.sum(axis=1) == [to_sen(g['group_total']) for g in project.rab_data]).all()
@@ -0,0 +1,87 @@
+"""Penyimpanan SQLite: autosave hanya menulis baris yang berubah, muat malas tetap sinkron."""
+import pytest
+
+from rab_engine import Project, to_sen
+from rab_store import LazyDivision, ProjectStore
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProjectStore(str(tmp_path / "rab.db"))
+    yield store
+    store.close()
+
+def _count(store, table, project_id):
+    return store.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE project_id = ?", (project_id,)).fetchone()[0]
+
+def _created(store):
+    project = Project.default()
+    project.recalculate()
+    return project, store.create_project(project)
+
+def test_noop_save_writes_nothing(store):
+    project, state = _created(store)
+    assert state.last_written > 0
+    assert store.save_changes(project, state) == 0
+    project.totals()
+    assert store.save_changes(project, state) == 0
+
+def test_only_changed_rows_are_written(store):
+    project, state = _created(store)
+    pid = state.project_id
+    project.index.apply_item_delta(1, 0, edited_rows={0: {"vol": 42.5}})
+    # Item + Sub (sub_total) + Divisi (group_total) + ringkasan proyek
+    assert store.save_changes(project, state) == 4
+
+    project.project_info['owner'] = "Pemilik Baru"
+    assert store.save_changes(project, state) == 1
+
+    reloaded, _ = store.load_project(pid, lazy=False)
+    assert reloaded.rab_data[1]['subgroups'][0]['items'][0]['vol'] == 42.5
+    assert reloaded.project_info['owner'] == "Pemilik Baru"
+
+def test_lazy_load_then_save_writes_nothing(store):
+    project, state = _created(store)
+    loaded, loaded_state = store.load_project(state.project_id)
+    assert all(isinstance(group, LazyDivision) and not group.loaded for group in loaded.rab_data)
+    assert [group['group_total'] for group in loaded.rab_data] == [group['group_total'] for group in project.rab_data]
+    assert not any(group.loaded for group in loaded.rab_data)
+
+    assert store.save_changes(loaded, loaded_state) == 0
+    assert all(group.loaded for group in loaded.rab_data)
+
+    loaded.index.apply_item_delta(0, 0, edited_rows={0: {"vol": 3.25}})
+    assert store.save_changes(loaded, loaded_state) == 4
+
+def test_shrinking_structure_deletes_rows(store):
+    project, state = _created(store)
+    pid = state.project_id
+    n_subs = _count(store, "subgroups", pid)
+    last_sub = project.rab_data[0]['subgroups'][-1]
+    removed_items = len(last_sub['items']) + sum(len(sub['items']) for sub in project.rab_data[-1]['subgroups'])
+
+    del project.rab_data[0]['subgroups'][-1]
+    removed_group = project.rab_data.pop()
+    project.recalculate()
+    assert store.save_changes(project, state) > 0
+    assert store.save_changes(project, state) == 0
+
+    assert _count(store, "divisions", pid) == len(project.rab_data)
+    assert _count(store, "subgroups", pid) == n_subs - 1 - len(removed_group['subgroups'])
+    assert _count(store, "items", pid) == sum(len(sub['items']) for group in project.rab_data for sub in group['subgroups'])
+    assert removed_items > 0
+
+    reloaded, _ = store.load_project(pid, lazy=False)
+    assert [dict(group) for group in reloaded.rab_data] == project.rab_data
+
+def test_totals_after_reload_match(store):
+    project, state = _created(store)
+    project.index.apply_item_delta(2, 1, edited_rows={0: {"vol": 11.111}}, added_rows=[{"name": "Tambahan", "vol": 2, "manual_price": 987654.32}])
+    store.save_changes(project, state)
+    expected = [to_sen(val) for val in project.totals()[:4]]
+
+    for lazy in (True, False):
+        reloaded, _ = store.load_project(state.project_id, lazy=lazy)
+        assert [to_sen(val) for val in reloaded.totals()[:4]] == expected
+        assert reloaded.to_dict()['rab_data'] == project.to_dict()['rab_data']
+    summary = store.list_projects()[0]
+    assert to_sen(summary['grand_total']) == expected[0]
@@ -0,0 +1,33 @@
+"""Takeoff inkremental: akumulator volume tidak menumpuk galat setelah edit berulang."""
+import numpy as np
+
+from rab_engine import CostCube, DependencyIndex, Project
+
+def test_repeated_edits_match_fresh_index():
+    project = Project.default()
+    project.recalculate()
+    index = project.index
+    item = project.rab_data[2]['subgroups'][0]['items'][0]
+    original = item['vol']
+    for vol in (0.1, 0.2, 0.3, 1e9, 0.7, original):
+        index.apply_item_delta(2, 0, edited_rows={0: {"vol": vol}})
+
+    fresh = DependencyIndex(project.rab_data, project.ahsp_master, project.resources)
+    assert dict(index.ahsp_volume) == dict(fresh.ahsp_volume)
+    assert np.array_equal(index.takeoff(), fresh.takeoff())
+
+    cube, fresh_cube = CostCube(), CostCube()
+    cube.sync(index)
+    fresh_cube.sync(fresh)
+    assert cube.demand == fresh_cube.demand
+    assert cube.table['cost_sen'].tolist() == fresh_cube.table['cost_sen'].tolist()
+
+def test_zeroed_volume_leaves_no_demand():
+    project = Project.default()
+    project.recalculate()
+    index = project.index
+    ahsp_id = project.rab_data[2]['subgroups'][0]['items'][0]['ahsp']
+    for vol in (0.1, 0.2, 0.3, 1e9, 0.7, 0):
+        index.apply_item_delta(2, 0, edited_rows={0: {"vol": vol}})
+    others = sum(item['vol'] for item in project.rab_data[2]['subgroups'][0]['items'] if item.get('ahsp') == ahsp_id)
+    assert index.ahsp_volume[2, 0, ahsp_id] == round(others * 1000)